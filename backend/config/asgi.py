@@ -2,6 +2,8 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Served by uvicorn when start.sh runs with SERVER=uvicorn; the async views
+in core/async_views.py then run on the event loop.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -9,8 +11,11 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Tells settings to drop the sync-only WhiteNoise middleware.
+os.environ.setdefault('DJANGO_ASGI', '1')
 
-application = get_asgi_application()
+application = ASGIStaticFilesHandler(get_asgi_application())
@@ -4,7 +4,9 @@ Django settings for config project.
 
 from pathlib import Path
 import os
+import tempfile
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -24,6 +26,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "corsheaders",
     "core",
@@ -32,7 +35,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.compression.CompressionMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.metrics.QueryMetricsMiddleware",
+    "core.replica.ReplicaMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -42,10 +48,18 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# WhiteNoise is sync only and would put every request through a thread
+# under ASGI; config/asgi.py serves static files itself instead.
+if os.environ.get("DJANGO_ASGI") == "1":
+    MIDDLEWARE.remove("whitenoise.middleware.WhiteNoiseMiddleware")
+
 CORS_ALLOW_ALL_ORIGINS = False
 CORS_ALLOWED_ORIGINS = [
     "https://insurance-crm-five.vercel.app",
 ]
+# The frontend reads and echoes the read-replica pin (core/replica.py).
+CORS_ALLOW_HEADERS = (*default_headers, "x-primary-pin")
+CORS_EXPOSE_HEADERS = ["X-Primary-Pin"]
 
 ROOT_URLCONF = "config.urls"
 
@@ -90,6 +104,122 @@ else:
         }
     }
 
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+}
+
+# API responses at least this large are brotli/gzip compressed (core/compression.py).
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+
+# Optional read replica: safe-method reads in core views go to it, except
+# for sessions that wrote within REPLICA_PIN_SECONDS (core/replica.py).
+_replica_url = os.environ.get("DATABASE_REPLICA_URL")
+if _replica_url:
+    DATABASES["replica"] = dj_database_url.config(
+        default=_replica_url,
+        conn_max_age=600,
+        ssl_require=not _replica_url.startswith("sqlite"),
+    )
+    if DATABASES["replica"]["ENGINE"] != "django.db.backends.sqlite3":
+        DATABASES["replica"]["DISABLE_SERVER_SIDE_CURSORS"] = True
+        DATABASES["replica"].setdefault("OPTIONS", {})["connect_timeout"] = 10
+    DATABASE_ROUTERS = ["core.replica.ReplicaRouter"]
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 10))
+
+# Dashboard counts are cached and invalidated by signals (core/cache.py).
+# Web workers, the start.sh workers and commands such as import_clients
+# all write, and a signal only clears the cache of its own process, so
+# the default is a file-based cache they all share (CACHE_LOCATION). An
+# in-process LocMemCache would miss the other processes' invalidations,
+# so its entries expire after a minute unless CACHE_TIMEOUT says otherwise.
+_cache_backend = os.environ.get("CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache")
+CACHES = {
+    "default": {
+        "BACKEND": _cache_backend,
+        "LOCATION": os.environ.get("CACHE_LOCATION", os.path.join(tempfile.gettempdir(), "insurance-crm-cache")),
+    }
+}
+CACHE_TIMEOUT = int(os.environ.get(
+    "CACHE_TIMEOUT", 60 if _cache_backend.endswith(".LocMemCache") else 60 * 60 * 24,
+))
+
+# Per-endpoint SQL query budgets for core.views (core/metrics.py). Going
+# over logs a warning on the core.metrics logger; QueryBudgetTests fails.
+# Keys are URL names, or function names for unnamed function views; a bare
+# key budgets GET requests, "POST note-list" style keys other methods.
+QUERY_BUDGETS = {
+    "client-list": 1,
+    "client-detail": 8,
+    "client-search": 2,
+    "note-list": 1,
+    "note-today": 1,
+    "note-overdue": 1,
+    "note-upcoming": 1,
+    "vehicleinsurance-list": 1,
+    "healthinsurance-list": 1,
+    "investmentdetails-list": 1,
+    "note-summary": 3,
+    "note-dashboard": 1,
+    "quote-list": 1,
+    "emidetails-list": 1,
+    "emiinstallment-list": 1,
+    "emi_due": 1,
+    "emi_overdue": 1,
+    "emi_collected": 1,
+    "document-list": 1,
+    "clientpurge-list": 1,
+    "vehicleinsurance-detail": 1,
+    "healthinsurance-detail": 1,
+    "investmentdetails-detail": 1,
+    "note-detail": 1,
+    "quote-detail": 1,
+    "emidetails-detail": 1,
+    "emiinstallment-detail": 1,
+    "document-detail": 1,
+    "analytics_summary": 2,
+    # One row read; the first request of a day the cron job missed builds
+    # the digest: two lookups, one query per section and the insert.
+    "daily_digest": 11,
+    "renewal_summary_all": 3,
+    "renewal_calendar": 3,
+    "health_renewal_summary": 1,
+    "health_renewal_list": 1,
+    "vehicle_renewal_summary": 1,
+    "vehicle_renewal_list": 1,
+    "investment_renewal_summary": 1,
+    "investment_renewal_list": 1,
+    "async_renewal_summary_all": 3,
+    "async_renewal_summary": 1,
+    "async_renewal_list": 1,
+    "async_note_summary": 3,
+    "async_note_dashboard": 1,
+    "async_client_search": 2,
+    "POST note-list": 11,
+    "POST renewal_bulk": 8,
+}
+QUERY_BUDGET_DEFAULT = None
+
+# One JSON line per core.views request at INFO (CORE_LOG_LEVEL).
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "plain": {"format": "%(levelname)s %(name)s %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "plain"},
+    },
+    "loggers": {
+        "core": {
+            "handlers": ["console"],
+            "level": os.environ.get("CORE_LOG_LEVEL", "INFO"),
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -121,6 +251,9 @@ AWS_STORAGE_BUCKET_NAME = os.environ.get("SUPABASE_S3_BUCKET")
 AWS_S3_REGION_NAME = os.environ.get("SUPABASE_S3_REGION")
 AWS_S3_ENDPOINT_URL = os.environ.get("SUPABASE_S3_ENDPOINT")
 AWS_S3_ADDRESSING_STYLE = "path"
+# Lifetime of the signed document URLs in API responses; client ETags
+# change with each period so a revalidated body never carries dead links.
+AWS_QUERYSTRING_EXPIRE = 3600
 
 DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
 
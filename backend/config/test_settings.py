@@ -0,0 +1,24 @@
+"""
+Settings for `manage.py test` (see manage.py).
+
+Adds a second SQLite database as the read replica when
+DATABASE_REPLICA_URL does not name one, so ReplicaTests always run
+against separate default and replica test databases, keeps the cache in
+memory instead of in the shared cache directory, and logs per-request
+metrics only at WARNING.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, LOGGING
+
+# Per-request metrics lines only when asked for; budget warnings still show.
+LOGGING["loggers"]["core"]["level"] = os.environ.get("CORE_LOG_LEVEL", "WARNING")
+
+# One process: each test clears its own in-memory cache.
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+DATABASES.setdefault("replica", {
+    "ENGINE": "django.db.backends.sqlite3",
+    "NAME": BASE_DIR / "replica.sqlite3",
+})
@@ -0,0 +1,199 @@
+"""
+Portfolio analytics from the ConversionRollup table.
+
+Each rollup row holds the number of conversions and the premium
+(LeadConversion) or investment (InvestmentConversion) total for one
+day x insurance_type x company x POSP code. Rows are adjusted in place:
+
+- record_conversion() when convert_client / convert_investment_client
+  create a conversion, in the same transaction;
+- remove_conversions() when the purge worker deletes a client's
+  conversions.
+
+rebuild() recomputes the whole table from the conversion tables, for
+`manage.py rebuild_analytics` and after bulk loads. summary() answers
+/api/analytics/ from the rollups alone.
+"""
+from dataclasses import asdict, dataclass
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import CharField, Count, F, Sum, Value
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import ConversionRollup, InvestmentConversion, LeadConversion
+
+
+GROUPS = ("day", "month", "insurance_type", "company", "posp_code")
+DEFAULT_GROUP = ("month", "insurance_type")
+# group name -> ConversionRollup expression
+GROUP_FIELDS = {
+    "day": "day",
+    "month": "month",
+    "insurance_type": "insurance_type",
+    "company": "company_name",
+    "posp_code": "posp_code",
+}
+CENTS = Decimal("0.01")
+
+
+@dataclass(frozen=True)
+class RollupKey:
+    day: object
+    insurance_type: str
+    company_name: str
+    posp_code: str
+
+
+def key_for(conversion):
+    if isinstance(conversion, InvestmentConversion):
+        insurance_type = "investment"
+    else:
+        insurance_type = conversion.client.insurance_type
+    return RollupKey(
+        day=timezone.localdate(conversion.created_at),
+        insurance_type=insurance_type,
+        company_name=conversion.company_name,
+        posp_code=conversion.posp_code,
+    )
+
+
+def amounts_for(conversion):
+    """
+    (premium, investment) contributed by one conversion.
+    """
+    if isinstance(conversion, InvestmentConversion):
+        return Decimal(0), Decimal(conversion.investment_amount)
+    return Decimal(conversion.premium_amount), Decimal(0)
+
+
+def _adjust(key, conversions, premium, investment):
+    """
+    Add to one rollup row, creating it on first use. The UPDATE is atomic
+    in the database, so concurrent conversions never lose an increment.
+    """
+    changes = {
+        "conversions": F("conversions") + conversions,
+        "premium_total": F("premium_total") + premium,
+        "investment_total": F("investment_total") + investment,
+    }
+    rows = ConversionRollup.objects.filter(**asdict(key))
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            ConversionRollup.objects.create(
+                **asdict(key), conversions=conversions,
+                premium_total=premium, investment_total=investment,
+            )
+    except IntegrityError:
+        # Another request created the row first.
+        rows.update(**changes)
+
+
+def record_conversion(conversion):
+    premium, investment = amounts_for(conversion)
+    _adjust(key_for(conversion), 1, premium, investment)
+
+
+def remove_conversions(conversions):
+    """
+    Take deleted conversions (model instances, with their client loaded
+    for lead conversions) back out of the rollups.
+    """
+    totals = {}
+    for conversion in conversions:
+        key = key_for(conversion)
+        count, premium, investment = totals.get(key, (0, Decimal(0), Decimal(0)))
+        p, i = amounts_for(conversion)
+        totals[key] = (count + 1, premium + p, investment + i)
+    for key, (count, premium, investment) in totals.items():
+        _adjust(key, -count, -premium, -investment)
+    ConversionRollup.objects.filter(conversions__lte=0).delete()
+
+
+# ----------------------------- REBUILD -----------------------------
+def _grouped(queryset, insurance_type, premium, investment):
+    return (
+        queryset.annotate(day=TruncDate("created_at", tzinfo=timezone.get_current_timezone()))
+        .values("day", "company_name", "posp_code", insurance_type=insurance_type)
+        .annotate(conversions=Count("id"), premium_total=premium, investment_total=investment)
+        .order_by()
+    )
+
+
+def rollup_rows():
+    zero = Value(Decimal(0))
+    leads = _grouped(
+        LeadConversion.objects.all(), F("client__insurance_type"),
+        Sum("premium_amount"), zero,
+    )
+    investments = _grouped(
+        InvestmentConversion.objects.all(), Value("investment", output_field=CharField()),
+        zero, Sum("investment_amount"),
+    )
+    for source in (leads, investments):
+        for row in source.iterator():
+            yield ConversionRollup(**row)
+
+
+def rebuild(batch_size=1000):
+    """
+    Replace every rollup row with totals computed from the conversion
+    tables. Returns the number of rollup rows written.
+    """
+    with transaction.atomic():
+        ConversionRollup.objects.all().delete()
+        rows = list(rollup_rows())
+        ConversionRollup.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+# ----------------------------- QUERIES -----------------------------
+def _money(value):
+    return str((value or Decimal(0)).quantize(CENTS))
+
+
+def _measures(row):
+    return {
+        "conversions": row["sum_conversions"] or 0,
+        "premium_total": _money(row["sum_premium"]),
+        "investment_total": _money(row["sum_investment"]),
+    }
+
+
+def summary(group=DEFAULT_GROUP, start=None, end=None, insurance_type=None):
+    """
+    Totals over the rollups between start and end (inclusive dates),
+    grouped by `group` (names from GROUPS). Two queries.
+    """
+    qs = ConversionRollup.objects.all()
+    if start:
+        qs = qs.filter(day__gte=start)
+    if end:
+        qs = qs.filter(day__lte=end)
+    if insurance_type:
+        qs = qs.filter(insurance_type=insurance_type)
+
+    # Named apart from the model fields, which annotations may not shadow.
+    measures = {
+        "sum_conversions": Sum("conversions"),
+        "sum_premium": Sum("premium_total"),
+        "sum_investment": Sum("investment_total"),
+    }
+    totals = qs.aggregate(**measures)
+
+    fields = [GROUP_FIELDS[g] for g in group]
+    if "month" in group:
+        qs = qs.annotate(month=TruncMonth("day"))
+    rows = []
+    for row in qs.values(*fields).annotate(**measures).order_by(*fields):
+        item = {g: row[GROUP_FIELDS[g]] for g in group}
+        if "month" in item:
+            item["month"] = item["month"].strftime("%Y-%m")
+        if "day" in item:
+            item["day"] = item["day"].isoformat()
+        item.update(_measures(row))
+        rows.append(item)
+    return {"group": list(group), "totals": _measures(totals), "results": rows}
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import metrics, search, signals
+
+        signals.connect()
+        metrics.install()
+        post_migrate.connect(search.repair_sqlite_fts, sender=self)
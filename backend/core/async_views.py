@@ -0,0 +1,149 @@
+"""
+Async twins of the read-heavy endpoints, for serving under ASGI (uvicorn).
+
+Each view mirrors the sync one in core.views under /api/async/..., with
+the same parameters, validation and response body, but awaits the async
+ORM (core.renewals, core.reminders, core.search) instead of holding a
+worker thread while the database answers. They are plain Django async
+views: DRF's APIView is sync only, so they render with the same orjson
+encoder as core.renderers.ORJSONRenderer.
+
+Under WSGI they still work (Django runs them in an event loop per
+request), but only pay off under `SERVER=uvicorn ./start.sh`.
+"""
+import functools
+
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.utils.timezone import now
+
+from . import reminders, renewals, search
+from .renderers import dumps
+from .renewals import month_range
+from .serializers import ClientSerializer, NoteSerializer
+
+
+MONTH_REQUIRED = {"error": "month is required (YYYY-MM)"}
+
+
+def get_only(view):
+    """
+    require_GET for async views (Django 4.2's decorator is sync only).
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _json(data, status=200):
+    return HttpResponse(dumps(data), status=status, content_type="application/json")
+
+
+def _month_param(request):
+    month = request.GET.get("month")
+    if not month:
+        return None
+    try:
+        month_range(month)
+    except ValueError:
+        return None
+    return month
+
+
+def _bounded_int(request, name, default, maximum):
+    try:
+        value = int(request.GET.get(name, default))
+    except ValueError:
+        value = default
+    return max(1, min(value, maximum))
+
+
+# ----------------------------- RENEWALS -----------------------------
+@get_only
+async def async_renewal_summary_all(request):
+    """
+    GET /api/async/renewals/summary/?month=YYYY-MM
+    """
+    month = _month_param(request)
+    if not month:
+        return _json(MONTH_REQUIRED, status=400)
+    return _json(await renewals.acombined_summary(month))
+
+
+@get_only
+async def async_renewal_summary(request, product):
+    """
+    GET /api/async/renewals/<health|vehicle|investment>/summary/?month=YYYY-MM
+    """
+    if product not in renewals.PRODUCTS:
+        return _json({"error": "Unknown product"}, status=404)
+    month = _month_param(request)
+    if not month:
+        return _json(MONTH_REQUIRED, status=400)
+    return _json(await renewals.arenewal_summary(product, month))
+
+
+@get_only
+async def async_renewal_list(request, product):
+    """
+    GET /api/async/renewals/<health|vehicle|investment>/?month=YYYY-MM&status=
+    """
+    if product not in renewals.PRODUCTS:
+        return _json({"error": "Unknown product"}, status=404)
+    month = _month_param(request)
+    if not month:
+        return _json(MONTH_REQUIRED, status=400)
+    status_key = request.GET.get("status", "pending")
+    return _json(await renewals.arenewal_list(product, month, status_key))
+
+
+# ----------------------------- NOTES -----------------------------
+@get_only
+async def async_note_summary(request):
+    """
+    GET /api/async/notes/summary/
+    """
+    return _json(await reminders.anote_summary(now().date()))
+
+
+@get_only
+async def async_note_dashboard(request):
+    """
+    GET /api/async/notes/dashboard/?limit=50&today_cursor=&overdue_cursor=&upcoming_cursor=
+    """
+    limit = _bounded_int(request, "limit", reminders.DEFAULT_LIMIT, reminders.MAX_LIMIT)
+    cursors = {
+        key: request.GET[f"{key}_cursor"]
+        for key in reminders.BUCKETS
+        if request.GET.get(f"{key}_cursor")
+    }
+    try:
+        buckets = await reminders.adashboard(now().date(), limit=limit, cursors=cursors)
+    except reminders.InvalidCursor as exc:
+        return _json({"error": str(exc)}, status=400)
+
+    data = {"counts": {key: b["count"] for key, b in buckets.items()}}
+    for key, bucket in buckets.items():
+        data[key] = {
+            "results": NoteSerializer(bucket["results"], many=True).data,
+            "next_cursor": bucket["next_cursor"],
+        }
+    return _json(data)
+
+
+# ----------------------------- CLIENTS -----------------------------
+@get_only
+async def async_client_search(request):
+    """
+    GET /api/async/clients/search/?q=<name|place|mobile>&insurance_type=&limit=
+    """
+    limit = _bounded_int(request, "limit", search.DEFAULT_LIMIT, search.MAX_LIMIT)
+    clients = await search.asearch_clients(
+        request.GET.get("q"),
+        insurance_type=request.GET.get("insurance_type"),
+        limit=limit,
+    )
+    return _json(ClientSerializer(clients, many=True).data)
@@ -0,0 +1,437 @@
+"""
+Endpoint benchmark over synthetic books (`manage.py benchmark`).
+
+For each scale (1k, 10k, 100k clients by default) the book is grown with
+core.seed to that size, then every read route in core/urls.py is requested
+`repeat` times through the full Django stack (middleware included) with
+the test client. Latency percentiles come from wall-clock timing; query
+counts and response sizes come from the metrics middleware
+(core/metrics.py).
+
+The configured cache is shared with the running app, so it is never
+used: by default requests run with no cache at all, so the numbers are for
+cold dashboard counts; `warm_cache=True` measures repeat visits against a
+private in-memory cache.
+
+The seed has no documents, so each scale gives its newest client a few
+document rows (storage keys only; no file is read). Detail routes use the
+newest row of their table.
+
+Write routes (renew, convert, bulk, import) are left out: they change the
+book between samples. So is the CSV export, which streams the whole book.
+
+run_servers() compares the sync views under WSGI with their twins in
+core/async_views.py under ASGI: each route is hit `requests` times with
+`concurrency` requests in flight, from a thread pool through the WSGI
+handler and from asyncio tasks through the ASGI handler. Both run in
+process, so the numbers compare the two request paths rather than
+gunicorn and uvicorn themselves.
+
+run_rendering() times the JSON renderers and the response compression on
+the big list payloads (the 10k-client list by default): DRF's
+JSONRenderer against core.renderers.ORJSONRenderer on the same data, gzip
+against brotli on the result, and the whole request per Accept-Encoding.
+"""
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.db import connection
+from django.test import AsyncClient, Client as HttpClient, override_settings
+from rest_framework.renderers import JSONRenderer
+
+from . import compression
+from .models import (
+    Client,
+    Document,
+    EMIDetails,
+    EMIInstallment,
+    HealthInsurance,
+    InvestmentDetails,
+    Note,
+    Quote,
+    VehicleInsurance,
+)
+from .renderers import ORJSONRenderer
+from .seed import seed_book
+
+
+SCALES = (1_000, 10_000, 100_000)
+REPEAT = 10
+PERCENTILES = (50, 90, 95, 99)
+
+# Cold runs use no cache, warm runs a private one; never the app's own.
+COLD_CACHES = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+WARM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "benchmark"}}
+DOCUMENTS_PER_SCALE = 5
+
+# (name, url); {month} and the ids from route_fixtures() are filled in per scale.
+ROUTES = (
+    ("client-list", "/api/clients/"),
+    ("client-list-page", "/api/clients/?page_size=50"),
+    ("client-list-sparse", "/api/clients/?fields=id,name,mobile,vehicle_details.renewal_date,"
+                           "health_details.renewal_date,investment_details.renewal_date"),
+    ("client-detail", "/api/clients/{client_id}/"),
+    ("client-search-name", "/api/clients/search/?q=Menon"),
+    ("client-search-mobile", "/api/clients/search/?q=98"),
+    ("vehicle-list", "/api/vehicle-insurance/"),
+    ("vehicle-detail", "/api/vehicle-insurance/{vehicle_id}/"),
+    ("health-list", "/api/health-insurance/"),
+    ("health-detail", "/api/health-insurance/{health_id}/"),
+    ("investment-list", "/api/investment-details/"),
+    ("investment-detail", "/api/investment-details/{investment_id}/"),
+    ("note-list", "/api/notes/"),
+    ("note-detail", "/api/notes/{note_id}/"),
+    ("note-today", "/api/notes/today/"),
+    ("note-overdue", "/api/notes/overdue/"),
+    ("note-upcoming", "/api/notes/upcoming/"),
+    ("note-summary", "/api/notes/summary/"),
+    ("note-dashboard", "/api/notes/dashboard/"),
+    ("digest", "/api/digest/"),
+    ("quote-list", "/api/quotes/"),
+    ("quote-detail", "/api/quotes/{quote_id}/"),
+    ("emi-list", "/api/emi-details/"),
+    ("emi-detail", "/api/emi-details/{emi_id}/"),
+    ("emi-installment-list", "/api/emi-installments/"),
+    ("emi-installment-detail", "/api/emi-installments/{installment_id}/"),
+    ("emi-due", "/api/emi/due/"),
+    ("emi-overdue", "/api/emi/overdue/"),
+    ("emi-collected", "/api/emi/collected/"),
+    ("document-list", "/api/documents/?client={client_id}"),
+    ("document-detail", "/api/documents/{document_id}/"),
+    ("purge-list", "/api/purges/"),
+    ("analytics", "/api/analytics/"),
+    ("analytics-by-company", "/api/analytics/?group=company"),
+    ("renewal-summary-all", "/api/renewals/summary/?month={month}"),
+    ("renewal-calendar", "/api/renewals/calendar/?from={month}"),
+    ("health-renewal-summary", "/api/renewals/health/summary/?month={month}"),
+    ("health-renewal-list", "/api/renewals/health/?month={month}"),
+    ("vehicle-renewal-summary", "/api/renewals/vehicle/summary/?month={month}"),
+    ("vehicle-renewal-list", "/api/renewals/vehicle/?month={month}"),
+    ("investment-renewal-summary", "/api/renewals/investment/summary/?month={month}"),
+    ("investment-renewal-list", "/api/renewals/investment/?month={month}"),
+)
+
+CONCURRENCY = 20
+SERVER_REQUESTS = 200
+# (name, sync url, async url) for run_servers().
+SERVER_ROUTES = (
+    ("renewal-summary-all", "/api/renewals/summary/?month={month}", "/api/async/renewals/summary/?month={month}"),
+    ("health-renewal-summary", "/api/renewals/health/summary/?month={month}",
+     "/api/async/renewals/health/summary/?month={month}"),
+    ("vehicle-renewal-list", "/api/renewals/vehicle/?month={month}", "/api/async/renewals/vehicle/?month={month}"),
+    ("note-summary", "/api/notes/summary/", "/api/async/notes/summary/"),
+    ("note-dashboard", "/api/notes/dashboard/", "/api/async/notes/dashboard/"),
+    ("client-search-name", "/api/clients/search/?q=Menon", "/api/async/clients/search/?q=Menon"),
+    ("client-search-mobile", "/api/clients/search/?q=98", "/api/async/clients/search/?q=98"),
+)
+
+RENDER_SCALE = 10_000
+RENDER_ROUTES = (
+    ("client-list", "/api/clients/"),
+    ("vehicle-renewal-list", "/api/renewals/vehicle/?month={month}"),
+)
+RENDERERS = (("drf", JSONRenderer), ("orjson", ORJSONRenderer))
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def percentile(samples, pct):
+    """
+    Linear-interpolated percentile of a sorted list.
+    """
+    if len(samples) == 1:
+        return samples[0]
+    rank = (len(samples) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(samples) - 1)
+    return samples[low] + (samples[high] - samples[low]) * (rank - low)
+
+
+def benchmark_cache(warm_cache):
+    """
+    override_settings() swapping in the cache for a run.
+    """
+    return override_settings(CACHES=WARM_CACHES if warm_cache else COLD_CACHES)
+
+
+def time_route(http, url, repeat, warm_cache):
+    timings, db_ms, serializer_ms = [], [], []
+    response = None
+    if warm_cache:
+        http.get(url)
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = http.get(url)
+        timings.append((time.perf_counter() - start) * 1000)
+        metrics = response.query_metrics
+        db_ms.append(metrics.db_ms)
+        serializer_ms.append(metrics.serializer_ms)
+
+    timings.sort()
+    result = {
+        "url": url,
+        "status": response.status_code,
+        "mean_ms": round(statistics.fmean(timings), 2),
+        "max_ms": round(timings[-1], 2),
+        "db_p50_ms": round(statistics.median(db_ms), 2),
+        "serializer_p50_ms": round(statistics.median(serializer_ms), 2),
+        "queries": response.query_metrics.queries,
+        "response_bytes": len(response.content),
+    }
+    for pct in PERCENTILES:
+        result[f"p{pct}_ms"] = round(percentile(timings, pct), 2)
+    return result
+
+
+def grow_book(scale, log):
+    """
+    Seed the book up to `scale` clients. Returns the seconds it took.
+    """
+    existing = Client.objects.count()
+    start = time.perf_counter()
+    if scale > existing:
+        seed_book(scale - existing, seed=scale)
+    seconds = round(time.perf_counter() - start, 2)
+    log(f"{scale} clients (seeded in {seconds}s)")
+    return seconds
+
+
+def route_fixtures():
+    """
+    The ids ROUTES are formatted with: the newest row of each table. The
+    newest client also gets DOCUMENTS_PER_SCALE document rows.
+    """
+    client_id = Client.objects.order_by("id").values_list("id", flat=True).last()
+    Document.objects.bulk_create([
+        Document(client_id=client_id, document_type="rc", file=f"documents/benchmark-{client_id}-{i}.jpg",
+                 content_type="image/jpeg", processing="done")
+        for i in range(DOCUMENTS_PER_SCALE - Document.objects.filter(client_id=client_id).count())
+    ])
+    ids = {"client_id": client_id}
+    for key, model in (
+        ("vehicle_id", VehicleInsurance), ("health_id", HealthInsurance), ("investment_id", InvestmentDetails),
+        ("note_id", Note), ("quote_id", Quote), ("emi_id", EMIDetails), ("installment_id", EMIInstallment),
+        ("document_id", Document),
+    ):
+        ids[key] = model.objects.order_by("id").values_list("id", flat=True).last()
+    return ids
+
+
+def run(scales=SCALES, repeat=REPEAT, warm_cache=False, routes=ROUTES, log=None):
+    """
+    Grow the book through each scale and time every route. Meant for a
+    throwaway database; returns the results as a JSON-ready dict.
+    """
+    with benchmark_cache(warm_cache):
+        return _run(scales, repeat, warm_cache, routes, log or (lambda message: None))
+
+
+def _run(scales, repeat, warm_cache, routes, log):
+    http = HttpClient()
+    month = date.today().strftime("%Y-%m")
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "database": connection.vendor,
+        "repeat": repeat,
+        "cache": "warm" if warm_cache else "cold",
+        "scales": {},
+    }
+
+    for scale in sorted(scales):
+        seed_seconds = grow_book(scale, log)
+        ids = route_fixtures()
+        scale_result = {
+            "clients": Client.objects.count(),
+            "notes": Note.objects.count(),
+            "seed_seconds": seed_seconds,
+            "routes": {},
+        }
+        for name, template in routes:
+            url = template.format(month=month, **ids)
+            route = time_route(http, url, repeat, warm_cache)
+            scale_result["routes"][name] = route
+            log(f"  {name:28} p50 {route['p50_ms']:9.1f} ms  p95 {route['p95_ms']:9.1f} ms  "
+                f"{route['queries']} queries  {route['response_bytes']} bytes")
+        results["scales"][str(scale)] = scale_result
+    return results
+
+
+# ----------------------------- WSGI vs ASGI -----------------------------
+def _load_result(url, timings, seconds, responses):
+    timings.sort()
+    result = {
+        "url": url,
+        "statuses": sorted({r.status_code for r in responses}),
+        "requests_per_second": round(len(timings) / seconds, 1),
+        "mean_ms": round(statistics.fmean(timings), 2),
+        "max_ms": round(timings[-1], 2),
+        "queries": responses[-1].query_metrics.queries,
+    }
+    for pct in PERCENTILES:
+        result[f"p{pct}_ms"] = round(percentile(timings, pct), 2)
+    return result
+
+
+def time_wsgi(url, requests, concurrency):
+    def one(_):
+        http = HttpClient()
+        start = time.perf_counter()
+        response = http.get(url)
+        return (time.perf_counter() - start) * 1000, response
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, range(requests)))
+    seconds = time.perf_counter() - started
+    return _load_result(url, [t for t, _ in samples], seconds, [r for _, r in samples])
+
+
+async def _time_asgi(url, requests, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with slots:
+            http = AsyncClient()
+            start = time.perf_counter()
+            response = await http.get(url)
+            return (time.perf_counter() - start) * 1000, response
+
+    started = time.perf_counter()
+    samples = await asyncio.gather(*(one() for _ in range(requests)))
+    seconds = time.perf_counter() - started
+    return _load_result(url, [t for t, _ in samples], seconds, [r for _, r in samples])
+
+
+def time_asgi(url, requests, concurrency):
+    return asyncio.run(_time_asgi(url, requests, concurrency))
+
+
+def run_servers(scales=SCALES, requests=SERVER_REQUESTS, concurrency=CONCURRENCY,
+                warm_cache=False, routes=SERVER_ROUTES, log=None):
+    """
+    Time each sync route under WSGI and its async twin under ASGI at every
+    scale. Unless warm_cache, requests run without a cache.
+    """
+    with benchmark_cache(warm_cache):
+        return _run_servers(scales, requests, concurrency, warm_cache, routes, log or (lambda message: None))
+
+
+def _run_servers(scales, requests, concurrency, warm_cache, routes, log):
+    month = date.today().strftime("%Y-%m")
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "database": connection.vendor,
+        "requests": requests,
+        "concurrency": concurrency,
+        "cache": "warm" if warm_cache else "cold",
+        "scales": {},
+    }
+    for scale in sorted(scales):
+        seed_seconds = grow_book(scale, log)
+        scale_result = {"clients": Client.objects.count(), "seed_seconds": seed_seconds, "routes": {}}
+        for name, sync_url, async_url in routes:
+            route = {}
+            for server, timer, url in (("wsgi", time_wsgi, sync_url), ("asgi", time_asgi, async_url)):
+                route[server] = timer(url.format(month=month), requests, concurrency)
+            wsgi_rps, asgi_rps = route["wsgi"]["requests_per_second"], route["asgi"]["requests_per_second"]
+            route["asgi_speedup"] = round(asgi_rps / wsgi_rps, 2) if wsgi_rps else None
+            scale_result["routes"][name] = route
+            log(f"  {name:24} wsgi {wsgi_rps:8.1f} req/s p95 {route['wsgi']['p95_ms']:8.1f} ms  "
+                f"asgi {asgi_rps:8.1f} req/s p95 {route['asgi']['p95_ms']:8.1f} ms")
+        results["scales"][str(scale)] = scale_result
+    return results
+
+
+# ----------------------------- RENDERING / COMPRESSION -----------------------------
+def _p50_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 2), result
+
+
+def time_rendering(http, url, repeat):
+    data = http.get(url).data
+    result = {"url": url, "items": len(data), "renderers": {}, "compression": {}, "requests": {}}
+
+    for name, renderer in RENDERERS:
+        ms, content = _p50_ms(lambda: renderer().render(data, "application/json"), repeat)
+        result["renderers"][name] = {"p50_ms": ms, "bytes": len(content)}
+    drf, fast = result["renderers"]["drf"]["p50_ms"], result["renderers"]["orjson"]["p50_ms"]
+    result["renderer_speedup"] = round(drf / fast, 2) if fast else None
+
+    for encoding in ENCODINGS[1:]:
+        ms, (_, compressed) = _p50_ms(lambda: compression.compress(content, {encoding}), repeat)
+        result["compression"][encoding] = {
+            "p50_ms": ms, "bytes": len(compressed), "ratio": round(len(content) / len(compressed), 1),
+        }
+
+    for encoding in ENCODINGS:
+        ms, response = _p50_ms(lambda: http.get(url, HTTP_ACCEPT_ENCODING=encoding), repeat)
+        result["requests"][encoding] = {
+            "p50_ms": ms,
+            "bytes": len(response.content),
+            "content_encoding": response.get("Content-Encoding", "identity"),
+        }
+    return result
+
+
+def run_rendering(scale=RENDER_SCALE, repeat=REPEAT, routes=RENDER_ROUTES, log=None):
+    """
+    Grow the book to `scale` and time rendering and compression of each
+    list route. The cache stays warm: only the response path is measured.
+    """
+    with benchmark_cache(warm_cache=True):
+        return _run_rendering(scale, repeat, routes, log or (lambda message: None))
+
+
+def _run_rendering(scale, repeat, routes, log):
+    month = date.today().strftime("%Y-%m")
+    http = HttpClient()
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "database": connection.vendor,
+        "repeat": repeat,
+        "clients": scale,
+        "seed_seconds": grow_book(scale, log),
+        "routes": {},
+    }
+    for name, template in routes:
+        route = time_rendering(http, template.format(month=month), repeat)
+        results["routes"][name] = route
+        renderers, packed, requests = route["renderers"], route["compression"], route["requests"]
+        log(f"  {name} ({route['items']} items)")
+        log(f"    render   drf {renderers['drf']['p50_ms']:8.1f} ms  orjson {renderers['orjson']['p50_ms']:8.1f} ms"
+            f"  ({route['renderer_speedup']}x, {renderers['orjson']['bytes']} bytes)")
+        log(f"    compress gzip {packed['gzip']['p50_ms']:7.1f} ms {packed['gzip']['bytes']:>9} bytes"
+            f"  br {packed['br']['p50_ms']:7.1f} ms {packed['br']['bytes']:>9} bytes")
+        log("    request  " + "  ".join(
+            f"{encoding} {r['p50_ms']:.1f} ms {r['bytes']} bytes" for encoding, r in requests.items()
+        ))
+    return results
+
+
+def compare(current, previous):
+    """
+    Yield (scale, route, previous p50, current p50, ratio) for routes in both runs.
+    """
+    for scale, result in current["scales"].items():
+        before = previous.get("scales", {}).get(scale)
+        if not before:
+            continue
+        for name, route in result["routes"].items():
+            old = before["routes"].get(name)
+            if old:
+                ratio = route["p50_ms"] / old["p50_ms"] if old["p50_ms"] else None
+                yield scale, name, old["p50_ms"], route["p50_ms"], ratio
+
+
+def dump(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
@@ -0,0 +1,59 @@
+"""
+Cached dashboard counts.
+
+Renewal summaries are keyed by (product, month) and the reminder summary
+by date. Keys also carry the day they were computed on, because the
+pending/missed and today/overdue splits move at midnight. Entries are
+dropped by the signal handlers in core.signals whenever a row that feeds
+them is written. That reaches every process only through a shared
+backend (the file-based default), so settings.CACHE_TIMEOUT is a day
+there and a minute for an in-process cache.
+
+Only plain get/set/delete_many (and their async forms) are used, so any
+Django cache backend works, including locmem and file-based caches.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from . import replica
+
+
+def renewal_key(product_key, month, today):
+    return f"crm:renewals:{product_key}:{month}:{today.isoformat()}"
+
+
+def note_summary_key(today):
+    return f"crm:notes:summary:{today.isoformat()}"
+
+
+def get_or_compute(key, compute):
+    value = cache.get(key)
+    if value is None:
+        # Cached until the next write, so never computed from a lagging replica.
+        with replica.primary():
+            value = compute()
+        cache.set(key, value, settings.CACHE_TIMEOUT)
+    return value
+
+
+async def aget_or_compute(key, compute):
+    """
+    get_or_compute for async callers; `compute` returns an awaitable.
+    """
+    value = await cache.aget(key)
+    if value is None:
+        with replica.primary():
+            value = await compute()
+        await cache.aset(key, value, settings.CACHE_TIMEOUT)
+    return value
+
+
+def invalidate_renewal_months(product_key, months, today):
+    """
+    Drop cached counts for each 'YYYY-MM' in `months` for one product.
+    """
+    cache.delete_many([renewal_key(product_key, m, today) for m in months])
+
+
+def invalidate_note_summary(today):
+    cache.delete(note_summary_key(today))
@@ -0,0 +1,104 @@
+"""
+Brotli/gzip compression of large API responses.
+
+CompressionMiddleware compresses JSON and text responses under /api/ once
+they reach settings.COMPRESS_MIN_BYTES; smaller bodies gain less than the
+CPU costs. Brotli is used when the client accepts it and the optional
+`brotli` package is installed, gzip otherwise. Streaming responses
+(exports) are left alone.
+
+Like Django's GZipMiddleware it adds Vary: Accept-Encoding and weakens a
+strong ETag, since the bytes no longer match the uncompressed entity.
+"""
+import gzip
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import sync_and_async_middleware
+
+
+BROTLI_QUALITY = 4  # brotli's sweet spot for on-the-fly compression
+GZIP_LEVEL = 6
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def accepted_encodings(header):
+    """
+    Encodings the Accept-Encoding header allows (q > 0), lower-cased.
+    """
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        q = params.strip().lower()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name)
+    return accepted
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def compress(content, encodings):
+    """
+    Returns (encoding, compressed bytes), or (None, content).
+    """
+    brotli = _brotli() if "br" in encodings else None
+    if brotli is not None:
+        return "br", brotli.compress(content, quality=BROTLI_QUALITY)
+    if "gzip" in encodings:
+        return "gzip", gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+    return None, content
+
+
+def _should_compress(request, response):
+    return (
+        request.path.startswith("/api/")
+        and not response.streaming
+        and not response.has_header("Content-Encoding")
+        and response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES)
+        and len(response.content) >= settings.COMPRESS_MIN_BYTES
+    )
+
+
+def _compress_response(request, response):
+    if not _should_compress(request, response):
+        return response
+    patch_vary_headers(response, ("Accept-Encoding",))
+
+    encoding, content = compress(
+        response.content, accepted_encodings(request.headers.get("Accept-Encoding", ""))
+    )
+    if encoding is None or len(content) >= len(response.content):
+        return response
+
+    response.content = content
+    response["Content-Length"] = str(len(content))
+    response["Content-Encoding"] = encoding
+    etag = response.get("ETag")
+    if etag and etag.startswith('"'):
+        response["ETag"] = "W/" + etag
+    return response
+
+
+@sync_and_async_middleware
+def CompressionMiddleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return _compress_response(request, await get_response(request))
+    else:
+        def middleware(request):
+            return _compress_response(request, get_response(request))
+    return middleware
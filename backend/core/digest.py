@@ -0,0 +1,236 @@
+"""
+Daily reminder and renewal digest.
+
+Everything the morning dashboards ask for, namely today's and overdue
+follow-ups and each product's pending renewals in the next 7 and 30 days,
+is kept in one DailyDigest row per day. Each section holds its counts and
+only its first LIMIT items, so the row stays small however long the
+overdue tail grows:
+
+- rebuild() computes it from scratch. `manage.py build_digest` runs it
+  from cron just after midnight (`5 0 * * * python manage.py
+  build_digest`), and current() runs it on demand if cron has not.
+- refresh_notes(), refresh_renewals() and refresh_clients() recompute the
+  sections a write can have changed, one query per section, holding the
+  row lock so concurrent writers never undo each other's patches.
+  core.signals calls them when a field the digest shows changes. Callers
+  that write with .update(), bulk_update() or bulk_create() call them,
+  or refresh_all(), themselves.
+
+/api/digest/ then answers from the row alone, in one query.
+"""
+from datetime import date, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from . import fastpath, reminders, renewals, replica
+from .models import DailyDigest
+from .serializers import NoteSerializer
+
+
+NOTE_BUCKETS = ("today", "overdue")
+RENEWAL_WINDOWS = (7, 30)
+# Items kept per section; the counts cover every row.
+LIMIT = 50
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+# ----------------------------- SECTIONS -----------------------------
+def note_sections(today):
+    """
+    {"today": ..., "overdue": ...}, each with its count and first LIMIT
+    reminders in the NoteSerializer shape, from the reminder dashboard
+    query.
+    """
+    plan = fastpath.plan_for(NoteSerializer())
+    queryset = reminders.dashboard_queryset(today, LIMIT, upcoming_days=0)
+    sections = {bucket: {"count": 0, "items": []} for bucket in NOTE_BUCKETS}
+    rows = queryset.values_list(*plan.lookups, "bucket", "position", "bucket_count", named=True)
+    for row in rows:
+        section = sections[row.bucket]
+        section["count"] = row.bucket_count
+        if row.position <= LIMIT:
+            section["items"].append(row)
+    for section in sections.values():
+        section["items"] = fastpath.serialize(plan, section["items"])
+    return sections
+
+
+def renewal_queryset(product_key, today):
+    """
+    Pending renewals of one product due from today to the longest window.
+    """
+    product = renewals.PRODUCTS[product_key]
+    end = today + timedelta(days=max(RENEWAL_WINDOWS) + 1)
+    return (
+        renewals.window_queryset(product, today, end)
+        .filter(renewals.status_filters(product, today)["pending"])
+        .order_by("renewal_date", "id")
+    )
+
+
+def renewal_section(product_key, today):
+    """
+    A product's renewal counts per window and its first LIMIT renewals in
+    the renewal list shape, in one query.
+    """
+    product = renewals.PRODUCTS[product_key]
+    counts = {
+        f"next_{days}_days": Window(Count("id", filter=Q(renewal_date__lte=today + timedelta(days=days))))
+        for days in RENEWAL_WINDOWS
+    }
+    queryset = renewal_queryset(product_key, today).annotate(
+        position=Window(RowNumber(), order_by=[F("renewal_date").asc(), F("id").asc()]), **counts,
+    ).filter(position__lte=LIMIT)
+    client_fields = [f"client__{f}" for f in renewals.CLIENT_FIELDS]
+    section = {"items": [], **dict.fromkeys(counts, 0)}
+    for row in queryset.values_list("id", "renewal_date", *product.list_fields, *client_fields, *counts):
+        item = renewals._list_item(product, row[:-len(counts)])
+        item["renewal_date"] = item["renewal_date"].isoformat()
+        section["items"].append(item)
+        section.update(zip(counts, row[-len(counts):]))
+    return section
+
+
+def build(today):
+    """
+    The digest for `today` as a JSON-ready dict.
+    """
+    return {
+        "notes": note_sections(today),
+        "renewals": {key: renewal_section(key, today) for key in renewals.PRODUCTS},
+    }
+
+
+# ----------------------------- SNAPSHOTS -----------------------------
+def rebuild(today=None):
+    """
+    Compute and store the digest for `today`, replacing any earlier one.
+    Returns the DailyDigest.
+    """
+    today = today or timezone.localdate()
+    with replica.primary(), transaction.atomic():
+        snapshot = DailyDigest.objects.select_for_update().filter(day=today).first()
+        data = build(today)
+        if snapshot is not None:
+            snapshot.data = data
+            snapshot.version += 1
+            snapshot.built_at = timezone.now()
+            snapshot.save()
+            return snapshot
+        try:
+            with transaction.atomic():
+                return DailyDigest.objects.create(day=today, data=data)
+        except IntegrityError:
+            # Another process built it first; theirs is just as fresh.
+            return DailyDigest.objects.get(day=today)
+
+
+def current(today=None):
+    """
+    Today's DailyDigest, built now if the scheduled job has not run yet.
+    """
+    today = today or timezone.localdate()
+    snapshot = DailyDigest.objects.filter(day=today).first()
+    return snapshot if snapshot is not None else rebuild(today)
+
+
+def refresh_all(today=None):
+    """
+    Recompute today's digest, if it has been built, after bulk writes.
+    """
+    today = today or timezone.localdate()
+    if DailyDigest.objects.filter(day=today).exists():
+        rebuild(today)
+
+
+def prune(keep_days, today=None):
+    """
+    Delete digests older than `keep_days` days. Returns how many.
+    """
+    today = today or timezone.localdate()
+    deleted, _ = DailyDigest.objects.filter(day__lt=today - timedelta(days=keep_days)).delete()
+    return deleted
+
+
+def _patch(notes=False, products=()):
+    """
+    Recompute the notes section and the given products' renewal sections
+    of today's digest, if there is one. The rows are read after taking
+    the lock, so they include every write committed before it.
+    """
+    if not (notes or products):
+        return False
+
+    today = timezone.localdate()
+    # No savepoint: patches run inside most writes, usually with no error
+    # to recover from, and the snapshot lookup is then a single query.
+    with replica.primary(), transaction.atomic(savepoint=False):
+        snapshot = DailyDigest.objects.select_for_update().filter(day=today).first()
+        if snapshot is None:
+            return False
+        data = snapshot.data
+        changed = False
+        if notes:
+            sections = note_sections(today)
+            changed |= sections != data["notes"]
+            data["notes"] = sections
+        for key in products:
+            section = renewal_section(key, today)
+            changed |= section != data["renewals"][key]
+            data["renewals"][key] = section
+
+        if not changed:
+            return False
+        snapshot.version += 1
+        snapshot.save(update_fields=["data", "version", "updated_at"])
+    return True
+
+
+def refresh_notes():
+    """
+    Bring today's digest up to date after reminders changed.
+    """
+    return _patch(notes=True)
+
+
+def refresh_renewals(product_key):
+    return _patch(products=[product_key])
+
+
+def refresh_clients():
+    """
+    Recompute every section, e.g. after a client rename or soft delete.
+    """
+    return _patch(notes=True, products=list(renewals.PRODUCTS))
+
+
+# ----------------------------- SIGNAL FILTERS -----------------------------
+def note_listed(values, today=None):
+    """
+    Whether a note with these tracked values (a core.signals snapshot) can
+    be in the digest. Values not loaded count as a yes.
+    """
+    today = today or timezone.localdate()
+    if values.get("reminder") is False or values.get("completed"):
+        return False
+    follow_up = _as_date(values.get("follow_up_date"))
+    return follow_up is None or follow_up <= today
+
+
+def renewal_listed(values, today=None):
+    today = today or timezone.localdate()
+    if values.get("renewal_dismissed"):
+        return False
+    if "renewal_date" not in values:
+        return True
+    renewal_date = _as_date(values["renewal_date"])
+    return renewal_date is not None and today <= renewal_date <= today + timedelta(days=max(RENEWAL_WINDOWS))
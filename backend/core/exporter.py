@@ -0,0 +1,125 @@
+"""
+Constant-memory export of the whole client book as NDJSON or CSV.
+
+Server-side cursors are disabled for pgbouncer (DISABLE_SERVER_SIDE_CURSORS),
+so QuerySet.iterator() would still buffer the full result on Postgres.
+Instead clients are walked in keyset-paged chunks (id > last_id), and each
+chunk's related rows are fetched with one prefetch query per relation.
+Only one chunk is ever held in memory.
+"""
+import csv
+import io
+import json
+
+from django.db.models import Prefetch
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Client, Note
+from .serializers import (
+    ClientExportSerializer,
+    VehicleInsuranceSerializer,
+    HealthInsuranceSerializer,
+    InvestmentDetailsSerializer,
+)
+
+
+CHUNK_SIZE = 500
+FORMATS = ("ndjson", "csv")
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+CLIENT_COLUMNS = ("id", "name", "mobile", "place", "insurance_type", "created_at", "is_converted")
+DETAIL_COLUMNS = (
+    ("vehicle_details", "vehicle", VehicleInsuranceSerializer),
+    ("health_details", "health", HealthInsuranceSerializer),
+    ("investment_details", "investment", InvestmentDetailsSerializer),
+)
+# One-to-many relations are written to CSV as JSON arrays.
+LIST_COLUMNS = ("emi_details", "quotes", "notes", "conversions", "investment_conversions")
+
+
+def export_queryset(insurance_type=None):
+    qs = Client.objects.select_related(
+        'vehicle_details', 'health_details', 'investment_details'
+    ).prefetch_related(
+        'quotes',
+        'emi_details',
+        Prefetch('notes', queryset=Note.objects.order_by('-follow_up_date')),
+        'conversions',
+        'investment_conversions',
+    )
+    if insurance_type:
+        qs = qs.filter(insurance_type=insurance_type)
+    return qs
+
+
+def iter_chunks(insurance_type=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield serialized clients one chunk (list of dicts) at a time, by id.
+    """
+    qs = export_queryset(insurance_type).order_by("id")
+    last_id = 0
+    while True:
+        chunk = list(qs.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        last_id = chunk[-1].id
+        yield ClientExportSerializer(chunk, many=True).data
+
+
+def _dumps(value):
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False)
+
+
+def iter_ndjson(insurance_type=None, chunk_size=CHUNK_SIZE):
+    for rows in iter_chunks(insurance_type, chunk_size):
+        yield "".join(_dumps(row) + "\n" for row in rows)
+
+
+def detail_field_names():
+    """
+    [(relation, column prefix, [field names])] for the one-to-one details.
+    """
+    return [
+        (key, prefix, [n for n in serializer_class().fields if n not in ("id", "client")])
+        for key, prefix, serializer_class in DETAIL_COLUMNS
+    ]
+
+
+def csv_header(details):
+    header = list(CLIENT_COLUMNS)
+    for _, prefix, names in details:
+        header += [f"{prefix}_{name}" for name in names]
+    return header + list(LIST_COLUMNS)
+
+
+def csv_row(row, details):
+    values = [row[c] for c in CLIENT_COLUMNS]
+    for key, _, names in details:
+        detail = row[key] or {}
+        values += [detail.get(name, "") for name in names]
+    values += [_dumps(row[c]) for c in LIST_COLUMNS]
+    return values
+
+
+def iter_csv(insurance_type=None, chunk_size=CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    details = detail_field_names()
+    writer.writerow(csv_header(details))
+    for rows in iter_chunks(insurance_type, chunk_size):
+        for row in rows:
+            writer.writerow(csv_row(row, details))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_export(file_format, insurance_type=None, chunk_size=CHUNK_SIZE):
+    if file_format == "csv":
+        return iter_csv(insurance_type, chunk_size)
+    return iter_ndjson(insurance_type, chunk_size)
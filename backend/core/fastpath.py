@@ -0,0 +1,166 @@
+"""
+Read-only fast path for the hot list endpoints.
+
+ModelSerializer spends most of a big list instantiating models and
+calling get_attribute/to_representation field by field. For serializers
+made only of plain columns, dotted sources and nested one-to-one
+serializers, plan_for() compiles a Plan once per serializer shape: the
+values_list() lookups to fetch and, per output key, the column index and
+converter. serialize() then builds the same dicts from the row tuples.
+
+Converters reproduce DRF's to_representation: strings, integers and
+primary keys come back from the database in their JSON form already,
+ISO dates are isoformat()ed, and everything else (datetimes, decimals)
+goes through the bound DRF field itself. A missing one-to-one relation
+is None, as DRF renders it. Serializers with method fields or nested
+lists get no plan, and their views keep using the serializer.
+"""
+import datetime
+from dataclasses import dataclass
+from typing import Callable
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from . import metrics
+
+
+@dataclass(frozen=True)
+class Plan:
+    lookups: tuple
+    build: Callable
+
+    def rows(self, queryset):
+        """
+        The queryset as named tuples (cursor pagination reads the
+        ordering columns off them by name). Ordering columns are fetched
+        too if the serializer does not return them.
+        """
+        ordering = [o.lstrip("-") for o in queryset.query.order_by if isinstance(o, str)]
+        extra = [name for name in ordering if name not in self.lookups]
+        return queryset.values_list(*self.lookups, *extra, named=True)
+
+
+class Unsupported(Exception):
+    pass
+
+
+def _identity_choices(field):
+    return all(isinstance(key, str) for key in field.choices)
+
+
+def _converter(field):
+    """
+    Function from a non-None column value to field.to_representation(value),
+    or None when the value is already its own representation.
+    """
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        if field.pk_field is not None:
+            return field.pk_field.to_representation
+        return None
+    if isinstance(field, serializers.ChoiceField):
+        return None if _identity_choices(field) else field.to_representation
+    if isinstance(field, (serializers.CharField, serializers.IntegerField)):
+        return None
+    if isinstance(field, serializers.BooleanField):
+        return bool
+    if isinstance(field, serializers.DateField):
+        output_format = getattr(field, "format", api_settings.DATE_FORMAT)
+        if output_format is not None and output_format.lower() == ISO_8601:
+            return datetime.date.isoformat
+    return field.to_representation
+
+
+def _compile(serializer, prefix, lookups):
+    """
+    Row-tuple -> dict function for one serializer, registering the
+    columns it reads in `lookups` ({lookup: index}).
+    """
+    entries = []  # (name, column index, converter, nested build)
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if (
+            isinstance(field, (serializers.ListSerializer, serializers.SerializerMethodField))
+            or field.source == "*"
+        ):
+            raise Unsupported(name)
+        path = prefix + "__".join(field.source_attrs)
+        if isinstance(field, serializers.BaseSerializer):
+            # The related primary key tells a missing row (None) apart.
+            pk = lookups.setdefault(f"{path}__{field.Meta.model._meta.pk.name}", len(lookups))
+            entries.append((name, pk, None, _compile(field, path + "__", lookups)))
+        else:
+            entries.append((name, lookups.setdefault(path, len(lookups)), _converter(field), None))
+
+    def build(row):
+        item = {}
+        for name, index, convert, nested in entries:
+            value = row[index]
+            if value is None:
+                item[name] = None
+            elif nested is not None:
+                item[name] = nested(row)
+            elif convert is None:
+                item[name] = value
+            else:
+                item[name] = convert(value)
+        return item
+
+    return build
+
+
+def _signature(serializer):
+    return tuple(
+        (name, _signature(f) if isinstance(f, serializers.Serializer) else None)
+        for name, f in serializer.fields.items()
+    )
+
+
+_plans = {}
+
+
+def plan_for(serializer):
+    """
+    The Plan for a serializer instance (already trimmed by ?fields=, if
+    any), or None when it cannot be served from values(). Plans are
+    cached per serializer class and field shape.
+    """
+    key = (type(serializer), _signature(serializer))
+    if key not in _plans:
+        lookups = {}
+        try:
+            build = _compile(serializer, "", lookups)
+        except Unsupported:
+            _plans[key] = None
+        else:
+            _plans[key] = Plan(tuple(lookups), build)
+    return _plans[key]
+
+
+def serialize(plan, rows):
+    """
+    List of dicts for already fetched rows, identical to the serializer's
+    .data for the same objects.
+    """
+    with metrics.serializing():
+        return [plan.build(row) for row in rows]
+
+
+class FastListMixin:
+    """
+    GenericAPIView mixin: fast_list(queryset) answers a list request from
+    values() rows, paginated like the serializer path, or returns None
+    when the serializer has no plan.
+    """
+
+    def fast_list(self, queryset):
+        plan = plan_for(self.get_serializer())
+        if plan is None:
+            return None
+        rows = plan.rows(queryset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serialize(plan, page))
+        return Response(serialize(plan, list(rows)))
@@ -0,0 +1,177 @@
+"""
+Sparse fieldsets for the client serializers: ?fields= and ?expand=.
+
+    ?fields=id,name,mobile,vehicle_details.renewal_date
+    ?expand=vehicle_details,health_details
+
+`fields` picks the top-level fields to return; `relation.field` also
+picks fields inside a nested serializer (and includes the relation).
+Nested serializers are "expandable": without either parameter all of
+them are returned, as before. Once either parameter is given, only the
+relations named in `fields` or `expand` are.
+
+A Selection both trims the serializer (SparseFieldsMixin) and shapes the
+queryset (apply): only the requested relations are joined or prefetched,
+and .only() limits the columns when every requested field maps to one.
+"""
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+class FieldSelectionError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Selection:
+    # Top-level field names to keep; None keeps every non-expandable field.
+    fields: Optional[frozenset]
+    # Expandable relation -> nested field names to keep (empty: all).
+    relations: dict = field(default_factory=dict)
+
+
+def _names(raw):
+    return [name.strip() for name in (raw or "").split(",") if name.strip()]
+
+
+def expandable(serializer):
+    return {
+        name for name, f in serializer.fields.items()
+        if isinstance(f, (serializers.BaseSerializer))
+    }
+
+
+def nested_fields(f):
+    return (f.child if isinstance(f, serializers.ListSerializer) else f).fields
+
+
+def parse(serializer, fields_param, expand_param):
+    """
+    Selection for the query parameters, or None when neither was given.
+    Raises FieldSelectionError for names the serializer does not have.
+    """
+    requested, expand = _names(fields_param), _names(expand_param)
+    if not requested and not expand:
+        return None
+
+    available = serializer.fields
+    relations = expandable(serializer)
+    top, nested = set(), {}
+    for name in requested:
+        parent, _, child = name.partition(".")
+        if parent not in available:
+            raise FieldSelectionError(f"unknown field '{parent}'")
+        top.add(parent)
+        if child:
+            if parent not in relations:
+                raise FieldSelectionError(f"'{parent}' has no nested fields")
+            if child not in nested_fields(available[parent]):
+                raise FieldSelectionError(f"unknown field '{name}'")
+            nested.setdefault(parent, set()).add(child)
+        elif parent in relations:
+            nested.setdefault(parent, set())
+
+    for name in expand:
+        if name not in relations:
+            raise FieldSelectionError(f"cannot expand '{name}'")
+        nested.setdefault(name, set())
+        top.add(name)
+
+    return Selection(
+        fields=frozenset(top) if requested else None,
+        relations={name: frozenset(sub) for name, sub in nested.items()},
+    )
+
+
+class SparseFieldsMixin:
+    """
+    ModelSerializer mixin taking a `selection=` keyword (see parse()).
+    """
+
+    def __init__(self, *args, selection=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if selection is None:
+            return
+        relations = expandable(self)
+        for name in list(self.fields):
+            if name in relations:
+                keep = name in selection.relations
+            else:
+                keep = selection.fields is None or name in selection.fields
+            if not keep:
+                self.fields.pop(name)
+            elif selection.relations.get(name):
+                subset = selection.relations[name]
+                nested = nested_fields(self.fields[name])
+                for sub in list(nested):
+                    if sub not in subset:
+                        nested.pop(sub)
+
+
+# ----------------------------- QUERYSETS -----------------------------
+def columns(serializer_fields, model):
+    """
+    Model field names behind the given serializer fields, or None if any
+    of them is not a plain column (method fields, dotted sources).
+    """
+    concrete = {f.name for f in model._meta.concrete_fields}
+    names = set()
+    for f in serializer_fields:
+        if f.source not in concrete:
+            return None
+        names.add(f.source)
+    return names
+
+
+def _nested_columns(serializer_field, selection, name):
+    """
+    Columns a nested relation needs: the requested subset when it maps to
+    columns, else every column.
+    """
+    nested = serializer_field.child if isinstance(serializer_field, serializers.ListSerializer) else serializer_field
+    model = nested.Meta.model
+    if selection is not None and selection.relations.get(name):
+        names = columns(nested.fields.values(), model)
+        if names is not None:
+            return names
+    return {f.name for f in model._meta.concrete_fields}
+
+
+def apply(queryset, serializer, selection, join=(), prefetch=None):
+    """
+    Restrict `queryset` to what the (already trimmed) serializer returns.
+
+    join: one-to-one relations loaded with select_related.
+    prefetch: {relation: base queryset} for reverse foreign keys to the
+    model through a `client` foreign key.
+    """
+    fields = serializer.fields
+    relations = expandable(serializer)
+    wanted = relations if selection is None else relations & set(fields)
+
+    joined = [name for name in join if name in wanted]
+    if joined:
+        queryset = queryset.select_related(*joined)
+
+    lookups = []
+    for name, base in (prefetch or {}).items():
+        if name in wanted:
+            if selection is not None and selection.relations.get(name):
+                base = base.only("client", *_nested_columns(fields[name], selection, name))
+            lookups.append(Prefetch(name, queryset=base))
+    if lookups:
+        queryset = queryset.prefetch_related(*lookups)
+
+    if selection is None:
+        return queryset
+    only = columns([f for name, f in fields.items() if name not in relations], queryset.model)
+    if only is None:
+        return queryset
+    for name in joined:
+        only.update(f"{name}__{column}" for column in _nested_columns(fields[name], selection, name))
+    # Ordering columns too: cursor pagination reads them off the rows.
+    ordering = [o.lstrip("-") for o in queryset.query.order_by if isinstance(o, str)]
+    return queryset.only("id", *ordering, *only)
@@ -0,0 +1,285 @@
+"""
+Bulk client import from CSV or XLSX.
+
+Rows are streamed one at a time, validated with the same serializers the
+API uses, and written in chunks: each chunk is one transaction that
+bulk_creates the Client rows, then their detail rows and any EMI rows.
+Bad rows never stop the run; they are written to an error report (CSV)
+with the line number and the serializer errors.
+
+Expected columns (header names are case/space insensitive):
+
+    name, mobile, place, insurance_type
+    vehicle:    vehicle_type, insurance_cover, renewal_date
+    health:     ages, ped, renewal_date
+    investment: investment_type, remarks, renewal_date
+    EMI (optional, any type): emi_provider, emi_amount, down_payment,
+        policy_tenure, emi_tenure, monthly_emi_amount
+"""
+import codecs
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+from django.db import DatabaseError, transaction
+
+from . import cache, digest, installments, members
+from .models import (
+    Client,
+    VehicleInsurance,
+    HealthInsurance,
+    InvestmentDetails,
+    EMIDetails,
+    normalize_mobile,
+)
+from .renewals import product_for_model
+from .serializers import (
+    ClientSerializer,
+    VehicleInsuranceSerializer,
+    HealthInsuranceSerializer,
+    InvestmentDetailsSerializer,
+    EMIDetailsSerializer,
+)
+
+
+CHUNK_SIZE = 500
+ERROR_PREVIEW = 20
+
+CLIENT_COLUMNS = ("name", "mobile", "place", "insurance_type")
+DETAILS = {
+    "vehicle": (VehicleInsurance, VehicleInsuranceSerializer, ("vehicle_type", "insurance_cover", "renewal_date")),
+    "health": (HealthInsurance, HealthInsuranceSerializer, ("ages", "ped", "renewal_date")),
+    "investment": (InvestmentDetails, InvestmentDetailsSerializer, ("investment_type", "remarks", "renewal_date")),
+}
+EMI_COLUMNS = (
+    "emi_provider", "emi_amount", "down_payment",
+    "policy_tenure", "emi_tenure", "monthly_emi_amount",
+)
+
+REPORT_HEADER = ("line", "name", "mobile", "errors")
+
+
+class ImportFormatError(Exception):
+    pass
+
+
+# ----------------------------- READING -----------------------------
+def _header(value):
+    return "_".join(str(value or "").strip().lower().split())
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        # Spreadsheets store mobile numbers and whole amounts as floats.
+        return str(int(value))
+    return str(value).strip()
+
+
+def iter_csv(fileobj):
+    if isinstance(fileobj, io.TextIOBase):
+        lines = fileobj
+    else:
+        # Works for plain binary files and Django UploadedFile alike.
+        lines = codecs.iterdecode(fileobj, "utf-8-sig")
+    reader = csv.reader(lines)
+    header = [_header(h) for h in next(reader, [])]
+    for line, values in enumerate(reader, start=2):
+        yield line, dict(zip(header, (_cell(v) for v in values)))
+
+
+def iter_xlsx(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFormatError("XLSX import needs openpyxl (pip install openpyxl)")
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [_header(h) for h in next(rows, ())]
+        for line, values in enumerate(rows, start=2):
+            yield line, dict(zip(header, (_cell(v) for v in values)))
+    finally:
+        workbook.close()
+
+
+def iter_rows(fileobj, filename):
+    """
+    Yield (line_number, {column: value}) for every data row of the file.
+    """
+    name = (filename or "").lower()
+    if name.endswith(".xlsx"):
+        return iter_xlsx(fileobj)
+    if name.endswith(".csv") or not name:
+        return iter_csv(fileobj)
+    raise ImportFormatError("Only .csv and .xlsx files are supported")
+
+
+# ----------------------------- VALIDATION -----------------------------
+def _present(row, columns):
+    return {c: row[c] for c in columns if row.get(c, "") != ""}
+
+
+def _validate_without_client(serializer_class, data):
+    """
+    Validate detail/EMI data before the client exists: the client FK is
+    filled in after the Client rows are bulk-created.
+    """
+    serializer = serializer_class(data=data)
+    serializer.fields.pop("client", None)
+    serializer.is_valid()
+    return serializer
+
+
+def validate_row(row, default_insurance_type=None):
+    """
+    Returns (client_data, detail_data, emi_data_or_None, errors).
+    """
+    client_data = _present(row, CLIENT_COLUMNS)
+    if default_insurance_type and "insurance_type" not in client_data:
+        client_data["insurance_type"] = default_insurance_type
+
+    client_ser = ClientSerializer(data=client_data)
+    if not client_ser.is_valid():
+        return None, None, None, client_ser.errors
+
+    insurance_type = client_ser.validated_data["insurance_type"]
+    _, detail_serializer, detail_columns = DETAILS[insurance_type]
+    detail = _present(row, detail_columns)
+    if insurance_type == "health":
+        # Same rule as HealthInsuranceViewSet._set_floater_from_ages.
+        detail["floater_type"] = HealthInsurance.floater_type_for(detail.get("ages"))
+
+    errors = {}
+    detail_ser = _validate_without_client(detail_serializer, detail)
+    errors.update(detail_ser.errors)
+
+    emi_data = None
+    emi = _present(row, EMI_COLUMNS)
+    if emi:
+        emi_ser = _validate_without_client(EMIDetailsSerializer, emi)
+        if emi_ser.errors:
+            errors["emi"] = emi_ser.errors
+        else:
+            emi_data = emi_ser.validated_data
+
+    if errors:
+        return None, None, None, errors
+    return client_ser.validated_data, detail_ser.validated_data, emi_data, None
+
+
+# ----------------------------- WRITING -----------------------------
+@dataclass
+class ImportResult:
+    created: int = 0
+    failed: int = 0
+    errors_preview: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {"created": self.created, "failed": self.failed, "errors": self.errors_preview}
+
+
+class ErrorReport:
+    """
+    Streams failed rows to a CSV file object as they are found.
+    """
+
+    def __init__(self, fileobj, result):
+        self.writer = csv.writer(fileobj)
+        self.writer.writerow(REPORT_HEADER)
+        self.result = result
+
+    def add(self, line, row, errors):
+        self.writer.writerow((line, row.get("name", ""), row.get("mobile", ""), json.dumps(errors)))
+        self.result.failed += 1
+        if len(self.result.errors_preview) < ERROR_PREVIEW:
+            self.result.errors_preview.append({"line": line, "errors": errors})
+
+
+def _write_chunk(chunk):
+    """
+    Insert one chunk of validated rows in a single transaction.
+    Returns the (product, month) pairs whose cached counts are now stale.
+    """
+    clients = [
+        Client(**client_data, mobile_normalized=normalize_mobile(client_data.get("mobile")))
+        for _, _, client_data, _, _ in chunk
+    ]
+    with transaction.atomic():
+        Client.objects.bulk_create(clients)
+
+        details = {key: [] for key in DETAILS}
+        emis = []
+        for client, (_, _, _, detail_data, emi_data) in zip(clients, chunk):
+            model = DETAILS[client.insurance_type][0]
+            details[client.insurance_type].append(model(client=client, **detail_data))
+            if emi_data:
+                emis.append(EMIDetails(client=client, **emi_data))
+
+        for key, rows in details.items():
+            if key == "health":
+                members.bulk_create_policies(rows)
+            elif rows:
+                DETAILS[key][0].objects.bulk_create(rows)
+        if emis:
+            EMIDetails.objects.bulk_create(emis)
+            installments.generate(emis)
+
+    stale = set()
+    for rows in details.values():
+        for row in rows:
+            if row.renewal_date:
+                stale.add((product_for_model(type(row)), row.renewal_date.strftime("%Y-%m")))
+    return stale
+
+
+def import_rows(rows, report_file, default_insurance_type=None, chunk_size=CHUNK_SIZE):
+    """
+    Validate and insert rows from iter_rows(). Failed rows go to
+    report_file (a text file object) instead of aborting the import.
+    """
+    result = ImportResult()
+    report = ErrorReport(report_file, result)
+    stale = set()
+    chunk = []
+
+    def flush():
+        nonlocal chunk
+        if not chunk:
+            return
+        try:
+            stale.update(_write_chunk(chunk))
+            result.created += len(chunk)
+        except DatabaseError as exc:
+            for line, row, *_ in chunk:
+                report.add(line, row, {"non_field_errors": [f"chunk insert failed: {exc}"]})
+        chunk = []
+
+    for line, row in rows:
+        if not any(row.values()):
+            continue
+        client_data, detail_data, emi_data, errors = validate_row(row, default_insurance_type)
+        if errors:
+            report.add(line, row, errors)
+            continue
+        chunk.append((line, row, client_data, detail_data, emi_data))
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+
+    # bulk_create skips post_save, so drop cached renewal counts here.
+    today = date.today()
+    for product_key, month in stale:
+        cache.invalidate_renewal_months(product_key, [month], today)
+    if stale:
+        digest.refresh_all()
+
+    return result
@@ -0,0 +1,172 @@
+"""
+EMI installment schedules.
+
+Every EMIDetails plan with a readable emi_tenure ("12", "12 months",
+"1 year") and an amount gets one EMIInstallment per month:
+
+- the amount is monthly_emi_amount, or else emi_amount (the total) split
+  evenly, with the last installment taking the rounding remainder;
+- the first installment falls due on first_due_date, or a month after
+  the plan was created, and each later one a calendar month after the
+  previous, clamped to the end of shorter months.
+
+generate() writes the schedules of any number of plans with one DELETE
+and one bulk INSERT, keeping installments already marked paid. core.signals
+calls it when a plan is saved, bulk loaders call it after bulk_create, and
+migration 0031 backfilled existing plans with it in chunks.
+
+due(), overdue() and collected() total installments per provider for
+/api/emi/due/, /api/emi/overdue/ and /api/emi/collected/, reading the
+(due_date, paid) index.
+"""
+import calendar
+import re
+from datetime import timedelta
+from decimal import ROUND_DOWN, Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import EMIInstallment
+
+
+MAX_INSTALLMENTS = 120
+CENTS = Decimal("0.01")
+TENURE_RE = re.compile(r"(\d+)\s*([a-z]*)", re.IGNORECASE)
+
+
+def tenure_months(text):
+    """
+    Number of monthly installments in a free-text tenure, or None.
+    A bare number counts months; 'y', 'yr(s)' and 'year(s)' count years.
+    """
+    match = TENURE_RE.search(text or "")
+    if not match:
+        return None
+    months = int(match.group(1))
+    if match.group(2).lower() in ("y", "yr", "yrs", "year", "years"):
+        months *= 12
+    return months if 0 < months <= MAX_INSTALLMENTS else None
+
+
+def add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(index, 12)
+    month += 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def first_due_date(emi):
+    if emi.first_due_date:
+        return emi.first_due_date
+    created = timezone.localdate(emi.created_at) if emi.created_at else timezone.localdate()
+    return add_months(created, 1)
+
+
+def amounts(emi, count):
+    """
+    Installment amounts for a plan of `count` months, or [] without one.
+    """
+    monthly = Decimal(emi.monthly_emi_amount or 0)
+    if monthly > 0:
+        return [monthly.quantize(CENTS)] * count
+    total = Decimal(emi.emi_amount or 0)
+    if total <= 0:
+        return []
+    share = (total / count).quantize(CENTS, rounding=ROUND_DOWN)
+    return [share] * (count - 1) + [total - share * (count - 1)]
+
+
+def schedule(emi):
+    """
+    Unsaved EMIInstallment rows for one plan.
+    """
+    count = tenure_months(emi.emi_tenure)
+    if count is None:
+        return []
+    first = first_due_date(emi)
+    return [
+        EMIInstallment(emi_id=emi.pk, number=number, due_date=add_months(first, number - 1), amount=amount)
+        for number, amount in enumerate(amounts(emi, count), start=1)
+    ]
+
+
+def generate(emis, batch_size=1000):
+    """
+    (Re)write the schedules of saved EMIDetails rows. Installments marked
+    paid keep their paid status when their number is still scheduled.
+    Returns the number of installments written.
+    """
+    emis = list(emis)
+    if not emis:
+        return 0
+    ids = [emi.pk for emi in emis]
+    with transaction.atomic():
+        existing = EMIInstallment.objects.filter(emi_id__in=ids)
+        paid = {
+            (emi_id, number): paid_at
+            for emi_id, number, paid_at in existing.filter(paid=True).values_list("emi_id", "number", "paid_at")
+        }
+        existing.delete()
+        rows = [row for emi in emis for row in schedule(emi)]
+        for row in rows:
+            if (row.emi_id, row.number) in paid:
+                row.paid, row.paid_at = True, paid[row.emi_id, row.number]
+        EMIInstallment.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+# ----------------------------- TOTALS -----------------------------
+def installment_queryset():
+    return EMIInstallment.objects.filter(emi__client__deleted_at__isnull=True)
+
+
+def by_provider(queryset):
+    """
+    {"providers": [...], "total": {...}} with the installment count and
+    amount per EMI provider, in one grouped query.
+    """
+    rows = (
+        queryset.values("emi__emi_provider")
+        .annotate(installments=Count("id"), amount=Sum("amount"))
+        .order_by("emi__emi_provider")
+    )
+    providers = [
+        {"provider": row["emi__emi_provider"], "installments": row["installments"], "amount": str(row["amount"].quantize(CENTS))}
+        for row in rows
+    ]
+    total = sum((Decimal(p["amount"]) for p in providers), Decimal(0))
+    return {
+        "providers": providers,
+        "total": {"installments": sum(p["installments"] for p in providers), "amount": str(total.quantize(CENTS))},
+    }
+
+
+def due(start, end):
+    """
+    Unpaid installments due between start and end (inclusive).
+    """
+    qs = installment_queryset().filter(due_date__gte=start, due_date__lte=end, paid=False)
+    return {"from": start, "to": end, **by_provider(qs)}
+
+
+def overdue(today):
+    qs = installment_queryset().filter(due_date__lt=today, paid=False)
+    return {"before": today, **by_provider(qs)}
+
+
+def collected(start, end):
+    """
+    Installments marked paid between start and end (inclusive dates).
+    """
+    qs = installment_queryset().filter(paid=True, paid_at__date__gte=start, paid_at__date__lte=end)
+    return {"from": start, "to": end, **by_provider(qs)}
+
+
+def this_week(today):
+    """
+    Monday to Sunday of the week containing `today`.
+    """
+    start = today - timedelta(days=today.weekday())
+    return start, start + timedelta(days=6)
@@ -0,0 +1,100 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every read endpoint against synthetic books of increasing size. "
+        "Runs in a separate test database; the configured database is not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales",
+            help="Comma separated client counts (default: 1000,10000,100000; 10000 with --rendering)",
+        )
+        parser.add_argument("--repeat", type=int, default=benchmark.REPEAT, help="Requests per route")
+        parser.add_argument("--warm-cache", action="store_true", help="Do not clear the cache between requests")
+        parser.add_argument("--routes", help="Comma separated route names to run (default: all)")
+        parser.add_argument("--output", default="benchmark.json", help="Where to write the JSON results")
+        parser.add_argument("--compare", help="Earlier results JSON to compare p50 latencies with")
+        parser.add_argument(
+            "--servers", action="store_true",
+            help="Compare the sync views under WSGI with the async views under ASGI instead",
+        )
+        parser.add_argument(
+            "--rendering", action="store_true",
+            help="Time JSON rendering and compression of the list routes at the largest scale instead",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=benchmark.CONCURRENCY, help="Requests in flight (--servers)",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=benchmark.SERVER_REQUESTS, help="Requests per route (--servers)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(s) for s in (options["scales"] or "").split(",") if s.strip()]
+        except ValueError:
+            raise CommandError("--scales must be comma separated integers")
+        if not scales:
+            scales = [benchmark.RENDER_SCALE] if options["rendering"] else list(benchmark.SCALES)
+        if options["servers"]:
+            routes = benchmark.SERVER_ROUTES
+        elif options["rendering"]:
+            routes = benchmark.RENDER_ROUTES
+        else:
+            routes = benchmark.ROUTES
+        if options["routes"]:
+            wanted = set(options["routes"].split(","))
+            unknown = wanted - {route[0] for route in routes}
+            if unknown:
+                raise CommandError(f"Unknown routes: {', '.join(sorted(unknown))}")
+            routes = [r for r in routes if r[0] in wanted]
+
+        # The per-request metric lines would drown the report; budget warnings stay.
+        logging.getLogger("core.metrics").setLevel(logging.WARNING)
+        setup_test_environment()
+        # Only the default test database exists: reads must not go to a
+        # configured replica.
+        routers = override_settings(DATABASE_ROUTERS=[])
+        routers.enable()
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={"default"})
+        try:
+            if options["rendering"]:
+                results = benchmark.run_rendering(max(scales), options["repeat"], routes, log=self.stdout.write)
+            elif options["servers"]:
+                results = benchmark.run_servers(
+                    scales, options["requests"], options["concurrency"], options["warm_cache"], routes,
+                    log=self.stdout.write,
+                )
+            else:
+                results = benchmark.run(
+                    scales, options["repeat"], options["warm_cache"], routes, log=self.stdout.write,
+                )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            routers.disable()
+            teardown_test_environment()
+
+        benchmark.dump(results, options["output"])
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if options["compare"] and not (options["servers"] or options["rendering"]):
+            with open(options["compare"]) as f:
+                previous = json.load(f)
+            for scale, name, before, after, ratio in benchmark.compare(results, previous):
+                change = f"{ratio:.2f}x" if ratio is not None else "n/a"
+                self.stdout.write(f"{scale:>7} {name:28} {before:9.1f} -> {after:9.1f} ms  {change}")
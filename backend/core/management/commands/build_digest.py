@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core.digest import prune, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the day's reminder and renewal digest served by /api/digest/. "
+        "Run it from cron shortly after midnight: 5 0 * * * python manage.py build_digest"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Day to build (YYYY-MM-DD); defaults to today")
+        parser.add_argument("--keep-days", type=int, default=30, help="Delete digests older than this")
+
+    def handle(self, *args, **options):
+        day = None
+        if options["date"]:
+            day = parse_date(options["date"])
+            if day is None:
+                raise CommandError("--date must be YYYY-MM-DD")
+
+        snapshot = rebuild(day)
+        notes = snapshot.data["notes"]
+        self.stdout.write(
+            f"Built digest for {snapshot.day}: {notes['today']['count']} due today, "
+            f"{notes['overdue']['count']} overdue, "
+            + ", ".join(f"{key} {section['next_30_days']}" for key, section in snapshot.data["renewals"].items())
+            + " renewals in 30 days"
+        )
+        self.stdout.write(f"Pruned {prune(options['keep_days'])} old digests")
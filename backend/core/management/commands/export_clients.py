@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from core.exporter import CHUNK_SIZE, FORMATS, iter_export
+
+
+class Command(BaseCommand):
+    help = (
+        "Export every client with details, EMIs, quotes, conversions and notes "
+        "as NDJSON or CSV, in constant memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default="ndjson")
+        parser.add_argument(
+            "--insurance-type", choices=["vehicle", "health", "investment"]
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--output", "-o", help="File to write (default: stdout)")
+
+    def handle(self, *args, **options):
+        chunks = iter_export(
+            options["format"],
+            insurance_type=options["insurance_type"],
+            chunk_size=options["chunk_size"],
+        )
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as out:
+                for chunk in chunks:
+                    out.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
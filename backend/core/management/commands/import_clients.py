@@ -0,0 +1,51 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer import CHUNK_SIZE, ImportFormatError, import_rows, iter_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Import clients with their vehicle/health/investment details and EMIs "
+        "from a CSV or XLSX file. Bad rows are written to an error report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or XLSX file to import")
+        parser.add_argument(
+            "--insurance-type",
+            choices=["vehicle", "health", "investment"],
+            help="Used for rows without an insurance_type column",
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            "--errors",
+            help="Where to write the error report (default: <path>.errors.csv)",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"{path} does not exist")
+        report_path = Path(options["errors"] or f"{path}.errors.csv")
+
+        with path.open("rb") as source, report_path.open("w", newline="") as report:
+            try:
+                rows = iter_rows(source, path.name)
+                result = import_rows(
+                    rows,
+                    report,
+                    default_insurance_type=options["insurance_type"],
+                    chunk_size=options["chunk_size"],
+                )
+            except ImportFormatError as exc:
+                raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(f"Created {result.created} clients"))
+        if result.failed:
+            self.stdout.write(self.style.WARNING(
+                f"{result.failed} rows failed, see {report_path}"
+            ))
+        else:
+            report_path.unlink()
@@ -0,0 +1,40 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.renditions import BATCH_SIZE, process_pending, requeue
+
+
+logger = logging.getLogger("core.renditions")
+
+
+class Command(BaseCommand):
+    help = "Create compressed archive and preview renditions for uploaded documents."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count, 0 = no pool)")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--max-documents", type=int, help="Stop after this many documents")
+        parser.add_argument("--requeue", action="store_true", help="Re-queue failed and interrupted documents first")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new documents")
+        parser.add_argument("--sleep", type=float, default=10, help="Seconds between polls with --loop")
+
+    def handle(self, *args, **options):
+        if options["requeue"]:
+            self.stdout.write(f"Re-queued {requeue()} documents")
+
+        while True:
+            try:
+                counts = process_pending(options["workers"], options["batch_size"], options["max_documents"])
+                if counts:
+                    summary = ", ".join(f"{status} {n}" for status, n in sorted(counts.items()))
+                    self.stdout.write(f"Processed documents: {summary}")
+            except Exception:
+                if not options["loop"]:
+                    raise
+                # Documents this pass had claimed are queued again once stale.
+                logger.exception("Document processing pass failed")
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
@@ -0,0 +1,45 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.purge import BATCH_SIZE, process_pending, reap_abandoned_uploads, retry_failed
+
+
+logger = logging.getLogger("core.purge")
+
+
+class Command(BaseCommand):
+    help = (
+        "Purge soft-deleted clients: child rows in batches, then document files and the client. "
+        "Also deletes presigned uploads that were never confirmed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--max-jobs", type=int, help="Stop after this many jobs")
+        parser.add_argument("--retry-failed", action="store_true", help="Re-queue failed jobs first")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new jobs")
+        parser.add_argument("--sleep", type=float, default=10, help="Seconds between polls with --loop")
+
+    def handle(self, *args, **options):
+        if options["retry_failed"]:
+            self.stdout.write(f"Re-queued {retry_failed()} failed purges")
+
+        while True:
+            try:
+                processed = process_pending(options["batch_size"], options["max_jobs"])
+                if processed:
+                    self.stdout.write(f"Processed {processed} purges")
+                reaped = reap_abandoned_uploads(options["batch_size"])
+                if reaped:
+                    self.stdout.write(f"Deleted {reaped} abandoned uploads")
+            except Exception:
+                if not options["loop"]:
+                    raise
+                # A database or storage outage must not end the worker; the
+                # next pass picks up whatever this one left behind.
+                logger.exception("Purge pass failed")
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from core.analytics import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the conversion analytics rollups from LeadConversion and InvestmentConversion."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Wrote {rebuild()} rollup rows")
@@ -0,0 +1,125 @@
+"""
+Health policy members, parsed out of the free-text HealthInsurance.ages.
+
+HealthInsurance.save() keeps the member_count and max_age columns in step
+with `ages`. The HealthMember rows (one per parsed age) are rewritten by
+core.signals when `ages` changes, and written by bulk loaders through
+bulk_create_policies(). Migration 0029 backfilled both for existing
+policies.
+
+filter_policies() answers the age filters of /api/health-insurance/ from
+the indexes on those columns and on HealthMember (age, policy), without
+parsing any text:
+
+    ?max_age_gte=60&floater_type=family&renewal_from=2026-01-01&renewal_to=2026-03-31
+    ?members=2            ?members_gte=3&members_lte=4
+    ?age_band=0-17        (at least one member aged 0 to 17)
+"""
+from django.utils.dateparse import parse_date
+
+from .models import HealthInsurance, HealthMember, parse_ages
+
+
+class AgeFilterError(ValueError):
+    pass
+
+
+def member_rows(policy):
+    return [
+        HealthMember(policy_id=policy.pk, position=position, age=age)
+        for position, age in enumerate(parse_ages(policy.ages))
+    ]
+
+
+def sync(policy):
+    """
+    Rewrite the member rows of one saved policy.
+    """
+    HealthMember.objects.filter(policy_id=policy.pk).delete()
+    HealthMember.objects.bulk_create(member_rows(policy))
+
+
+def bulk_create_policies(policies, batch_size=None):
+    """
+    bulk_create unsaved HealthInsurance rows together with their summary
+    columns and member rows, which save() and the signals would otherwise
+    have written.
+    """
+    for policy in policies:
+        policy.set_member_summary()
+    HealthInsurance.objects.bulk_create(policies, batch_size=batch_size)
+    HealthMember.objects.bulk_create(
+        [row for policy in policies for row in member_rows(policy)], batch_size=batch_size,
+    )
+    return policies
+
+
+# ----------------------------- FILTERS -----------------------------
+RANGE_FILTERS = {
+    # query parameter -> HealthInsurance lookup
+    "max_age_gte": "max_age__gte",
+    "max_age_lte": "max_age__lte",
+    "members": "member_count",
+    "members_gte": "member_count__gte",
+    "members_lte": "member_count__lte",
+}
+
+
+def _int_param(params, name):
+    raw = params.get(name)
+    if raw in (None, ""):
+        return None
+    try:
+        value = int(raw)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise AgeFilterError(f"{name} must be a non-negative integer")
+    return value
+
+
+def _age_band(raw):
+    low, sep, high = raw.partition("-")
+    try:
+        low, high = int(low), int(high)
+    except ValueError:
+        low = high = None
+    if not sep or low is None or low < 0 or high < low:
+        raise AgeFilterError("age_band must be LOW-HIGH, e.g. 60-80")
+    return low, high
+
+
+def filter_policies(queryset, params):
+    """
+    Apply the age, floater and renewal date filters in `params` (query
+    parameters). Raises AgeFilterError for malformed values.
+    """
+    lookups = {}
+    for name, lookup in RANGE_FILTERS.items():
+        value = _int_param(params, name)
+        if value is not None:
+            lookups[lookup] = value
+
+    for name, lookup in (("renewal_from", "renewal_date__gte"), ("renewal_to", "renewal_date__lte")):
+        raw = params.get(name)
+        if raw:
+            try:
+                value = parse_date(raw)
+            except ValueError:
+                value = None
+            if value is None:
+                raise AgeFilterError(f"{name} must be YYYY-MM-DD")
+            lookups[lookup] = value
+
+    if params.get("floater_type"):
+        lookups["floater_type"] = params["floater_type"]
+    queryset = queryset.filter(**lookups)
+
+    if params.get("age_band"):
+        low, high = _age_band(params["age_band"])
+        # Semi-join on the (age, policy) index; no duplicates for policies
+        # with several members in the band.
+        queryset = queryset.filter(
+            id__in=HealthMember.objects.filter(age__gte=low, age__lte=high).values("policy_id")
+        )
+    return queryset
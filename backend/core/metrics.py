@@ -0,0 +1,209 @@
+"""
+Per-request query count, DB time, serializer time and response size.
+
+QueryMetricsMiddleware measures every request served by a view in
+core.views or core.async_views and reports it three ways:
+
+- a Server-Timing header (db, ser and app durations, the query count and
+  the response size), visible in the browser's network panel;
+- one JSON log line per request on the "core.metrics" logger;
+- a warning on the same logger when the endpoint's query budget
+  (settings.QUERY_BUDGETS) is exceeded.
+
+Endpoints are named by URL name ("client-list", "note-summary") or, for
+unnamed function views, by function name ("health_renewal_summary").
+
+Queries are counted by a database execute wrapper. Serializer time is
+what the API's own code marks with serializing(): the fast path building
+rows into dicts (core.fastpath) and the JSON renderer turning the data
+into bytes (core.renderers); ModelSerializer work inside a view counts
+as app time. Both report into the RequestMetrics of the current request,
+held in a context variable, which async views share with the threads
+their ORM calls run in. The response keeps its metrics as
+`response.query_metrics` so tests can check budgets too.
+"""
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+
+logger = logging.getLogger("core.metrics")
+
+VIEW_MODULES = ("core.views", "core.async_views")
+
+_current = ContextVar("core_request_metrics", default=None)
+
+
+@dataclass
+class RequestMetrics:
+    method: str
+    path: str
+    endpoint: str = ""
+    status: int = 0
+    queries: int = 0
+    db_ms: float = 0.0
+    serializer_ms: float = 0.0
+    total_ms: float = 0.0
+    response_bytes: Optional[int] = None
+    budget: Optional[int] = None
+    _serializing: bool = field(default=False, repr=False)
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.queries > self.budget
+
+    def server_timing(self):
+        parts = [
+            f'db;dur={self.db_ms:.1f};desc="{self.queries} queries"',
+            f"ser;dur={self.serializer_ms:.1f}",
+            f"app;dur={self.total_ms:.1f}",
+        ]
+        if self.response_bytes is not None:
+            parts.append(f'size;desc="{self.response_bytes} bytes"')
+        return ", ".join(parts)
+
+    def as_dict(self):
+        data = asdict(self)
+        del data["_serializing"]
+        for key in ("db_ms", "serializer_ms", "total_ms"):
+            data[key] = round(data[key], 2)
+        return data
+
+
+def budget_for(method, endpoint):
+    """
+    A "POST note-list" style key wins; a bare endpoint key covers reads only.
+    """
+    budgets = getattr(settings, "QUERY_BUDGETS", {})
+    key = f"{method} {endpoint}"
+    if key in budgets:
+        return budgets[key]
+    if method in ("GET", "HEAD") and endpoint in budgets:
+        return budgets[endpoint]
+    return getattr(settings, "QUERY_BUDGET_DEFAULT", None)
+
+
+def endpoint_name(resolver_match):
+    name = resolver_match.view_name
+    for module in VIEW_MODULES:
+        if name.startswith(module + "."):
+            return name[len(module) + 1:]
+    return name
+
+
+# ----------------------------- HOOKS -----------------------------
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_ms += (time.perf_counter() - start) * 1000
+
+
+def add_query_wrapper(sender, connection, **kwargs):
+    """
+    connection_created receiver: every new connection reports its queries.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serializing():
+    """
+    Count the block as serializer time. Only the outermost block is
+    timed; nested serializers run inside it.
+    """
+    metrics = _current.get()
+    if metrics is None or metrics._serializing:
+        yield
+        return
+    metrics._serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._serializing = False
+        metrics.serializer_ms += (time.perf_counter() - start) * 1000
+
+
+def install():
+    """
+    Hook query counting in. Called from CoreConfig.ready().
+    """
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    connection_created.connect(add_query_wrapper, dispatch_uid="core.metrics")
+    for alias in connections:
+        # Connections opened before ready() ran (e.g. by the test runner).
+        if connections[alias].connection is not None:
+            add_query_wrapper(None, connections[alias])
+
+
+# ----------------------------- MIDDLEWARE -----------------------------
+@sync_and_async_middleware
+def QueryMetricsMiddleware(get_response):
+    """
+    Works under WSGI and ASGI. The endpoint is read from the resolved view
+    after the response, so the async path never hops to a thread.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            metrics, token = _start(request)
+            start = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            return _finish(request, response, metrics, start)
+    else:
+        def middleware(request):
+            metrics, token = _start(request)
+            start = time.perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            return _finish(request, response, metrics, start)
+    return middleware
+
+
+def _start(request):
+    metrics = RequestMetrics(method=request.method, path=request.path)
+    return metrics, _current.set(metrics)
+
+
+def _finish(request, response, metrics, start):
+    match = getattr(request, "resolver_match", None)
+    if match is None or match.func.__module__ not in VIEW_MODULES:
+        return response
+
+    metrics.endpoint = endpoint_name(match)
+    metrics.total_ms = (time.perf_counter() - start) * 1000
+    metrics.status = response.status_code
+    if not response.streaming:
+        metrics.response_bytes = len(response.content)
+    metrics.budget = budget_for(metrics.method, metrics.endpoint)
+
+    response["Server-Timing"] = metrics.server_timing()
+    response.query_metrics = metrics
+    logger.info(json.dumps(metrics.as_dict()))
+    if metrics.over_budget:
+        logger.warning(
+            "%s %s ran %d queries, over its budget of %d",
+            metrics.method, metrics.endpoint, metrics.queries, metrics.budget,
+        )
+    return response
@@ -0,0 +1,115 @@
+import re
+
+from django.db import migrations, models, transaction
+
+
+BATCH_SIZE = 2000
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS core_client_name_trgm ON core_client USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS core_client_place_trgm ON core_client USING gin (place gin_trgm_ops)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS core_client_name_trgm",
+    "DROP INDEX IF EXISTS core_client_place_trgm",
+]
+
+# External-content FTS5 table: stores only the trigram index, the text
+# itself stays in core_client. Triggers keep it in step with the table.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS core_client_fts USING fts5(
+        name, place, content='core_client', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_client_fts_ai AFTER INSERT ON core_client BEGIN
+        INSERT INTO core_client_fts(rowid, name, place) VALUES (new.id, new.name, new.place);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_client_fts_ad AFTER DELETE ON core_client BEGIN
+        INSERT INTO core_client_fts(core_client_fts, rowid, name, place)
+        VALUES ('delete', old.id, old.name, old.place);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_client_fts_au AFTER UPDATE OF name, place ON core_client BEGIN
+        INSERT INTO core_client_fts(core_client_fts, rowid, name, place)
+        VALUES ('delete', old.id, old.name, old.place);
+        INSERT INTO core_client_fts(rowid, name, place) VALUES (new.id, new.name, new.place);
+    END
+    """,
+    "INSERT INTO core_client_fts(core_client_fts) VALUES ('rebuild')",
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS core_client_fts_ai",
+    "DROP TRIGGER IF EXISTS core_client_fts_ad",
+    "DROP TRIGGER IF EXISTS core_client_fts_au",
+    "DROP TABLE IF EXISTS core_client_fts",
+]
+
+
+def normalize_mobile(value):
+    # Frozen copy of core.models.normalize_mobile.
+    digits = re.sub(r"\D", "", value or "")
+    if len(digits) > 10 and digits.startswith("91"):
+        digits = digits[2:]
+    return digits.lstrip("0")
+
+
+def backfill_mobile_normalized(apps, schema_editor):
+    Client = apps.get_model("core", "Client")
+    alias = schema_editor.connection.alias
+    last_id = 0
+    while True:
+        with transaction.atomic(using=alias):
+            batch = list(
+                Client.objects.using(alias).filter(id__gt=last_id).order_by("id").only("id", "mobile")[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+            for client in batch:
+                client.mobile_normalized = normalize_mobile(client.mobile)
+            Client.objects.using(alias).bulk_update(batch, ["mobile_normalized"])
+        last_id = batch[-1].id
+
+
+def _run(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == "sqlite":
+        _run(schema_editor, SQLITE_FORWARD)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _run(schema_editor, POSTGRES_REVERSE)
+    elif vendor == "sqlite":
+        _run(schema_editor, SQLITE_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_alter_client_insurance_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='mobile_normalized',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=15),
+        ),
+        migrations.RunPython(backfill_mobile_normalized, migrations.RunPython.noop),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.27 on 2026-10-18 19:44
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_client_mobile_normalized_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='version',
+            field=models.CharField(default=core.models.new_version, editable=False, max_length=32),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.27 on 2026-10-18 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_client_soft_delete_purge'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='archive_file',
+            field=models.FileField(blank=True, default='', upload_to='documents/archive/'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='preview_file',
+            field=models.FileField(blank=True, default='', upload_to='documents/preview/'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='processing',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('skipped', 'Skipped'), ('failed', 'Failed')], db_index=True, default='queued', max_length=10),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.27 on 2026-10-18 19:56
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import CharField, Count, F, Sum, Value
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def build_rollups(apps, schema_editor):
+    # Frozen copy of core.analytics.rebuild() for the existing conversions.
+    ConversionRollup = apps.get_model('core', 'ConversionRollup')
+    LeadConversion = apps.get_model('core', 'LeadConversion')
+    InvestmentConversion = apps.get_model('core', 'InvestmentConversion')
+
+    alias = schema_editor.connection.alias
+    zero = Value(Decimal(0))
+    sources = (
+        (LeadConversion, F('client__insurance_type'), Sum('premium_amount'), zero),
+        (InvestmentConversion, Value('investment', output_field=CharField()), zero, Sum('investment_amount')),
+    )
+    rows = []
+    for model, insurance_type, premium, investment in sources:
+        grouped = (
+            model.objects.using(alias).annotate(day=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+            .values('day', 'company_name', 'posp_code', insurance_type=insurance_type)
+            .annotate(conversions=Count('id'), premium_total=premium, investment_total=investment)
+            .order_by()
+        )
+        rows += [ConversionRollup(**row) for row in grouped]
+    ConversionRollup.objects.using(alias).bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_document_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('insurance_type', models.CharField(max_length=10)),
+                ('company_name', models.CharField(max_length=200)),
+                ('posp_code', models.CharField(max_length=100)),
+                ('conversions', models.PositiveIntegerField(default=0)),
+                ('premium_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('investment_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='conversionrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'insurance_type', 'company_name', 'posp_code'), name='conversion_rollup_key'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.27 on 2026-10-18 20:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_daily_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HealthMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField()),
+                ('age', models.PositiveSmallIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='healthinsurance',
+            name='max_age',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='healthinsurance',
+            name='member_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='healthinsurance',
+            index=models.Index(fields=['max_age', 'renewal_date'], name='health_max_age_renewal'),
+        ),
+        migrations.AddIndex(
+            model_name='healthinsurance',
+            index=models.Index(fields=['member_count', 'max_age'], name='health_member_count_age'),
+        ),
+        migrations.AddField(
+            model_name='healthmember',
+            name='policy',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='core.healthinsurance'),
+        ),
+        migrations.AddIndex(
+            model_name='healthmember',
+            index=models.Index(fields=['age', 'policy'], name='health_member_age'),
+        ),
+        migrations.AddConstraint(
+            model_name='healthmember',
+            constraint=models.UniqueConstraint(fields=('policy', 'position'), name='health_member_position'),
+        ),
+    ]
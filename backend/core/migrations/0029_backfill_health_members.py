@@ -0,0 +1,62 @@
+import re
+
+from django.db import migrations, transaction
+
+
+CHUNK_SIZE = 2000
+MAX_MEMBER_AGE = 120
+
+
+def parse_ages(value):
+    # Frozen copy of core.models.parse_ages.
+    ages = []
+    for part in str(value or '').split(','):
+        match = re.search(r'\d+', part)
+        if match and int(match.group()) <= MAX_MEMBER_AGE:
+            ages.append(int(match.group()))
+    return ages
+
+
+def backfill_members(apps, schema_editor):
+    """
+    Parse every policy's ages into HealthMember rows and the summary
+    columns, one committed chunk at a time in primary key order. Each
+    chunk replaces its own rows, so a rerun after an interruption is safe.
+    """
+    HealthInsurance = apps.get_model('core', 'HealthInsurance')
+    HealthMember = apps.get_model('core', 'HealthMember')
+    alias = schema_editor.connection.alias
+    last = 0
+    while True:
+        with transaction.atomic(using=alias):
+            chunk = list(
+                HealthInsurance.objects.using(alias).filter(pk__gt=last).order_by('pk').only('id', 'ages')[:CHUNK_SIZE]
+            )
+            if not chunk:
+                break
+            members = []
+            for policy in chunk:
+                ages = parse_ages(policy.ages)
+                policy.member_count = len(ages)
+                policy.max_age = max(ages, default=None)
+                members += [
+                    HealthMember(policy_id=policy.id, position=position, age=age)
+                    for position, age in enumerate(ages)
+                ]
+            HealthInsurance.objects.using(alias).bulk_update(chunk, ['member_count', 'max_age'])
+            HealthMember.objects.using(alias).filter(policy_id__in=[policy.id for policy in chunk]).delete()
+            HealthMember.objects.using(alias).bulk_create(members)
+        last = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Chunks commit one by one instead of in a single long transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0028_health_members'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_members, migrations.RunPython.noop),
+    ]
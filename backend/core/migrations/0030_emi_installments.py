@@ -0,0 +1,38 @@
+# Generated by Django 4.2.27 on 2026-10-18 20:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_backfill_health_members'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emidetails',
+            name='first_due_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='EMIInstallment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveSmallIntegerField()),
+                ('due_date', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('paid', models.BooleanField(default=False)),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+                ('emi', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='installments', to='core.emidetails')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['due_date', 'paid'], name='emi_installment_due')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='emiinstallment',
+            constraint=models.UniqueConstraint(fields=('emi', 'number'), name='emi_installment_number'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+import calendar
+import re
+from decimal import ROUND_DOWN, Decimal
+
+from django.db import migrations, transaction
+from django.utils import timezone
+
+
+CHUNK_SIZE = 1000
+MAX_INSTALLMENTS = 120
+CENTS = Decimal('0.01')
+TENURE_RE = re.compile(r'(\d+)\s*([a-z]*)', re.IGNORECASE)
+
+
+# Frozen copy of the schedule rules in core.installments.
+def tenure_months(text):
+    match = TENURE_RE.search(text or '')
+    if not match:
+        return None
+    months = int(match.group(1))
+    if match.group(2).lower() in ('y', 'yr', 'yrs', 'year', 'years'):
+        months *= 12
+    return months if 0 < months <= MAX_INSTALLMENTS else None
+
+
+def add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(index, 12)
+    month += 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def amounts(emi, count):
+    monthly = Decimal(emi.monthly_emi_amount or 0)
+    if monthly > 0:
+        return [monthly.quantize(CENTS)] * count
+    total = Decimal(emi.emi_amount or 0)
+    if total <= 0:
+        return []
+    share = (total / count).quantize(CENTS, rounding=ROUND_DOWN)
+    return [share] * (count - 1) + [total - share * (count - 1)]
+
+
+def installment_rows(EMIInstallment, emi):
+    count = tenure_months(emi.emi_tenure)
+    if count is None:
+        return []
+    first = emi.first_due_date or add_months(timezone.localdate(emi.created_at), 1)
+    return [
+        EMIInstallment(emi_id=emi.pk, number=number, due_date=add_months(first, number - 1), amount=amount)
+        for number, amount in enumerate(amounts(emi, count), start=1)
+    ]
+
+
+def backfill_installments(apps, schema_editor):
+    """
+    Generate the schedule of every existing plan, one committed chunk at
+    a time in primary key order. Each chunk replaces its own rows, so a
+    rerun after an interruption is safe.
+    """
+    EMIDetails = apps.get_model('core', 'EMIDetails')
+    EMIInstallment = apps.get_model('core', 'EMIInstallment')
+    alias = schema_editor.connection.alias
+    last = 0
+    while True:
+        with transaction.atomic(using=alias):
+            chunk = list(EMIDetails.objects.using(alias).filter(pk__gt=last).order_by('pk')[:CHUNK_SIZE])
+            if not chunk:
+                break
+            rows = [row for emi in chunk for row in installment_rows(EMIInstallment, emi)]
+            EMIInstallment.objects.using(alias).filter(emi_id__in=[emi.pk for emi in chunk]).delete()
+            EMIInstallment.objects.using(alias).bulk_create(rows)
+        last = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Chunks commit one by one instead of in a single long transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0030_emi_installments'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_installments, migrations.RunPython.noop),
+    ]
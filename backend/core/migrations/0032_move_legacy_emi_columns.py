@@ -0,0 +1,105 @@
+import importlib
+
+from django.db import migrations, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+
+CHUNK_SIZE = 1000
+SOURCES = ('VehicleInsurance', 'HealthInsurance')
+LEGACY_FIELDS = ('down_payment', 'policy_tenure', 'emi_tenure', 'monthly_emi_amount')
+LEGACY_DEFAULTS = {'down_payment': 0, 'policy_tenure': '', 'emi_tenure': '', 'monthly_emi_amount': 0}
+DEFAULT_TERM_MONTHS = 12
+
+# Policies whose legacy EMI columns hold anything but their defaults.
+HAS_LEGACY_VALUES = (
+    (Q(down_payment__isnull=False) & ~Q(down_payment=0))
+    | ~Q(policy_tenure='')
+    | ~Q(emi_tenure='')
+    | (Q(monthly_emi_amount__isnull=False) & ~Q(monthly_emi_amount=0))
+)
+
+
+def legacy_first_due_date(schedule, policy):
+    """
+    A month into the policy term ending on the policy's renewal date (the
+    term is policy_tenure, or a year), or None without a renewal date.
+    """
+    if policy.renewal_date is None:
+        return None
+    term = schedule.tenure_months(policy.policy_tenure) or DEFAULT_TERM_MONTHS
+    return schedule.add_months(policy.renewal_date, 1 - term)
+
+
+def move_legacy_emis(apps, schema_editor):
+    """
+    Copy each policy's non-default legacy EMI columns into a new
+    EMIDetails plan and reset the columns, one committed chunk at a time.
+    A policy is only ever picked up while its columns still hold values,
+    so an interrupted run resumes where it stopped when migrate is run
+    again. Counts are checked before 0033 drops the columns.
+
+    Plans are dated from the policy term, not from the migration. The
+    legacy columns never tracked payments, so installments that fell due
+    before today are recorded as paid (without a paid_at, so they do not
+    count as collected) rather than reported as overdue. Plans of
+    policies without a renewal date get no schedule.
+    """
+    EMIDetails = apps.get_model('core', 'EMIDetails')
+    EMIInstallment = apps.get_model('core', 'EMIInstallment')
+    schedule = importlib.import_module('core.migrations.0031_backfill_emi_installments')
+    alias = schema_editor.connection.alias
+    today = timezone.localdate()
+
+    for name in SOURCES:
+        model = apps.get_model('core', name)
+        expected = model.objects.using(alias).filter(HAS_LEGACY_VALUES).count()
+        moved = last = 0
+        while True:
+            with transaction.atomic(using=alias):
+                chunk = list(
+                    model.objects.using(alias).select_for_update()
+                    .filter(HAS_LEGACY_VALUES, pk__gt=last)
+                    .order_by('pk')
+                    .only('id', 'client_id', 'renewal_date', *LEGACY_FIELDS)[:CHUNK_SIZE]
+                )
+                if not chunk:
+                    break
+                plans = EMIDetails.objects.using(alias).bulk_create([
+                    EMIDetails(
+                        client_id=policy.client_id,
+                        first_due_date=legacy_first_due_date(schedule, policy),
+                        **{f: getattr(policy, f) for f in LEGACY_FIELDS},
+                    )
+                    for policy in chunk
+                ])
+                rows = [
+                    row for plan in plans if plan.first_due_date
+                    for row in schedule.installment_rows(EMIInstallment, plan)
+                ]
+                for row in rows:
+                    row.paid = row.due_date < today
+                EMIInstallment.objects.using(alias).bulk_create(rows)
+                model.objects.using(alias).filter(pk__in=[policy.pk for policy in chunk]).update(**LEGACY_DEFAULTS)
+            moved += len(plans)
+            last = chunk[-1].pk
+
+        remaining = model.objects.using(alias).filter(HAS_LEGACY_VALUES).count()
+        if remaining or moved < expected:
+            raise RuntimeError(
+                f'{name}: moved {moved} of {expected} legacy EMI rows and {remaining} remain; '
+                'run migrate again to resume before the columns are dropped'
+            )
+
+
+class Migration(migrations.Migration):
+    # Chunks commit one by one instead of in a single long transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0031_backfill_emi_installments'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_legacy_emis, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.27 on 2026-10-18 20:31
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_move_legacy_emi_columns'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='healthinsurance',
+            name='down_payment',
+        ),
+        migrations.RemoveField(
+            model_name='healthinsurance',
+            name='emi_tenure',
+        ),
+        migrations.RemoveField(
+            model_name='healthinsurance',
+            name='monthly_emi_amount',
+        ),
+        migrations.RemoveField(
+            model_name='healthinsurance',
+            name='policy_tenure',
+        ),
+        migrations.RemoveField(
+            model_name='vehicleinsurance',
+            name='down_payment',
+        ),
+        migrations.RemoveField(
+            model_name='vehicleinsurance',
+            name='emi_tenure',
+        ),
+        migrations.RemoveField(
+            model_name='vehicleinsurance',
+            name='monthly_emi_amount',
+        ),
+        migrations.RemoveField(
+            model_name='vehicleinsurance',
+            name='policy_tenure',
+        ),
+    ]
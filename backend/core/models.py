@@ -1,6 +1,51 @@
+import re
+import uuid
+
 from django.db import models
 
 
+def new_version():
+    return uuid.uuid4().hex
+
+
+def normalize_mobile(value):
+    """
+    Digits-only form of a mobile number used for prefix search.
+    Drops formatting, a leading '+91' country code and a trunk '0',
+    so '+91 98765-43210' and '098765 43210' both become '9876543210'.
+    """
+    digits = re.sub(r"\D", "", value or "")
+    if len(digits) > 10 and digits.startswith("91"):
+        digits = digits[2:]
+    return digits.lstrip("0")
+
+
+MAX_MEMBER_AGE = 120
+
+
+def parse_ages(value):
+    """
+    Member ages from the free-text HealthInsurance.ages, in order: the
+    first number in each comma separated part, so '45, 42 yrs,8' gives
+    [45, 42, 8]. Parts without a plausible age are skipped.
+    """
+    ages = []
+    for part in str(value or "").split(","):
+        match = re.search(r"\d+", part)
+        if match and int(match.group()) <= MAX_MEMBER_AGE:
+            ages.append(int(match.group()))
+    return ages
+
+
+class ClientManager(models.Manager):
+    """
+    Hides soft-deleted clients; they stay in the table until the purge
+    worker (core/purge.py) has removed their child rows and files.
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Client(models.Model):
     INSURANCE_TYPE_CHOICES = (
         ('vehicle', 'Vehicle'),
@@ -15,6 +60,40 @@ class Client(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_converted = models.BooleanField(default=False)
 
+    # Kept in sync by save(); backs /api/clients/search/ mobile prefix lookups.
+    mobile_normalized = models.CharField(max_length=15, blank=True, default='', db_index=True, editable=False)
+
+    # Changes on every write to the client or any of its child rows; used
+    # as the ETag of the client detail response. A random token rather
+    # than a counter, so concurrent writers never produce the same value.
+    version = models.CharField(max_length=32, default=new_version, editable=False)
+
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
+
+    objects = ClientManager()
+    all_objects = models.Manager()
+
+    def save(self, *args, **kwargs):
+        self.mobile_normalized = normalize_mobile(self.mobile)
+        self.version = new_version()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            extra = {"version"}
+            if "mobile" in update_fields:
+                extra.add("mobile_normalized")
+            kwargs["update_fields"] = {*update_fields, *extra}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def touch(cls, client_ids):
+        """
+        Give each client a new version after its child rows were written.
+        """
+        ids = list(client_ids)
+        if ids:
+            for start in range(0, len(ids), 500):
+                cls.objects.filter(pk__in=ids[start:start + 500]).update(version=new_version())
+
     def __str__(self):
         return f"{self.name} - {self.insurance_type}"
 
@@ -86,14 +165,6 @@ class VehicleInsurance(models.Model):
 
     renewal_date = models.DateField(null=True, blank=True,db_index=True)
 
-    # ⚠️ Legacy single-EMI fields — kept for backward compatibility with
-    # existing data, but the UI now uses the EMIDetails model below
-    # (supports multiple EMIs per client with a provider field).
-    down_payment = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, default=0)
-    policy_tenure = models.CharField(max_length=100, blank=True, default='')
-    emi_tenure = models.CharField(max_length=100, blank=True, default='')
-    monthly_emi_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, default=0)
-
     def __str__(self):
         return f"{self.client.name} - Vehicle"
 
@@ -117,18 +188,63 @@ class HealthInsurance(models.Model):
     renewal_date = models.DateField(null=True, blank=True,db_index=True)
     renewal_dismissed = models.BooleanField(default=False)
 
-    # ⚠️ Legacy single-EMI fields — kept for backward compatibility with
-    # existing data, but the UI now uses the EMIDetails model below
-    # (supports multiple EMIs per client with a provider field).
-    down_payment = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, default=0)
-    policy_tenure = models.CharField(max_length=100, blank=True, default='')
-    emi_tenure = models.CharField(max_length=100, blank=True, default='')
-    monthly_emi_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, default=0)
+    # Kept in sync with `ages` by save(); HealthMember holds one row per
+    # age. Together they back the age filters of /api/health-insurance/.
+    member_count = models.PositiveSmallIntegerField(default=0, editable=False)
+    max_age = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['max_age', 'renewal_date'], name='health_max_age_renewal'),
+            models.Index(fields=['member_count', 'max_age'], name='health_member_count_age'),
+        ]
+
+    def set_member_summary(self):
+        ages = parse_ages(self.ages)
+        self.member_count = len(ages)
+        self.max_age = max(ages, default=None)
+
+    def save(self, *args, **kwargs):
+        self.set_member_summary()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "ages" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "member_count", "max_age"}
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def floater_type_for(ages):
+        """
+        'individual' for a single age (or none), 'family' for two or more.
+        """
+        ages_list = [a.strip() for a in str(ages or "").split(",") if a.strip()]
+        count = len(ages_list) if len(ages_list) > 0 else 1
+        return "individual" if count == 1 else "family"
 
     def __str__(self):
         return f"{self.client.name} - Health ({self.floater_type})"
 
 
+class HealthMember(models.Model):
+    """
+    One insured member of a health policy, parsed from HealthInsurance.ages
+    (see core/members.py).
+    """
+    policy = models.ForeignKey(HealthInsurance, on_delete=models.CASCADE, related_name='members')
+    position = models.PositiveSmallIntegerField()
+    age = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['policy', 'position'], name='health_member_position'),
+        ]
+        indexes = [
+            models.Index(fields=['age', 'policy'], name='health_member_age'),
+        ]
+
+    def __str__(self):
+        return f"Member {self.position} of policy {self.policy_id} ({self.age})"
+
+
 class EMIDetails(models.Model):
     """
     Multiple EMI plans per client (e.g. a client may have taken more
@@ -147,6 +263,8 @@ class EMIDetails(models.Model):
     policy_tenure = models.CharField(max_length=100, blank=True, default='')
     emi_tenure = models.CharField(max_length=100, blank=True, default='')
     monthly_emi_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, default=0)
+    # Defaults to a month after created_at; see core/installments.py.
+    first_due_date = models.DateField(null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -157,6 +275,30 @@ class EMIDetails(models.Model):
         return f"{self.client.name} - EMI ({self.emi_provider or 'Unnamed'})"
 
 
+class EMIInstallment(models.Model):
+    """
+    One monthly installment of an EMIDetails plan, generated by
+    core/installments.py whenever the plan is created or edited.
+    """
+    emi = models.ForeignKey(EMIDetails, on_delete=models.CASCADE, related_name='installments')
+    number = models.PositiveSmallIntegerField()
+    due_date = models.DateField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    paid = models.BooleanField(default=False)
+    paid_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['emi', 'number'], name='emi_installment_number'),
+        ]
+        indexes = [
+            models.Index(fields=['due_date', 'paid'], name='emi_installment_due'),
+        ]
+
+    def __str__(self):
+        return f"Installment {self.number} of EMI {self.emi_id} due {self.due_date}"
+
+
 class Quote(models.Model):
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='quotes')
     company_name = models.CharField(max_length=100)
@@ -204,10 +346,115 @@ class Document(models.Model):
         ('policy', 'Old Policy'),
     )
 
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('active', 'Active'),
+    )
+
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='documents')
     document_type = models.CharField(max_length=20, choices=DOCUMENT_TYPE_CHOICES)
     file = models.FileField(upload_to='documents/')
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    # Direct-to-storage uploads (core/uploads.py) start as 'pending' and
+    # become 'active' once the confirm step has checked the object.
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active', db_index=True)
+    size = models.PositiveBigIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True, default='')
+
+    # Renditions written by `manage.py process_documents` (core/renditions.py).
+    # Empty until processed; the original `file` is always kept.
+    PROCESSING_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('skipped', 'Skipped'),
+        ('failed', 'Failed'),
+    )
+    archive_file = models.FileField(upload_to='documents/archive/', blank=True, default='')
+    preview_file = models.FileField(upload_to='documents/preview/', blank=True, default='')
+    processing = models.CharField(max_length=10, choices=PROCESSING_CHOICES, default='queued', db_index=True)
+    # When a worker claimed it ('running' rows left by a dead worker are
+    # queued again after a while), and why it failed.
+    processing_started_at = models.DateTimeField(null=True, blank=True)
+    processing_error = models.TextField(blank=True, default='')
+
+    def stored_names(self):
+        return [f.name for f in (self.file, self.archive_file, self.preview_file) if f]
+
+    def __str__(self):
+        return f"{self.client.name} - {self.document_type}"
+
+
+class ClientPurge(models.Model):
+    """
+    Background removal of a soft-deleted client, run by `manage.py purge_clients`.
+    `progress` maps each child table to the number of rows deleted so far.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    # Plain id rather than a FK: the client row is gone once the purge is done.
+    client_id = models.BigIntegerField(db_index=True)
+    client_name = models.CharField(max_length=100, blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', db_index=True)
+    progress = models.JSONField(default=dict, blank=True)
+    files_deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Purge of client {self.client_id} ({self.status})"
+
+
+class ConversionRollup(models.Model):
+    """
+    Conversions and amounts per day x insurance_type x company x POSP code,
+    kept up to date by core/analytics.py so /api/analytics/ never scans
+    LeadConversion or InvestmentConversion.
+    """
+    day = models.DateField()
+    insurance_type = models.CharField(max_length=10)
+    company_name = models.CharField(max_length=200)
+    posp_code = models.CharField(max_length=100)
+    conversions = models.PositiveIntegerField(default=0)
+    premium_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    investment_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'insurance_type', 'company_name', 'posp_code'],
+                name='conversion_rollup_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.insurance_type} {self.company_name} {self.posp_code}"
+
+
+class DailyDigest(models.Model):
+    """
+    One day's reminder and renewal digest (see core/digest.py): built by
+    `manage.py build_digest`, patched in place as notes and renewals
+    change, and served whole by /api/digest/.
+    """
+    day = models.DateField(unique=True)
+    data = models.JSONField(default=dict)
+    # Bumped on every patch; the ETag of /api/digest/.
+    version = models.PositiveIntegerField(default=1)
+    built_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
-        return f"{self.client.name} - {self.document_type}"
\ No newline at end of file
+        return f"Digest for {self.day} (v{self.version})"
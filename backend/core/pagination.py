@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ClientCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the client list, ordered newest first.
+
+    Opt-in: the list stays a plain array unless the request sends
+    ?cursor= or ?page_size=, so existing frontend pages keep working.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
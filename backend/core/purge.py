@@ -0,0 +1,208 @@
+"""
+Soft delete and background purge of clients.
+
+Deleting a client through the API only stamps Client.deleted_at, which
+hides it (and its notes/renewals) immediately, and queues a ClientPurge
+job. `manage.py purge_clients` picks jobs up and removes child rows in
+bounded batches, document files with batched storage deletes, and
+finally the client row. Every batch commits on its own, so a crashed
+worker resumes where it stopped; progress is stored on the job.
+
+The same worker reaps presigned uploads that were never confirmed.
+"""
+import logging
+from datetime import date, timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from . import analytics, cache, digest, uploads
+from .models import (
+    Client,
+    ClientPurge,
+    Note,
+    Quote,
+    EMIDetails,
+    EMIInstallment,
+    LeadConversion,
+    InvestmentConversion,
+    Document,
+    VehicleInsurance,
+    HealthInsurance,
+    HealthMember,
+    InvestmentDetails,
+)
+from .renewals import product_for_model
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+# A 'running' job not updated for this long is treated as abandoned.
+STALE_AFTER = timedelta(minutes=10)
+# A presigned upload still pending this long after presign never finished.
+ABANDONED_UPLOAD_AFTER = timedelta(seconds=uploads.URL_EXPIRY_SECONDS) + timedelta(hours=1)
+
+CHILD_MODELS = (
+    Note, Quote, EMIDetails, LeadConversion, InvestmentConversion,
+    Document, VehicleInsurance, HealthInsurance, InvestmentDetails,
+)
+DETAIL_MODELS = (VehicleInsurance, HealthInsurance, InvestmentDetails)
+
+
+def soft_delete_client(client):
+    """
+    Hide the client now and queue its purge. Returns the ClientPurge job.
+    """
+    with transaction.atomic():
+        Client.all_objects.filter(pk=client.pk).update(deleted_at=now())
+        job = ClientPurge.objects.create(client_id=client.pk, client_name=client.name)
+
+    # .update() sends no signals; the hidden client's counts must go now.
+    today = date.today()
+    for model in DETAIL_MODELS:
+        for renewal_date in model.objects.filter(
+            client_id=client.pk, renewal_date__isnull=False
+        ).values_list("renewal_date", flat=True):
+            cache.invalidate_renewal_months(
+                product_for_model(model), [renewal_date.strftime("%Y-%m")], today
+            )
+    cache.invalidate_note_summary(now().date())
+    digest.refresh_clients()
+    return job
+
+
+def _delete_batch(model, client_id, batch_size):
+    """
+    Delete up to batch_size rows of one child table; returns how many.
+    Document files are removed from storage before their rows.
+    """
+    qs = model.objects.filter(client_id=client_id)
+    if model is Document:
+        rows = list(qs.order_by("id").values_list("id", "file", "archive_file", "preview_file")[:batch_size])
+        ids = [row_id for row_id, *_ in rows]
+        files = uploads.delete_files([name for _, *names in rows for name in names])
+    else:
+        ids = list(qs.order_by("id").values_list("id", flat=True)[:batch_size])
+        files = 0
+    if ids:
+        using = router.db_for_write(model)
+        with transaction.atomic(using=using):
+            if model in (LeadConversion, InvestmentConversion):
+                analytics.remove_conversions(model.objects.filter(id__in=ids).select_related("client"))
+            # A plain DELETE does not cascade.
+            if model is HealthInsurance:
+                _raw_delete(HealthMember, "policy_id", ids, using)
+            elif model is EMIDetails:
+                _raw_delete(EMIInstallment, "emi_id", ids, using)
+            # Raw delete: these rows belong to a client that is going away, so
+            # the cache/version signal handlers have nothing useful to do.
+            _raw_delete(model, "id", ids, using)
+    return len(ids), files
+
+
+def _raw_delete(model, column, ids, using):
+    """
+    DELETE the rows of `model` whose `column` is in ids, without collecting
+    related objects or sending signals.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} IN ({placeholders})", ids
+        )
+
+
+def run_purge(job, batch_size=BATCH_SIZE):
+    """
+    Purge one claimed job to completion, saving progress after each batch.
+    """
+    try:
+        for model in CHILD_MODELS:
+            key = model._meta.model_name
+            while True:
+                deleted, files = _delete_batch(model, job.client_id, batch_size)
+                if not deleted:
+                    break
+                job.progress[key] = job.progress.get(key, 0) + deleted
+                job.files_deleted += files
+                job.save(update_fields=["progress", "files_deleted", "updated_at"])
+
+        Client.all_objects.filter(pk=job.client_id).delete()
+    except Exception as exc:
+        job.status = "failed"
+        job.error = str(exc)
+        job.save(update_fields=["status", "error", "updated_at"])
+        raise
+
+    job.status = "done"
+    job.finished_at = now()
+    job.save(update_fields=["status", "finished_at", "updated_at"])
+    return job
+
+
+def reap_abandoned_uploads(batch_size=BATCH_SIZE):
+    """
+    Delete pending documents whose upload was never confirmed, and any
+    object the browser did upload, in batches. Rows stay locked while
+    their files go, so a late confirm cannot activate one. Returns how
+    many were deleted.
+    """
+    cutoff = now() - ABANDONED_UPLOAD_AFTER
+    reaped = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Document.objects.select_for_update()
+                .filter(status="pending", uploaded_at__lt=cutoff)
+                .order_by("id")
+                .values_list("id", "file")[:batch_size]
+            )
+            if not rows:
+                return reaped
+            uploads.delete_files([name for _, name in rows])
+            Document.objects.filter(id__in=[row_id for row_id, _ in rows]).delete()
+        reaped += len(rows)
+
+
+def claim_next_job():
+    """
+    Atomically take one queued (or abandoned running) job, or None.
+    The conditional UPDATE means two workers never claim the same job.
+    """
+    claimable = Q(status="queued") | Q(status="running", updated_at__lt=now() - STALE_AFTER)
+    for job_id in ClientPurge.objects.filter(claimable).order_by("created_at").values_list("id", flat=True)[:10]:
+        claimed = ClientPurge.objects.filter(claimable, pk=job_id).update(
+            status="running", updated_at=now()
+        )
+        if claimed:
+            return ClientPurge.objects.get(pk=job_id)
+    return None
+
+
+def process_pending(batch_size=BATCH_SIZE, max_jobs=None):
+    """
+    Run queued jobs until none are left (or max_jobs). Returns the count.
+    Failed jobs are recorded on the job and do not stop the others.
+    """
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = claim_next_job()
+        if job is None:
+            break
+        try:
+            run_purge(job, batch_size)
+        except Exception:
+            logger.exception("Purge of client %s failed", job.client_id)
+        processed += 1
+    return processed
+
+
+def retry_failed():
+    """
+    Re-queue failed jobs; purging is idempotent so they resume safely.
+    """
+    return ClientPurge.objects.filter(status="failed").update(status="queued", error="")
@@ -0,0 +1,152 @@
+"""
+Reminder dashboard: today / overdue / upcoming follow-ups in one query.
+
+All three buckets are cut from one date range on the
+(follow_up_date, reminder, completed) index. A window function numbers
+the rows within each bucket so the database returns at most `limit + 1`
+per bucket, and a second window counts each bucket's rows. The client is
+joined in the same query.
+
+Each bucket pages independently with a keyset cursor on
+(follow_up_date, id), which matters for the long overdue tail.
+
+The summary counts behind /api/notes/summary/ live here too, cached by
+core.cache. adashboard() and anote_summary() serve the async views.
+"""
+from datetime import date, timedelta
+
+from django.db.models import Case, CharField, Count, F, Q, Value, When, Window
+from django.db.models.functions import RowNumber
+
+from . import cache
+from .models import Note
+
+
+BUCKETS = ("today", "overdue", "upcoming")
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+UPCOMING_DAYS = 180
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(note):
+    return f"{note.follow_up_date.isoformat()}.{note.id}"
+
+
+def decode_cursor(value):
+    try:
+        day, note_id = value.split(".")
+        return date.fromisoformat(day), int(note_id)
+    except (AttributeError, ValueError):
+        raise InvalidCursor(f"invalid cursor '{value}'")
+
+
+def bucket_filters(today, upcoming_days=UPCOMING_DAYS):
+    return {
+        "today": Q(follow_up_date=today),
+        "overdue": Q(follow_up_date__lt=today),
+        "upcoming": Q(follow_up_date__gt=today, follow_up_date__lte=today + timedelta(days=upcoming_days)),
+    }
+
+
+def dashboard_queryset(today, limit=DEFAULT_LIMIT, cursors=None, upcoming_days=UPCOMING_DAYS):
+    """
+    The single dashboard query: at most `limit + 1` notes per bucket,
+    each annotated with its bucket, position and bucket_count.
+    """
+    cursors = cursors or {}
+    buckets = bucket_filters(today, upcoming_days)
+
+    qs = Note.objects.filter(
+        client__deleted_at__isnull=True,
+        reminder=True,
+        completed=False,
+        follow_up_date__lte=today + timedelta(days=upcoming_days),
+    )
+    for key, raw in cursors.items():
+        day, note_id = decode_cursor(raw)
+        before = Q(follow_up_date__lt=day) | Q(follow_up_date=day, id__lte=note_id)
+        qs = qs.exclude(buckets[key] & before)
+
+    bucket = Case(
+        *[When(q, then=Value(key)) for key, q in buckets.items()],
+        output_field=CharField(),
+    )
+    return (
+        qs.select_related("client")
+        .annotate(bucket=bucket)
+        .annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=[F("bucket")],
+                order_by=[F("follow_up_date").asc(), F("id").asc()],
+            ),
+            bucket_count=Window(Count("id"), partition_by=[F("bucket")]),
+        )
+        .filter(position__lte=limit + 1)
+        .order_by("bucket", "follow_up_date", "id")
+    )
+
+
+def _collect(notes, limit):
+    data = {key: {"count": 0, "results": [], "next_cursor": None} for key in BUCKETS}
+    for note in notes:
+        entry = data[note.bucket]
+        entry["count"] = note.bucket_count
+        if note.position <= limit:
+            entry["results"].append(note)
+        else:
+            entry["next_cursor"] = encode_cursor(entry["results"][-1])
+    return data
+
+
+def dashboard(today, limit=DEFAULT_LIMIT, cursors=None, upcoming_days=UPCOMING_DAYS):
+    """
+    Returns {bucket: {"count", "results": [Note, ...], "next_cursor"}}.
+
+    With a cursor, a bucket starts after that (follow_up_date, id) and its
+    count is the number of rows remaining from there.
+    """
+    return _collect(dashboard_queryset(today, limit, cursors, upcoming_days), limit)
+
+
+async def adashboard(today, limit=DEFAULT_LIMIT, cursors=None, upcoming_days=UPCOMING_DAYS):
+    rows = dashboard_queryset(today, limit, cursors, upcoming_days)
+    return _collect([note async for note in rows], limit)
+
+
+# ----------------------------- SUMMARY -----------------------------
+SUMMARY_UPCOMING_DAYS = 7
+
+
+def summary_querysets(today):
+    """
+    {bucket: queryset} behind /api/notes/summary/. Completed notes still
+    count, as they always have on the summary cards.
+    """
+    notes = Note.objects.filter(client__deleted_at__isnull=True, reminder=True)
+    return {
+        "today": notes.filter(follow_up_date=today),
+        "overdue": notes.filter(follow_up_date__lt=today),
+        "upcoming": notes.filter(
+            follow_up_date__gt=today,
+            follow_up_date__lte=today + timedelta(days=SUMMARY_UPCOMING_DAYS),
+        ),
+    }
+
+
+def note_summary(today):
+    return cache.get_or_compute(
+        cache.note_summary_key(today),
+        lambda: {key: qs.count() for key, qs in summary_querysets(today).items()},
+    )
+
+
+async def anote_summary(today):
+    async def compute():
+        return {key: await qs.acount() for key, qs in summary_querysets(today).items()}
+
+    return await cache.aget_or_compute(cache.note_summary_key(today), compute)
@@ -0,0 +1,68 @@
+"""
+orjson-backed JSON rendering, the default renderer for the API.
+
+ORJSONRenderer produces the same JSON as DRF's JSONRenderer (compact,
+UTF-8, datetimes with a trailing Z for UTC) several times faster: dates,
+datetimes, UUIDs and dict/list/str subclasses such as ReturnList and
+ErrorDetail are encoded natively in C, and `default` only sees the rare
+types orjson leaves alone. Decimals become floats, as with DRF's encoder;
+serializer DecimalFields are already strings.
+
+Raw datetimes in response data (the digest's built_at, say) keep their
+microseconds, as DRF's encoder does; only Django's DjangoJSONEncoder, used
+by JsonResponse, cuts them to milliseconds. The one difference is NaN and
+infinite floats: DRF's renderer raises on them, orjson writes null.
+"""
+import datetime
+import decimal
+
+import orjson
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+from . import metrics
+
+
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def default(obj):
+    """
+    The non-native cases of rest_framework.utils.encoders.JSONEncoder.
+    """
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, QuerySet):
+        return tuple(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "__iter__"):
+        return tuple(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(data, indent=False):
+    return orjson.dumps(data, default=default, option=OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        # `Accept: application/json; indent=4` still pretty-prints (orjson
+        # only indents by two).
+        indent = "indent=" in (accepted_media_type or "") or (renderer_context or {}).get("indent")
+        with metrics.serializing():
+            return dumps(data, indent=bool(indent))
@@ -0,0 +1,274 @@
+"""
+Compressed archive and preview renditions of uploaded documents.
+
+Agents photograph RC books and Aadhaar cards on their phones, so uploads
+are often 8-12 MB JPEGs. `manage.py process_documents` turns every queued
+Document into:
+
+- archive_file: the image downscaled to ARCHIVE_MAX_PX and re-encoded as
+  JPEG, or the PDF with its embedded images downscaled and its streams
+  compressed. Only kept when it is actually smaller than the original.
+- preview_file: a PREVIEW_MAX_PX JPEG thumbnail. For PDFs it is cut from
+  the first embedded image on page one (scanned PDFs are one image per
+  page); PDFs without images get no preview.
+
+The decoding/encoding is CPU bound, so render() is a pure bytes-in,
+bytes-out function run in a ProcessPoolExecutor. The parent process does
+all storage and database work. Pillow and pypdf are imported lazily, as
+openpyxl is for the importer.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.utils.timezone import now
+
+from . import uploads
+from .models import Document
+
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_MAX_PX = 2400
+ARCHIVE_QUALITY = 80
+PREVIEW_MAX_PX = 480
+PREVIEW_QUALITY = 70
+PDF_IMAGE_MAX_PX = 2000
+PDF_IMAGE_QUALITY = 75
+
+# Originals of one batch are held in memory while the pool renders them.
+BATCH_SIZE = 8
+# A 'running' document not finished for this long was left by a worker
+# that died; it is queued again.
+STALE_AFTER = timedelta(minutes=10)
+IMAGE_TYPES = ("image/jpeg", "image/png", "image/webp")
+RENDERABLE_TYPES = IMAGE_TYPES + ("application/pdf",)
+
+
+class RenditionError(Exception):
+    pass
+
+
+# ----------------------------- RENDERING (worker processes) -----------------------------
+def _flatten(image):
+    """
+    RGB copy of the image, upright per its EXIF orientation, with any
+    transparency composited on white.
+    """
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _jpeg(image, max_px, quality):
+    image = image.copy()
+    image.thumbnail((max_px, max_px))
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def _image_renditions(data):
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = _flatten(image)
+    return _jpeg(image, ARCHIVE_MAX_PX, ARCHIVE_QUALITY), _jpeg(image, PREVIEW_MAX_PX, PREVIEW_QUALITY)
+
+
+def _pdf_renditions(data):
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter(clone_from=PdfReader(io.BytesIO(data)))
+    preview = None
+    for number, page in enumerate(writer.pages):
+        for embedded in page.images:
+            image = _flatten(embedded.image)
+            if number == 0 and preview is None:
+                preview = _jpeg(image, PREVIEW_MAX_PX, PREVIEW_QUALITY)
+            if max(image.size) > PDF_IMAGE_MAX_PX:
+                image.thumbnail((PDF_IMAGE_MAX_PX, PDF_IMAGE_MAX_PX))
+            embedded.replace(image, quality=PDF_IMAGE_QUALITY)
+        page.compress_content_streams()
+    writer.compress_identical_objects(remove_orphans=True)
+
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue(), preview
+
+
+def render(data, content_type):
+    """
+    Returns (archive_bytes_or_None, preview_bytes_or_None). The archive is
+    None when re-encoding would not make the file smaller.
+    """
+    try:
+        if content_type in IMAGE_TYPES:
+            archive, preview = _image_renditions(data)
+        elif content_type == "application/pdf":
+            archive, preview = _pdf_renditions(data)
+        else:
+            raise RenditionError(f"no renditions for '{content_type}'")
+    except RenditionError:
+        raise
+    except Exception as exc:
+        # Exceptions from Pillow/pypdf are not always picklable; send back text.
+        raise RenditionError(f"{type(exc).__name__}: {exc}")
+
+    if archive is not None and len(archive) >= len(data):
+        archive = None
+    return archive, preview
+
+
+# ----------------------------- STORAGE / DATABASE (parent process) -----------------------------
+def claim_batch(limit=BATCH_SIZE):
+    """
+    Mark up to `limit` queued active documents 'running' and return them.
+    The conditional UPDATE keeps two workers from taking the same row.
+    """
+    ids = list(
+        Document.objects.filter(status="active", processing="queued")
+        .order_by("id")
+        .values_list("id", flat=True)[:limit]
+    )
+    claimed = []
+    for document_id in ids:
+        if Document.objects.filter(pk=document_id, processing="queued").update(
+            processing="running", processing_started_at=now(), processing_error=""
+        ):
+            claimed.append(document_id)
+    return list(Document.objects.filter(pk__in=claimed).order_by("id"))
+
+
+def read_original(document):
+    with document.file.open("rb") as f:
+        data = f.read()
+    content_type = document.content_type or uploads.sniff_content_type(data[:uploads.SNIFF_BYTES])
+    return data, content_type
+
+
+def _rendition_name(document, suffix, ext):
+    base = os.path.splitext(os.path.basename(document.file.name))[0]
+    return f"{base}_{suffix}{ext}"
+
+
+def save_renditions(document, archive, preview, content_type):
+    """
+    Store the rendered bytes and record their keys on the document.
+    Renditions from an earlier run are replaced.
+    """
+    uploads.delete_files([f.name for f in (document.archive_file, document.preview_file) if f])
+    document.archive_file = ""
+    document.preview_file = ""
+    if archive is not None:
+        ext = ".pdf" if content_type == "application/pdf" else ".jpg"
+        document.archive_file.save(_rendition_name(document, "archive", ext), ContentFile(archive), save=False)
+    if preview is not None:
+        document.preview_file.save(_rendition_name(document, "preview", ".jpg"), ContentFile(preview), save=False)
+    document.processing = "done"
+    document.save(update_fields=["archive_file", "preview_file", "processing"])
+
+
+def _fail(document, error):
+    Document.objects.filter(pk=document.pk).update(processing="failed", processing_error=error)
+    return "failed"
+
+
+def _finish(document, future, content_type):
+    """
+    Store one document's renditions. Any failure, in rendering or in
+    storage, fails just this document. Returns its status.
+    """
+    try:
+        archive, preview = future.result()
+        save_renditions(document, archive, preview, content_type)
+    except RenditionError as exc:
+        logger.warning("Document %s not processed: %s", document.pk, exc)
+        return _fail(document, str(exc))
+    except Exception as exc:
+        logger.exception("Document %s not processed", document.pk)
+        return _fail(document, f"{type(exc).__name__}: {exc}")
+    return "done"
+
+
+class _InlineFuture:
+    def __init__(self, fn, *args):
+        self.fn, self.args = fn, args
+
+    def result(self):
+        return self.fn(*self.args)
+
+
+def process_pending(workers=None, batch_size=BATCH_SIZE, max_documents=None):
+    """
+    Render queued documents batch by batch until none are left (or
+    max_documents). workers=0 renders in this process, which is what the
+    tests use; otherwise a pool of `workers` processes (default: CPUs).
+    Documents left 'running' by a dead worker are queued again first.
+    Returns {status: count}.
+    """
+    requeue_stale()
+    counts = {}
+    pool = ProcessPoolExecutor(max_workers=workers) if workers != 0 else None
+    try:
+        processed = 0
+        while max_documents is None or processed < max_documents:
+            limit = batch_size if max_documents is None else min(batch_size, max_documents - processed)
+            documents = claim_batch(limit)
+            if not documents:
+                break
+
+            jobs = []
+            for document in documents:
+                try:
+                    data, content_type = read_original(document)
+                except Exception as exc:
+                    logger.warning("Document %s could not be read: %s", document.pk, exc)
+                    status = _fail(document, f"{type(exc).__name__}: {exc}")
+                else:
+                    status = None if content_type in RENDERABLE_TYPES else "skipped"
+                    if status:
+                        Document.objects.filter(pk=document.pk).update(processing=status)
+                if status:
+                    counts[status] = counts.get(status, 0) + 1
+                    continue
+                if pool is None:
+                    future = _InlineFuture(render, data, content_type)
+                else:
+                    future = pool.submit(render, data, content_type)
+                jobs.append((document, future, content_type))
+
+            for document, future, content_type in jobs:
+                status = _finish(document, future, content_type)
+                counts[status] = counts.get(status, 0) + 1
+            processed += len(documents)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return counts
+
+
+def requeue_stale():
+    """
+    Queue 'running' documents claimed more than STALE_AFTER ago again.
+    """
+    stale = Q(processing_started_at__lt=now() - STALE_AFTER) | Q(processing_started_at__isnull=True)
+    return Document.objects.filter(stale, processing="running").update(processing="queued")
+
+
+def requeue(failed=True, running=True):
+    """
+    Queue failed and/or interrupted ('running') documents again.
+    """
+    states = [s for s, wanted in (("failed", failed), ("running", running)) if wanted]
+    return Document.objects.filter(processing__in=states).update(processing="queued")
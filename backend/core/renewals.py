@@ -0,0 +1,405 @@
+"""
+Renewal engine shared by the health, vehicle and investment renewal APIs.
+
+Every product keeps its renewal date on a one-to-one detail row. The
+summary for a month is computed with conditional aggregation, so each
+product costs exactly one query no matter how many buckets it reports.
+
+Functions prefixed with `a` are async twins of the read paths, built on
+the same querysets, for the ASGI views in core/async_views.py.
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils.dateparse import parse_date
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from . import cache, digest
+from .models import Client, HealthInsurance, VehicleInsurance, InvestmentDetails
+
+
+CLIENT_FIELDS = ("id", "name", "mobile", "place", "insurance_type")
+
+
+@dataclass(frozen=True)
+class RenewalProduct:
+    model: type
+    # Extra detail columns returned by the renewal list, in output order.
+    list_fields: tuple
+    # Only health policies can be dismissed from the renewal queue.
+    has_dismissed: bool = False
+
+
+PRODUCTS = {
+    "health": RenewalProduct(
+        model=HealthInsurance,
+        list_fields=("renewal_dismissed", "floater_type", "ages", "ped"),
+        has_dismissed=True,
+    ),
+    "vehicle": RenewalProduct(
+        model=VehicleInsurance,
+        list_fields=("vehicle_type", "insurance_cover"),
+    ),
+    "investment": RenewalProduct(
+        model=InvestmentDetails,
+        list_fields=("investment_type", "remarks"),
+    ),
+}
+
+
+def month_range(yyyy_mm: str):
+    """
+    Convert 'YYYY-MM' into a tuple (start_date, end_date)
+    where start_date is the first day of the month,
+    and end_date is the first day of the next month.
+    """
+    y, m = yyyy_mm.split("-")
+    y = int(y)
+    m = int(m)
+
+    start = date(y, m, 1)
+    if m == 12:
+        end = date(y + 1, 1, 1)
+    else:
+        end = date(y, m + 1, 1)
+    return start, end
+
+
+def add_months(start, months):
+    """
+    First day of the month `months` after the month containing `start`.
+    """
+    index = start.year * 12 + (start.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def status_filters(product, today):
+    """
+    Q objects for each renewal bucket of a product, keyed by status.
+    """
+    if product.has_dismissed:
+        active = Q(renewal_dismissed=False)
+        return {
+            "pending": active & Q(renewal_date__gte=today),
+            "missed": active & Q(renewal_date__lt=today),
+            "dismissed": Q(renewal_dismissed=True),
+        }
+    return {
+        "pending": Q(renewal_date__gte=today),
+        "missed": Q(renewal_date__lt=today),
+    }
+
+
+def window_queryset(product, start, end):
+    return product.model.objects.filter(
+        client__deleted_at__isnull=True,
+        renewal_date__isnull=False,
+        renewal_date__gte=start,
+        renewal_date__lt=end,
+    )
+
+
+def _count_buckets(product_key, today):
+    product = PRODUCTS[product_key]
+    return {status: Count("id", filter=q) for status, q in status_filters(product, today).items()}
+
+
+def renewal_counts(product_key, start, end, today=None):
+    """
+    Pending/missed(/dismissed) counts for one product in [start, end),
+    computed in a single aggregate query.
+    """
+    today = today or date.today()
+    qs = window_queryset(PRODUCTS[product_key], start, end)
+    return qs.aggregate(**_count_buckets(product_key, today))
+
+
+async def arenewal_counts(product_key, start, end, today=None):
+    today = today or date.today()
+    qs = window_queryset(PRODUCTS[product_key], start, end)
+    return await qs.aaggregate(**_count_buckets(product_key, today))
+
+
+def cached_month_counts(product_key, month, today=None):
+    """
+    renewal_counts for a calendar month, served from the cache when possible.
+    """
+    today = today or date.today()
+    start, end = month_range(month)
+    return cache.get_or_compute(
+        cache.renewal_key(product_key, month, today),
+        lambda: renewal_counts(product_key, start, end, today),
+    )
+
+
+async def acached_month_counts(product_key, month, today=None):
+    today = today or date.today()
+    start, end = month_range(month)
+    return await cache.aget_or_compute(
+        cache.renewal_key(product_key, month, today),
+        lambda: arenewal_counts(product_key, start, end, today),
+    )
+
+
+def renewal_summary(product_key, month, today=None):
+    return {"month": month, **cached_month_counts(product_key, month, today)}
+
+
+async def arenewal_summary(product_key, month, today=None):
+    return {"month": month, **await acached_month_counts(product_key, month, today)}
+
+
+def combined_summary(month, today=None):
+    """
+    Summary for every product in one payload (one query per product
+    on a cold cache).
+    """
+    today = today or date.today()
+    data = {"month": month}
+    for key in PRODUCTS:
+        data[key] = cached_month_counts(key, month, today)
+    return data
+
+
+async def acombined_summary(month, today=None):
+    today = today or date.today()
+    data = {"month": month}
+    for key in PRODUCTS:
+        data[key] = await acached_month_counts(key, month, today)
+    return data
+
+
+def product_for_model(model):
+    for key, product in PRODUCTS.items():
+        if product.model is model:
+            return key
+    return None
+
+
+def renewal_queryset(product_key, month, status_key, today=None):
+    """
+    Detail rows renewing in the month for one status, ordered by date.
+    Unknown statuses fall back to pending, as the original views did.
+    """
+    product = PRODUCTS[product_key]
+    start, end = month_range(month)
+    today = today or date.today()
+    buckets = status_filters(product, today)
+    q = buckets.get(status_key, buckets["pending"])
+
+    client_fields = [f"client__{f}" for f in CLIENT_FIELDS]
+    return (
+        window_queryset(product, start, end)
+        .filter(q)
+        .select_related("client")
+        .only("id", "renewal_date", *product.list_fields, *client_fields)
+        .order_by("renewal_date")
+    )
+
+
+def renewal_rows(product_key, month, status_key, today=None):
+    """
+    renewal_queryset() as plain tuples in _list_item() column order, so
+    the list is built without instantiating models.
+    """
+    product = PRODUCTS[product_key]
+    client_fields = [f"client__{f}" for f in CLIENT_FIELDS]
+    return renewal_queryset(product_key, month, status_key, today).values_list(
+        "id", "renewal_date", *product.list_fields, *client_fields
+    )
+
+
+def _list_item(product, row):
+    split = 2 + len(product.list_fields)
+    item = dict(zip(("id", "renewal_date", *product.list_fields), row[:split]))
+    item["client"] = dict(zip(CLIENT_FIELDS, row[split:]))
+    return item
+
+
+def renewal_list(product_key, month, status_key, today=None):
+    product = PRODUCTS[product_key]
+    return [_list_item(product, row) for row in renewal_rows(product_key, month, status_key, today)]
+
+
+async def arenewal_list(product_key, month, status_key, today=None):
+    product = PRODUCTS[product_key]
+    return [
+        _list_item(product, row)
+        async for row in renewal_rows(product_key, month, status_key, today)
+    ]
+
+
+CALENDAR_GROUPS = {
+    "month": TruncMonth,
+    "week": TruncWeek,
+}
+
+
+def calendar_periods(start, end, group):
+    """
+    Every bucket start in [start, end) so empty periods report zeroes.
+    Weeks start on Monday, matching TruncWeek.
+    """
+    periods = []
+    if group == "week":
+        current = start - timedelta(days=start.weekday())
+        while current < end:
+            periods.append(current)
+            current += timedelta(days=7)
+    else:
+        current = start
+        while current < end:
+            periods.append(current)
+            current = add_months(current, 1)
+    return periods
+
+
+def renewal_calendar(from_month, months, group="month", today=None):
+    """
+    Per-period renewal counts for every product between the start of
+    `from_month` and `months` months later.
+
+    Each product is one GROUP BY over its renewal_date index, so a full
+    year costs three queries instead of one request per month.
+    """
+    start, _ = month_range(from_month)
+    end = add_months(start, months)
+    today = today or date.today()
+    trunc = CALENDAR_GROUPS[group]
+    periods = calendar_periods(start, end, group)
+
+    data = {"from": from_month, "months": months, "group": group, "products": {}}
+    for key, product in PRODUCTS.items():
+        buckets = status_filters(product, today)
+        rows = (
+            window_queryset(product, start, end)
+            .annotate(period=trunc("renewal_date"))
+            .values("period")
+            .annotate(**{status: Count("id", filter=q) for status, q in buckets.items()})
+            .order_by("period")
+        )
+        by_period = {row.pop("period"): row for row in rows}
+
+        series = []
+        for period in periods:
+            counts = by_period.get(period) or dict.fromkeys(buckets, 0)
+            label = period.strftime("%Y-%m") if group == "month" else period.isoformat()
+            series.append({"period": label, **counts})
+        data["products"][key] = series
+    return data
+
+
+BULK_MAX_ITEMS = 1000
+BULK_ACTIONS = ("renew", "reschedule", "dismiss")
+
+
+def _bulk_item_action(item):
+    """
+    Work out what a bulk item asks for. Returns (action, date, error).
+    """
+    action = item.get("action")
+    if action is None:
+        action = "renew" if "next_renewal_date" in item else "reschedule"
+    if action not in BULK_ACTIONS:
+        return None, None, f"unknown action '{action}'"
+    if action == "dismiss":
+        return action, None, None
+
+    field = "next_renewal_date" if action == "renew" else "renewal_date"
+    raw = item.get(field)
+    try:
+        parsed = parse_date(raw) if isinstance(raw, str) else None
+    except ValueError:
+        parsed = None
+    if not parsed:
+        return None, None, f"{field} is required (YYYY-MM-DD)"
+    return action, parsed, None
+
+
+def apply_bulk(product_key, items):
+    """
+    Renew, reschedule or dismiss many policies of one product at once.
+
+    Items look like {"client_id", "next_renewal_date"} (renew),
+    {"client_id", "renewal_date"} (reschedule) or
+    {"client_id", "action": "dismiss"}. All valid items are written with a
+    single bulk_update inside one transaction; invalid ones are reported
+    per item and do not block the rest.
+    """
+    product = PRODUCTS[product_key]
+    results = []
+    planned = {}
+
+    for item in items:
+        client_id = item.get("client_id") if isinstance(item, dict) else None
+        result = {"client_id": client_id, "success": False}
+        results.append(result)
+        if not isinstance(client_id, int):
+            result["error"] = "client_id is required"
+            continue
+        if client_id in planned:
+            result["error"] = "duplicate client_id"
+            continue
+        action, parsed, error = _bulk_item_action(item)
+        if error:
+            result["error"] = error
+            continue
+        if action == "dismiss" and not product.has_dismissed:
+            result["error"] = f"{product_key} renewals cannot be dismissed"
+            continue
+        planned[client_id] = (action, parsed, result)
+
+    fields = ["renewal_date", "renewal_dismissed"] if product.has_dismissed else ["renewal_date"]
+    touched_months = set()
+    in_digest = False
+
+    with transaction.atomic():
+        rows = (
+            product.model.objects.select_for_update()
+            .filter(client_id__in=planned)
+            .only("id", "client_id", *fields)
+        )
+        by_client = {row.client_id: row for row in rows}
+
+        changed = []
+        for client_id, (action, parsed, result) in planned.items():
+            row = by_client.get(client_id)
+            if row is None:
+                result["error"] = f"{product.model.__name__} not found for this client"
+                continue
+            if row.renewal_date:
+                touched_months.add(row.renewal_date.strftime("%Y-%m"))
+            was_listed = digest.renewal_listed({f: getattr(row, f) for f in fields})
+
+            if action == "dismiss":
+                row.renewal_dismissed = True
+            else:
+                row.renewal_date = parsed
+                if product.has_dismissed:
+                    row.renewal_dismissed = False
+                touched_months.add(parsed.strftime("%Y-%m"))
+                result["renewal_date"] = str(parsed)
+
+            result["action"] = action
+            result["success"] = True
+            changed.append(row)
+            if was_listed or digest.renewal_listed({f: getattr(row, f) for f in fields}):
+                in_digest = True
+
+        product.model.objects.bulk_update(changed, fields, batch_size=500)
+        # bulk_update sends no post_save, so touch the clients, refresh the
+        # digest and drop cached counts here.
+        Client.touch(row.client_id for row in changed)
+        if in_digest:
+            digest.refresh_renewals(product_key)
+
+    if touched_months:
+        cache.invalidate_renewal_months(product_key, touched_months, date.today())
+
+    return {
+        "updated": sum(r["success"] for r in results),
+        "failed": sum(not r["success"] for r in results),
+        "results": results,
+    }
@@ -0,0 +1,125 @@
+"""
+Read replica routing (optional; on when DATABASE_REPLICA_URL is set).
+
+ReplicaRouter sends ORM reads made while serving a GET/HEAD/OPTIONS
+request to a view in core.views (or its async twins) to the "replica"
+database. Everything else, and every write, goes to "default".
+
+An agent must see their own changes straight away, so a request with an
+unsafe method pins its client to the primary for
+settings.REPLICA_PIN_SECONDS. ReplicaMiddleware returns the pin's expiry
+(a Unix time) in the PIN_HEADER response header, which the frontend
+(frontend/lib/api.ts) sends back on its requests until then; the API
+lives on another site, so a cookie would not come back. Same-site
+clients such as the browsable API get the PIN_COOKIE cookie too. Reads
+from a pinned client skip the replica.
+
+Values computed for core.cache are read from the primary (see primary()):
+they stay cached until the next invalidating write, so a lagging replica
+would keep them stale long after it caught up.
+
+Locally, any two databases will do. config.test_settings, which
+`manage.py test` uses, adds a second SQLite database so ReplicaTests run
+against separate default and replica test databases; set
+DATABASE_REPLICA_URL to use another one.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+
+from .metrics import VIEW_MODULES
+
+
+REPLICA = "replica"
+PIN_HEADER = "X-Primary-Pin"
+PIN_COOKIE = "crm_primary_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_request = ContextVar("core_replica_request", default=None)
+_primary = ContextVar("core_replica_primary", default=False)
+
+
+def is_pinned(request):
+    raw = request.headers.get(PIN_HEADER) or request.COOKIES.get(PIN_COOKIE, 0)
+    try:
+        until = float(raw)
+    except ValueError:
+        return False
+    return until > time.time()
+
+
+def reads_from_replica(request):
+    if request.method not in SAFE_METHODS or is_pinned(request):
+        return False
+    # Routing happens at query time, by when the view has been resolved.
+    match = getattr(request, "resolver_match", None)
+    return match is not None and match.func.__module__ in VIEW_MODULES
+
+
+@contextmanager
+def primary():
+    """
+    Route reads inside the block to the primary whatever the request.
+    """
+    token = _primary.set(True)
+    try:
+        yield
+    finally:
+        _primary.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        request = _request.get()
+        if request is None or _primary.get():
+            return None
+        return REPLICA if reads_from_replica(request) else None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        return {obj1._state.db, obj2._state.db} <= {"default", REPLICA}
+
+
+def _pin(request, response):
+    if request.method in SAFE_METHODS:
+        return response
+    seconds = settings.REPLICA_PIN_SECONDS
+    until = f"{time.time() + seconds:.3f}"
+    response[PIN_HEADER] = until
+    response.set_cookie(
+        PIN_COOKIE, until, max_age=seconds, httponly=True,
+        samesite=settings.SESSION_COOKIE_SAMESITE, secure=settings.SESSION_COOKIE_SECURE,
+    )
+    return response
+
+
+@sync_and_async_middleware
+def ReplicaMiddleware(get_response):
+    if REPLICA not in settings.DATABASES:
+        raise MiddlewareNotUsed
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _request.set(request)
+            try:
+                response = await get_response(request)
+            finally:
+                _request.reset(token)
+            return _pin(request, response)
+    else:
+        def middleware(request):
+            token = _request.set(request)
+            try:
+                response = get_response(request)
+            finally:
+                _request.reset(token)
+            return _pin(request, response)
+    return middleware
@@ -0,0 +1,219 @@
+"""
+Client search behind /api/clients/search/?q=
+
+Digit-only queries are matched as a prefix of Client.mobile_normalized
+(a plain b-tree index). Anything else is matched against name and place:
+
+* PostgreSQL uses pg_trgm word similarity, served by the GIN trigram
+  indexes from migration 0021, so small typos still match.
+* SQLite uses the core_client_fts FTS5 shadow table (trigram tokenizer).
+  The query's trigrams are OR'ed together, a bounded set of bm25
+  candidates is fetched, and only those sharing at least half of the
+  query's trigrams are kept, so one wrong letter still matches.
+
+Other backends fall back to a case-insensitive substring match.
+"""
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import connection, connections, router
+from django.db.models import Q
+
+from .models import Client, normalize_mobile
+
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+MIN_MOBILE_DIGITS = 3
+# SQLite: bm25 candidates fetched per result, and the share of the
+# query's trigrams a name or place must contain to count as a match.
+FTS_CANDIDATES_PER_RESULT = 5
+FTS_MIN_OVERLAP = 0.5
+
+MOBILE_QUERY = re.compile(r"^\+?[\d\s\-()]+$")
+
+
+# Same triggers as migration 0021. SQLite drops triggers whenever a later
+# migration rebuilds core_client, so post_migrate puts them back.
+SQLITE_TRIGGERS = {
+    "core_client_fts_ai": """
+        CREATE TRIGGER IF NOT EXISTS core_client_fts_ai AFTER INSERT ON core_client BEGIN
+            INSERT INTO core_client_fts(rowid, name, place) VALUES (new.id, new.name, new.place);
+        END
+    """,
+    "core_client_fts_ad": """
+        CREATE TRIGGER IF NOT EXISTS core_client_fts_ad AFTER DELETE ON core_client BEGIN
+            INSERT INTO core_client_fts(core_client_fts, rowid, name, place)
+            VALUES ('delete', old.id, old.name, old.place);
+        END
+    """,
+    "core_client_fts_au": """
+        CREATE TRIGGER IF NOT EXISTS core_client_fts_au AFTER UPDATE OF name, place ON core_client BEGIN
+            INSERT INTO core_client_fts(core_client_fts, rowid, name, place)
+            VALUES ('delete', old.id, old.name, old.place);
+            INSERT INTO core_client_fts(rowid, name, place) VALUES (new.id, new.name, new.place);
+        END
+    """,
+}
+
+
+def repair_sqlite_fts(using="default", **kwargs):
+    """
+    post_migrate handler: recreate missing FTS triggers and reindex.
+    """
+    conn = connections[using]
+    if conn.vendor != "sqlite":
+        return
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE name LIKE %s", ["core_client_fts%"])
+        existing = {row[0] for row in cursor.fetchall()}
+        if "core_client_fts" not in existing or existing.issuperset(SQLITE_TRIGGERS):
+            return
+        for name, sql in SQLITE_TRIGGERS.items():
+            if name not in existing:
+                cursor.execute(sql)
+        cursor.execute("INSERT INTO core_client_fts(core_client_fts) VALUES ('rebuild')")
+
+
+def is_mobile_query(q):
+    return bool(MOBILE_QUERY.match(q))
+
+
+def mobile_prefix(q):
+    """
+    Normalized prefix for a partly typed number. A short query can't be
+    told apart from a number starting with 91, so only an explicit '+91'
+    is treated as a country code.
+    """
+    if q.startswith("+91"):
+        q = q[3:]
+    return normalize_mobile(q)
+
+
+def search_queryset(insurance_type=None):
+    qs = Client.objects.select_related(
+        'vehicle_details', 'health_details', 'investment_details'
+    )
+    if insurance_type:
+        qs = qs.filter(insurance_type=insurance_type)
+    return qs
+
+
+def _ranked_queryset(q, insurance_type, limit):
+    """
+    Sliced, ranked queryset of matches for a stripped query, or None when
+    the SQLite FTS path applies (see _sqlite_ranked_ids).
+    """
+    if not q:
+        return Client.objects.none()
+
+    if is_mobile_query(q):
+        digits = mobile_prefix(q)
+        if len(digits) < MIN_MOBILE_DIGITS:
+            return Client.objects.none()
+        qs = search_queryset(insurance_type).filter(mobile_normalized__startswith=digits)
+        return qs.order_by("mobile_normalized", "-id")[:limit]
+
+    vendor = connection.vendor
+    if vendor == "postgresql":
+        return _postgres_queryset(q, insurance_type)[:limit]
+    if vendor == "sqlite" and len(q) >= 3:
+        return None
+    return _fallback_queryset(q, insurance_type)[:limit]
+
+
+def search_clients(q, insurance_type=None, limit=DEFAULT_LIMIT):
+    """
+    Ranked list of at most `limit` clients matching `q`.
+    """
+    q = (q or "").strip()
+    qs = _ranked_queryset(q, insurance_type, limit)
+    if qs is not None:
+        return list(qs)
+    ids = _sqlite_ranked_ids(q, insurance_type, limit)
+    by_id = search_queryset().in_bulk(ids)
+    return [by_id[i] for i in ids if i in by_id]
+
+
+async def asearch_clients(q, insurance_type=None, limit=DEFAULT_LIMIT):
+    """
+    search_clients for the async views. The raw FTS query runs in a
+    worker thread; everything else goes through the async ORM.
+    """
+    q = (q or "").strip()
+    qs = _ranked_queryset(q, insurance_type, limit)
+    if qs is not None:
+        return [client async for client in qs]
+    ids = await sync_to_async(_sqlite_ranked_ids)(q, insurance_type, limit)
+    by_id = await search_queryset().ain_bulk(ids)
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def _postgres_queryset(q, insurance_type):
+    from django.contrib.postgres.search import TrigramWordSimilarity
+    from django.db.models.functions import Greatest
+
+    qs = search_queryset(insurance_type).annotate(
+        rank=Greatest(TrigramWordSimilarity(q, "name"), TrigramWordSimilarity(q, "place"))
+    ).filter(
+        Q(name__trigram_word_similar=q) | Q(place__trigram_word_similar=q)
+    )
+    return qs.order_by("-rank", "-id")
+
+
+def trigrams(text):
+    text = " ".join(text.lower().split())
+    return list(dict.fromkeys(text[i:i + 3] for i in range(len(text) - 2)))
+
+
+def fts_query(q):
+    """
+    FTS5 MATCH expression OR-ing every distinct trigram of the query.
+    """
+    return " OR ".join('"{}"'.format(t.replace('"', '""')) for t in trigrams(q))
+
+
+def trigram_overlap(query_trigrams, value):
+    if not query_trigrams:
+        return 0.0
+    present = set(trigrams(value))
+    return sum(t in present for t in query_trigrams) / len(query_trigrams)
+
+
+def _sqlite_ranked_ids(q, insurance_type, limit):
+    """
+    Ids of at most `limit` close FTS matches, best first.
+    """
+    sql = (
+        "SELECT c.id, c.name, c.place FROM core_client_fts f "
+        "JOIN core_client c ON c.id = f.rowid "
+        "WHERE core_client_fts MATCH %s AND c.deleted_at IS NULL"
+    )
+    params = [fts_query(q)]
+    if insurance_type:
+        sql += " AND c.insurance_type = %s"
+        params.append(insurance_type)
+    sql += " ORDER BY bm25(core_client_fts), c.id DESC LIMIT %s"
+    params.append(limit * FTS_CANDIDATES_PER_RESULT)
+
+    # Raw SQL skips the router; ask it which database reads go to.
+    with connections[router.db_for_read(Client)].cursor() as cursor:
+        cursor.execute(sql, params)
+        candidates = cursor.fetchall()
+
+    # Any shared trigram is a bm25 hit; keep only close matches and rank
+    # them by overlap, falling back to bm25 order for ties.
+    query_trigrams = trigrams(q)
+    scored = []
+    for position, (client_id, name, place) in enumerate(candidates):
+        overlap = max(trigram_overlap(query_trigrams, name), trigram_overlap(query_trigrams, place))
+        if overlap >= FTS_MIN_OVERLAP:
+            scored.append((-overlap, position, client_id))
+    return [client_id for _, _, client_id in sorted(scored)[:limit]]
+
+
+def _fallback_queryset(q, insurance_type):
+    qs = search_queryset(insurance_type).filter(
+        Q(name__icontains=q) | Q(place__icontains=q)
+    )
+    return qs.order_by("-created_at", "-id")
@@ -0,0 +1,240 @@
+"""
+Synthetic client book for local load testing (`manage.py seed`).
+
+Builds N clients split across vehicle/health/investment with the related
+rows a real book has: notes with reminders, quotes, EMI plans, lead and
+investment conversions, and renewal dates spread over two years around
+today. Rows are written with bulk_create in chunks, so 100k clients take
+seconds rather than minutes. The same random seed gives the same book.
+
+Documents are not generated; they would need files in storage.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import analytics, cache, digest, installments, members
+from .models import (
+    Client,
+    VehicleInsurance,
+    HealthInsurance,
+    InvestmentDetails,
+    InvestmentConversion,
+    LeadConversion,
+    EMIDetails,
+    Note,
+    Quote,
+    normalize_mobile,
+)
+from .renewals import PRODUCTS, add_months
+
+
+CHUNK_SIZE = 2000
+
+# Share of the book per insurance type.
+TYPE_WEIGHTS = {"vehicle": 50, "health": 35, "investment": 15}
+CONVERTED_SHARE = 0.25
+EMI_SHARE = 0.2
+RENEWAL_SPREAD_DAYS = 365  # renewal dates fall within a year either side of today
+
+FIRST_NAMES = (
+    "Aarav", "Vivaan", "Aditya", "Arjun", "Sai", "Rahul", "Rohan", "Karthik",
+    "Ananya", "Diya", "Priya", "Lakshmi", "Meera", "Sneha", "Kavya", "Fatima",
+    "Mohammed", "Joseph", "Anil", "Suresh", "Ramesh", "Deepa", "Anjali", "Nikhil",
+)
+LAST_NAMES = (
+    "Nair", "Menon", "Pillai", "Kumar", "Sharma", "Iyer", "Reddy", "Thomas",
+    "Varghese", "Khan", "Das", "Patel", "Rao", "Joshi", "Gupta", "Krishnan",
+)
+PLACES = (
+    "Kochi", "Thrissur", "Kozhikode", "Thiruvananthapuram", "Kollam", "Kannur",
+    "Palakkad", "Alappuzha", "Kottayam", "Malappuram", "Bengaluru", "Chennai",
+)
+VEHICLE_TYPES = ("car", "bike", "scooter", "auto", "goods carrier")
+INVESTMENT_TYPES = ("ULIP", "Endowment", "Term plan", "Pension plan", "Child plan")
+COMPANIES = (
+    "Star Health", "HDFC Ergo", "ICICI Lombard", "Bajaj Allianz", "Tata AIG",
+    "New India Assurance", "Niva Bupa", "LIC", "SBI Life",
+)
+EMI_PROVIDERS = ("Bajaj Finserv", "HDFC Bank", "Kotak", "Shriram Finance")
+POSP_CODES = tuple(f"POSP{n:03d}" for n in range(1, 21))
+NOTE_TEXTS = (
+    "Call back about renewal", "Sent quote on WhatsApp", "Asked for RC copy",
+    "Waiting for payment", "Compare premium with last year", "Visit at office",
+)
+
+
+def _money(rng, low, high):
+    return Decimal(rng.randrange(low, high)).quantize(Decimal("1.00"))
+
+
+def _spread(rng, today, before, after):
+    return today + timedelta(days=rng.randint(-before, after))
+
+
+def _created_at(rng, today):
+    day = _spread(rng, today, 2 * 365, 0)
+    return timezone.make_aware(datetime.combine(day, time(rng.randrange(9, 19), rng.randrange(60))))
+
+
+def _client(rng, insurance_type, today):
+    mobile = f"{rng.choice('6789')}{rng.randrange(10 ** 9):09d}"
+    return Client(
+        name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        mobile=mobile,
+        mobile_normalized=normalize_mobile(mobile),
+        place=rng.choice(PLACES),
+        insurance_type=insurance_type,
+        is_converted=rng.random() < CONVERTED_SHARE,
+        created_at=_created_at(rng, today),
+    )
+
+
+def _detail(rng, client, today):
+    renewal_date = _spread(rng, today, RENEWAL_SPREAD_DAYS, RENEWAL_SPREAD_DAYS)
+    if client.insurance_type == "vehicle":
+        return VehicleInsurance(
+            client=client,
+            vehicle_type=rng.choice(VEHICLE_TYPES),
+            insurance_cover=rng.choice(("full", "third_party")),
+            renewal_date=renewal_date,
+        )
+    if client.insurance_type == "health":
+        ages = ",".join(str(rng.randrange(1, 80)) for _ in range(rng.choice((1, 1, 2, 3, 4))))
+        return HealthInsurance(
+            client=client,
+            ages=ages,
+            floater_type=HealthInsurance.floater_type_for(ages),
+            ped=rng.choice(("", "", "", "Diabetes", "Hypertension")),
+            renewal_date=renewal_date,
+            renewal_dismissed=renewal_date < today and rng.random() < 0.05,
+        )
+    return InvestmentDetails(
+        client=client,
+        investment_type=rng.choice(INVESTMENT_TYPES),
+        renewal_date=renewal_date,
+    )
+
+
+def _children(rng, client, detail, today):
+    """
+    (notes, quotes, emis, lead conversions, investment conversions) for one client.
+    """
+    notes = []
+    for _ in range(rng.choice((0, 1, 1, 2, 3))):
+        follow_up = _spread(rng, today, 90, 180)
+        notes.append(Note(
+            client=client,
+            text=rng.choice(NOTE_TEXTS),
+            follow_up_date=follow_up,
+            reminder=rng.random() < 0.8,
+            priority=rng.choice(("HOT", "WARM", "COOL")),
+            completed=follow_up < today and rng.random() < 0.3,
+        ))
+
+    quotes = [
+        Quote(client=client, company_name=rng.choice(COMPANIES), premium_amount=_money(rng, 3000, 60000))
+        for _ in range(rng.choice((0, 1, 1, 2)))
+    ]
+
+    emis = []
+    if client.insurance_type != "investment" and rng.random() < EMI_SHARE:
+        amount = _money(rng, 10000, 60000)
+        tenure = rng.choice((3, 6, 9, 12))
+        emis.append(EMIDetails(
+            client=client,
+            emi_provider=rng.choice(EMI_PROVIDERS),
+            emi_amount=amount,
+            down_payment=_money(rng, 0, 5000),
+            policy_tenure="1 year",
+            emi_tenure=f"{tenure} months",
+            monthly_emi_amount=(amount / tenure).quantize(Decimal("1.00")),
+        ))
+
+    leads, investments = [], []
+    if client.is_converted:
+        if client.insurance_type == "investment":
+            investments.append(InvestmentConversion(
+                client=client,
+                posp_code=rng.choice(POSP_CODES),
+                company_name=rng.choice(COMPANIES),
+                investment_amount=_money(rng, 25000, 500000),
+                policy_name=detail.investment_type,
+                investment_paying_term=f"{rng.choice((5, 10, 15))} years",
+                renewal_date=detail.renewal_date,
+            ))
+        else:
+            leads.append(LeadConversion(
+                client=client,
+                posp_code=rng.choice(POSP_CODES),
+                customer_name=client.name,
+                company_name=rng.choice(COMPANIES),
+                premium_amount=_money(rng, 3000, 60000),
+                policy_number=f"P{rng.randrange(10 ** 9):09d}",
+                customer_mobile=client.mobile,
+            ))
+    return notes, quotes, emis, leads, investments
+
+
+def _write_chunk(rng, types, today):
+    clients = [_client(rng, insurance_type, today) for insurance_type in types]
+    created_at = [c.created_at for c in clients]
+    with transaction.atomic():
+        Client.objects.bulk_create(clients)
+        details = [_detail(rng, client, today) for client in clients]
+        VehicleInsurance.objects.bulk_create([d for d in details if type(d) is VehicleInsurance])
+        members.bulk_create_policies([d for d in details if type(d) is HealthInsurance])
+        InvestmentDetails.objects.bulk_create([d for d in details if type(d) is InvestmentDetails])
+
+        children = [[], [], [], [], []]
+        for client, detail in zip(clients, details):
+            for rows, new in zip(children, _children(rng, client, detail, today)):
+                rows.extend(new)
+        for model, rows in zip((Note, Quote, EMIDetails, LeadConversion, InvestmentConversion), children):
+            model.objects.bulk_create(rows)
+        installments.generate(children[2])
+
+        # created_at is auto_now_add, which bulk_create overrides; backdate
+        # the rows so the book spans two years like a real one.
+        for client, value in zip(clients, created_at):
+            client.created_at = value
+        Client.objects.bulk_update(clients, ["created_at"])
+        for model, rows in ((LeadConversion, children[3]), (InvestmentConversion, children[4])):
+            for row in rows:
+                row.created_at = row.client.created_at
+            model.objects.bulk_update(rows, ["created_at"])
+
+
+def seed_book(clients, seed=0, today=None, chunk_size=CHUNK_SIZE):
+    """
+    Add `clients` synthetic clients (and their related rows). Returns the
+    number of clients per insurance type.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    kinds, weights = zip(*TYPE_WEIGHTS.items())
+    counts = dict.fromkeys(kinds, 0)
+
+    remaining = clients
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        types = rng.choices(kinds, weights, k=size)
+        for insurance_type in types:
+            counts[insurance_type] += 1
+        _write_chunk(rng, types, today)
+        remaining -= size
+
+    # bulk_create skips the incremental rollup updates and the signals.
+    analytics.rebuild()
+
+    # Every cached renewal month may be stale.
+    first = today - timedelta(days=RENEWAL_SPREAD_DAYS)
+    months = [add_months(first, n).strftime("%Y-%m") for n in range(25)]
+    for product_key in PRODUCTS:
+        cache.invalidate_renewal_months(product_key, months, today)
+    cache.invalidate_note_summary(today)
+    digest.refresh_all()
+    return counts
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from .fieldsets import SparseFieldsMixin
 from .models import (
     Client,
     VehicleInsurance,
@@ -11,6 +12,8 @@ from .models import (
     Document,
     LeadConversion,
     EMIDetails,
+    EMIInstallment,
+    ClientPurge,
 )
 
 
@@ -39,7 +42,7 @@ class InvestmentConversionSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ClientSerializer(serializers.ModelSerializer):
+class ClientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     vehicle_details = VehicleInsuranceSerializer(read_only=True)
     health_details = HealthInsuranceSerializer(read_only=True)
     investment_details = InvestmentDetailsSerializer(read_only=True)   
@@ -80,9 +83,35 @@ class NoteSerializer(serializers.ModelSerializer):
 
 
 class DocumentSerializer(serializers.ModelSerializer):
+    # `url` is the small preview rendition when there is one, falling back
+    # to the archive copy and then the original. ?rendition=archive|original
+    # picks a larger file.
+    RENDITIONS = {
+        'preview': ('preview_file', 'archive_file', 'file'),
+        'archive': ('archive_file', 'file'),
+        'original': ('file',),
+    }
+
+    url = serializers.SerializerMethodField()
+
     class Meta:
         model = Document
         fields = '__all__'
+        # Set by process_documents and by uploads.confirm (after checking the
+        # stored object), never by API clients.
+        read_only_fields = (
+            'archive_file', 'preview_file', 'processing', 'processing_started_at', 'processing_error',
+            'status', 'size', 'content_type',
+        )
+
+    def get_url(self, obj):
+        request = self.context.get('request')
+        rendition = request.query_params.get('rendition') if request else None
+        for name in self.RENDITIONS.get(rendition, self.RENDITIONS['preview']):
+            stored = getattr(obj, name)
+            if stored:
+                return request.build_absolute_uri(stored.url) if request else stored.url
+        return None
 
 
 class LeadConversionSerializer(serializers.ModelSerializer):
@@ -96,8 +125,18 @@ class EMIDetailsSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class EMIInstallmentSerializer(serializers.ModelSerializer):
+    client = serializers.IntegerField(source="emi.client_id", read_only=True)
+    emi_provider = serializers.CharField(source="emi.emi_provider", read_only=True)
+
+    class Meta:
+        model = EMIInstallment
+        fields = ["id", "emi", "client", "emi_provider", "number", "due_date", "amount", "paid", "paid_at"]
+        read_only_fields = ["emi", "number", "due_date", "amount", "paid_at"]
+
+
 
-class ClientDetailSerializer(serializers.ModelSerializer):
+class ClientDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     vehicle_details = VehicleInsuranceSerializer(read_only=True)
     health_details = HealthInsuranceSerializer(read_only=True)
     investment_details = InvestmentDetailsSerializer(read_only=True)                    
@@ -117,3 +156,18 @@ class ClientDetailSerializer(serializers.ModelSerializer):
         ]
 
 
+
+
+class ClientExportSerializer(ClientDetailSerializer):
+    """
+    Full client book row for exports: everything on the detail page
+    except documents, which live in object storage.
+    """
+    class Meta(ClientDetailSerializer.Meta):
+        fields = [f for f in ClientDetailSerializer.Meta.fields if f != 'documents']
+
+
+class ClientPurgeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ClientPurge
+        fields = '__all__'
@@ -0,0 +1,172 @@
+"""
+Keep derived state in step with the database:
+
+* the dashboard count cache (core.cache). Each tracked instance
+  remembers the values it was loaded with, so a save only drops the
+  cache entries it can actually affect: the old and new renewal month of
+  a policy, or today's reminder summary for a note. Edits to unrelated
+  columns (remarks, note text, ...) leave the cache alone.
+* Client.version, the ETag of the client detail page, which changes on
+  any write to a row shown on that page.
+* the HealthMember rows of a health policy, rewritten from `ages`
+  whenever it changes (core.members).
+* the EMIInstallment schedule of an EMI plan, regenerated on every save
+  (core.installments).
+* today's DailyDigest (core.digest), patched when a note or renewal that
+  is, or was, in it is edited, or when a client it shows is renamed.
+
+Queryset .update()/bulk_update() calls send no signals; callers that
+use them invalidate the cache, refresh the digest and call
+Client.touch() themselves.
+"""
+from datetime import date
+
+from django.db.models.signals import post_init, post_save, post_delete
+from django.utils.timezone import localdate, now
+
+from . import cache, digest, installments, members
+from .models import (
+    Client,
+    HealthInsurance,
+    VehicleInsurance,
+    InvestmentDetails,
+    Note,
+    Quote,
+    EMIDetails,
+    Document,
+    LeadConversion,
+    InvestmentConversion,
+)
+from .renewals import CLIENT_FIELDS, PRODUCTS, product_for_model
+
+
+RENEWAL_MODELS = (HealthInsurance, VehicleInsurance, InvestmentDetails)
+RENEWAL_FIELDS = ("renewal_date", "renewal_dismissed")
+NOTE_FIELDS = ("follow_up_date", "reminder", "completed")
+
+TRACKED_FIELDS = {model: RENEWAL_FIELDS for model in RENEWAL_MODELS}
+TRACKED_FIELDS[Note] = NOTE_FIELDS
+
+# Other columns shown in digest items. Edits to them patch the digest but
+# leave the cached counts alone.
+DIGEST_FIELDS = {model: PRODUCTS[product_for_model(model)].list_fields for model in RENEWAL_MODELS}
+DIGEST_FIELDS[Note] = ("client_id", "text", "priority")
+DIGEST_FIELDS[Client] = tuple(f for f in CLIENT_FIELDS if f != "id")
+
+# Every model shown on the client detail page.
+CLIENT_CHILD_MODELS = (
+    HealthInsurance, VehicleInsurance, InvestmentDetails, Note, Quote,
+    EMIDetails, Document, LeadConversion, InvestmentConversion,
+)
+
+
+def _snapshot(instance):
+    # Read from __dict__ so deferred fields are not fetched on load.
+    model = type(instance)
+    fields = TRACKED_FIELDS.get(model, ()) + DIGEST_FIELDS[model]
+    return {f: instance.__dict__.get(f) for f in fields if f in instance.__dict__}
+
+
+def _changed(instance, created, fields=None):
+    if created:
+        return True
+    loaded = getattr(instance, "_cache_loaded", {})
+    current = _snapshot(instance)
+    return any(
+        loaded.get(f) != value for f, value in current.items()
+        if fields is None or f in fields
+    )
+
+
+def _month(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.strftime("%Y-%m")
+
+
+def _invalidate_renewals(instance, current_date):
+    months = {
+        _month(instance._cache_loaded.get("renewal_date")),
+        _month(current_date),
+    }
+    months.discard(None)
+    if months:
+        cache.invalidate_renewal_months(
+            product_for_model(type(instance)), months, date.today()
+        )
+
+
+def _refresh_digest(instance, states):
+    """
+    Patch the digest if the instance was or is in it, judging by the
+    tracked values in `states`.
+    """
+    today = localdate()
+    if isinstance(instance, Note):
+        if any(digest.note_listed(values, today) for values in states):
+            digest.refresh_notes()
+    elif any(digest.renewal_listed(values, today) for values in states):
+        digest.refresh_renewals(product_for_model(type(instance)))
+
+
+def remember_loaded_values(sender, instance, **kwargs):
+    instance._cache_loaded = _snapshot(instance)
+
+
+def invalidate_on_save(sender, instance, created, **kwargs):
+    if not _changed(instance, created):
+        return
+    if sender is HealthInsurance and _changed(instance, created, ("ages",)):
+        members.sync(instance)
+    if sender is Client:
+        if not created:
+            digest.refresh_clients()
+    else:
+        if _changed(instance, created, TRACKED_FIELDS[sender]):
+            if sender is Note:
+                cache.invalidate_note_summary(now().date())
+            else:
+                _invalidate_renewals(instance, instance.renewal_date)
+        _refresh_digest(instance, [_snapshot(instance)] + ([] if created else [instance._cache_loaded]))
+    instance._cache_loaded = _snapshot(instance)
+
+
+def invalidate_on_delete(sender, instance, origin=None, **kwargs):
+    if sender is Note:
+        cache.invalidate_note_summary(now().date())
+    else:
+        _invalidate_renewals(instance, instance.__dict__.get("renewal_date"))
+    # A client is hidden, and so out of the digest, before it is purged.
+    if not (isinstance(origin, Client) or getattr(origin, "model", None) is Client):
+        _refresh_digest(instance, [instance._cache_loaded, _snapshot(instance)])
+
+
+def schedule_on_save(sender, instance, **kwargs):
+    installments.generate([instance])
+
+
+def touch_client_on_save(sender, instance, **kwargs):
+    Client.touch([instance.client_id])
+
+
+def touch_client_on_delete(sender, instance, origin=None, **kwargs):
+    # Rows removed by a client's own cascade have no client left to touch.
+    if isinstance(origin, Client) or getattr(origin, "model", None) is Client:
+        return
+    Client.touch([instance.client_id])
+
+
+def connect():
+    # Connected per sender: a catch-all post_delete receiver would stop
+    # Django from fast-deleting every other model during cascades.
+    for model in DIGEST_FIELDS:
+        post_init.connect(remember_loaded_values, sender=model, dispatch_uid=f"cache-init-{model.__name__}")
+        post_save.connect(invalidate_on_save, sender=model, dispatch_uid=f"cache-save-{model.__name__}")
+        if model in TRACKED_FIELDS:
+            post_delete.connect(invalidate_on_delete, sender=model, dispatch_uid=f"cache-delete-{model.__name__}")
+    post_save.connect(schedule_on_save, sender=EMIDetails, dispatch_uid="installments-save-EMIDetails")
+    for model in CLIENT_CHILD_MODELS:
+        post_save.connect(touch_client_on_save, sender=model, dispatch_uid=f"version-save-{model.__name__}")
+        post_delete.connect(touch_client_on_delete, sender=model, dispatch_uid=f"version-delete-{model.__name__}")
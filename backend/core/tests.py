@@ -1,3 +1,1958 @@
-from django.test import TestCase
+import csv
+import gzip
+import importlib
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+import brotli
+from asgiref.sync import async_to_sync
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Max, Min, Q
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from django.utils.timezone import localdate, now
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import benchmark, digest, fastpath, fieldsets, purge, renditions, renewals, replica, uploads, views
+from .installments import add_months, tenure_months
+from .management.commands import process_documents, purge_clients
+from .models import (
+    Client,
+    VehicleInsurance,
+    HealthInsurance,
+    HealthMember,
+    InvestmentDetails,
+    Note,
+    EMIDetails,
+    EMIInstallment,
+    Document,
+    Quote,
+    ConversionRollup,
+    DailyDigest,
+    parse_ages,
+)
+from .purge import ABANDONED_UPLOAD_AFTER
+from .renderers import ORJSONRenderer
+from .seed import seed_book
+from .serializers import ClientSerializer, NoteSerializer
+
+
+def make_client(insurance_type, name="Client", **details):
+    client = Client.objects.create(name=name, mobile="9000000000", insurance_type=insurance_type)
+    if insurance_type == "vehicle":
+        VehicleInsurance.objects.create(
+            client=client, vehicle_type="car", insurance_cover="full", **details
+        )
+    elif insurance_type == "health":
+        HealthInsurance.objects.create(
+            client=client, **{"floater_type": "individual", "ages": "30", **details}
+        )
+    else:
+        InvestmentDetails.objects.create(client=client, **details)
+    return client
+
+
+# The replica test database stays empty; only ReplicaTests route reads to it.
+@override_settings(DATABASE_ROUTERS=[])
+class CRMTestCase(TestCase):
+    def setUp(self):
+        # Cached counts outlive the per-test transaction rollback.
+        cache.clear()
+        self.api = APIClient()
+
+    def assertWithinQueryBudget(self, response):
+        metrics = response.query_metrics
+        self.assertIsNotNone(metrics.budget, f"no query budget for {metrics.endpoint}")
+        self.assertLessEqual(
+            metrics.queries, metrics.budget,
+            f"{metrics.method} {metrics.endpoint} ran {metrics.queries} queries, budget {metrics.budget}",
+        )
+
+
+class TempMediaMixin:
+    """
+    Stores files with FileSystemStorage in a temporary MEDIA_ROOT that is
+    removed after each test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        storage_settings = override_settings(
+            DEFAULT_FILE_STORAGE="django.core.files.storage.FileSystemStorage",
+            MEDIA_ROOT=media.name,
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+
+
+# ----------------------------- CLIENT -----------------------------
+class ClientListTests(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(20):
+            make_client(("vehicle", "health", "investment")[i % 3], name=f"Client {i}")
+
+    def test_list_query_count_is_constant(self):
+        with self.assertNumQueries(1):
+            res = self.api.get("/api/clients/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.json()), 20)
+
+    def test_list_filtered_by_type(self):
+        with self.assertNumQueries(1):
+            res = self.api.get("/api/clients/?insurance_type=health")
+        rows = res.json()
+        self.assertEqual(len(rows), 7)
+        self.assertTrue(all(r["health_details"] for r in rows))
+
+    def test_cursor_pagination_is_opt_in(self):
+        res = self.api.get("/api/clients/?page_size=8")
+        body = res.json()
+        self.assertEqual(len(body["results"]), 8)
+        self.assertIsNone(body["previous"])
+
+        seen = [r["id"] for r in body["results"]]
+        next_url = body["next"]
+        while next_url:
+            with self.assertNumQueries(1):
+                body = self.api.get(next_url).json()
+            seen += [r["id"] for r in body["results"]]
+            next_url = body["next"]
+
+        expected = list(
+            Client.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def list_sql(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.api.get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        return res.json(), queries[0]["sql"]
+
+    def test_sparse_fields(self):
+        rows, sql = self.list_sql("/api/clients/?fields=id,name,mobile,vehicle_details.renewal_date")
+        self.assertEqual(set(rows[0]), {"id", "name", "mobile", "vehicle_details"})
+        vehicle = [r["vehicle_details"] for r in rows if r["vehicle_details"]]
+        self.assertEqual(len(vehicle), 7)
+        self.assertEqual(set(vehicle[0]), {"renewal_date"})
+        self.assertIn("core_vehicleinsurance", sql)
+        self.assertNotIn("core_healthinsurance", sql)
+        self.assertNotIn('"core_client"."place"', sql)
+        self.assertNotIn('"core_vehicleinsurance"."vehicle_type"', sql)
+
+        rows, sql = self.list_sql("/api/clients/?fields=name")
+        self.assertEqual(rows[0], {"name": "Client 19"})
+        self.assertNotIn("JOIN", sql)
+
+        body, _ = self.list_sql("/api/clients/?fields=name&page_size=5")
+        self.assertEqual(len(body["results"]), 5)
+        self.assertEqual(self.list_sql(body["next"])[0]["results"][0], {"name": "Client 14"})
+
+    def test_expand(self):
+        rows, sql = self.list_sql("/api/clients/?expand=health_details&insurance_type=health")
+        full = self.api.get("/api/clients/?insurance_type=health").json()
+        for row in full:
+            del row["vehicle_details"], row["investment_details"]
+        self.assertEqual(rows, full)
+        self.assertNotIn("core_vehicleinsurance", sql)
+        self.assertNotIn("core_investmentdetails", sql)
+
+    def test_unknown_fields_rejected(self):
+        for query in ("fields=nope", "expand=name", "fields=name.first", "fields=vehicle_details.nope"):
+            res = self.api.get(f"/api/clients/?{query}")
+            self.assertEqual(res.status_code, 400, query)
+            self.assertIn("error", res.json())
+
+
+# ----------------------------- RENEWALS -----------------------------
+class RenewalSummaryTests(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        today = date.today()
+        self.month = today.strftime("%Y-%m")
+        past = today.replace(day=1)
+        make_client("health", renewal_date=past)
+        make_client("health", renewal_date=past, renewal_dismissed=True)
+        make_client("health", renewal_date=today + timedelta(days=400))
+        make_client("vehicle", renewal_date=past)
+        make_client("investment", renewal_date=past)
+
+    def test_product_summary_is_one_query(self):
+        with self.assertNumQueries(1):
+            res = self.api.get(f"/api/renewals/health/summary/?month={self.month}")
+        body = res.json()
+        self.assertEqual(body["month"], self.month)
+        self.assertEqual(body["dismissed"], 1)
+        self.assertEqual(body["pending"] + body["missed"], 1)
+
+        res = self.api.get(f"/api/renewals/vehicle/summary/?month={self.month}")
+        self.assertEqual(set(res.json()), {"month", "pending", "missed"})
+
+    def test_combined_summary(self):
+        with self.assertNumQueries(3):
+            res = self.api.get(f"/api/renewals/summary/?month={self.month}")
+        body = res.json()
+        self.assertEqual(body["health"]["dismissed"], 1)
+        for key in ("vehicle", "investment"):
+            self.assertEqual(body[key]["pending"] + body[key]["missed"], 1)
+
+    def test_month_is_validated(self):
+        self.assertEqual(self.api.get("/api/renewals/summary/").status_code, 400)
+        self.assertEqual(self.api.get("/api/renewals/health/?month=bad").status_code, 400)
+
+    def test_list_shape(self):
+        res = self.api.get(f"/api/renewals/health/?month={self.month}&status=dismissed")
+        rows = res.json()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(
+            list(rows[0]),
+            ["id", "renewal_date", "renewal_dismissed", "floater_type", "ages", "ped", "client"],
+        )
+        self.assertEqual(
+            list(rows[0]["client"]), ["id", "name", "mobile", "place", "insurance_type"]
+        )
+
+
+class RenewalCalendarTests(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        make_client("health", renewal_date=date(2030, 1, 10))
+        make_client("health", renewal_date=date(2030, 1, 20), renewal_dismissed=True)
+        make_client("vehicle", renewal_date=date(2030, 3, 5))
+        make_client("investment", renewal_date=date(2031, 1, 5))
+
+    def test_month_calendar(self):
+        with self.assertNumQueries(3):
+            res = self.api.get("/api/renewals/calendar/?from=2030-01&months=12")
+        products = res.json()["products"]
+        health = products["health"]
+        self.assertEqual(len(health), 12)
+        self.assertEqual(health[0], {"period": "2030-01", "pending": 1, "missed": 0, "dismissed": 1})
+        self.assertEqual(health[1]["pending"], 0)
+        self.assertEqual(products["vehicle"][2], {"period": "2030-03", "pending": 1, "missed": 0})
+        self.assertFalse(any(p["pending"] for p in products["investment"]))
+
+    def test_week_calendar(self):
+        res = self.api.get("/api/renewals/calendar/?from=2030-01&months=1&group=week")
+        health = res.json()["products"]["health"]
+        self.assertEqual(health[0]["period"], "2029-12-31")
+        counts = {p["period"]: p["pending"] for p in health}
+        self.assertEqual(counts["2030-01-07"], 1)
+
+    def test_validation(self):
+        self.assertEqual(self.api.get("/api/renewals/calendar/").status_code, 400)
+        self.assertEqual(
+            self.api.get("/api/renewals/calendar/?from=2030-01&months=100").status_code, 400
+        )
+
+
+# ----------------------------- CACHE -----------------------------
+class DashboardCacheTests(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        today = date.today()
+        self.month = today.strftime("%Y-%m")
+        self.client_obj = make_client("health", renewal_date=today)
+        self.url = f"/api/renewals/health/summary/?month={self.month}"
+
+    def test_renewal_summary_is_cached_until_renewal_fields_change(self):
+        self.assertEqual(self.api.get(self.url).json()["pending"], 1)
+        with self.assertNumQueries(0):
+            self.api.get(self.url)
+
+        health = HealthInsurance.objects.get(client=self.client_obj)
+        health.ped = "none"
+        health.save()
+        with self.assertNumQueries(0):
+            self.api.get(self.url)
+
+        health.renewal_dismissed = True
+        health.save()
+        body = self.api.get(self.url).json()
+        self.assertEqual((body["pending"], body["dismissed"]), (0, 1))
+
+    def test_moving_renewal_date_invalidates_both_months(self):
+        next_month = (date.today().replace(day=1) + timedelta(days=32)).strftime("%Y-%m")
+        next_url = f"/api/renewals/health/summary/?month={next_month}"
+        self.api.get(self.url)
+        self.api.get(next_url)
+
+        health = HealthInsurance.objects.get(client=self.client_obj)
+        health.renewal_date = date.fromisoformat(f"{next_month}-15")
+        health.save()
+        self.assertEqual(self.api.get(self.url).json()["pending"], 0)
+        self.assertEqual(self.api.get(next_url).json()["pending"], 1)
+
+        health.delete()
+        self.assertEqual(self.api.get(next_url).json()["pending"], 0)
+
+    def test_note_summary_invalidation(self):
+        url = "/api/notes/summary/"
+        self.assertEqual(self.api.get(url).json()["today"], 0)
+        note = Note.objects.create(
+            client=self.client_obj, text="call", follow_up_date=date.today()
+        )
+        self.assertEqual(self.api.get(url).json()["today"], 1)
+
+        # Bulk .update() bypasses signals; the view invalidates explicitly.
+        self.api.post("/api/notes/", {
+            "client": self.client_obj.id, "text": "again",
+            "follow_up_date": str(date.today() + timedelta(days=30)),
+        }, format="json")
+        self.assertFalse(Note.objects.get(id=note.id).reminder)
+        self.assertEqual(self.api.get(url).json()["today"], 0)
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": tmp,
+            }
+        }):
+            self.assertEqual(self.api.get(self.url).json()["pending"], 1)
+            with self.assertNumQueries(0):
+                self.api.get(self.url)
+            HealthInsurance.objects.filter(client=self.client_obj).get().delete()
+            self.assertEqual(self.api.get(self.url).json()["pending"], 0)
+
+
+class RenewalBulkTests(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.start = date(2030, 1, 10)
+        self.health = [make_client("health", renewal_date=self.start) for _ in range(3)]
+        self.vehicle = make_client("vehicle", renewal_date=self.start)
+
+    def test_bulk_health_mixed_items(self):
+        a, b, c = self.health
+        items = [
+            {"client_id": a.id, "next_renewal_date": "2031-01-10"},
+            {"client_id": b.id, "action": "dismiss"},
+            {"client_id": c.id, "renewal_date": "2030-02-01"},
+            {"client_id": self.vehicle.id, "action": "dismiss"},
+            {"client_id": a.id, "action": "dismiss"},
+            {"client_id": c.id + 1000, "renewal_date": "bad"},
+        ]
+        with self.assertNumQueries(5):
+            res = self.api.post("/api/renewals/health/bulk/", {"items": items}, format="json")
+        body = res.json()
+        self.assertEqual((body["updated"], body["failed"]), (3, 3))
+        self.assertEqual(
+            [r["success"] for r in body["results"]], [True, True, True, False, False, False]
+        )
+        self.assertIn("not found", body["results"][3]["error"])
+        self.assertEqual(body["results"][4]["error"], "duplicate client_id")
+
+        rows = {h.client_id: h for h in HealthInsurance.objects.all()}
+        self.assertEqual(rows[a.id].renewal_date, date(2031, 1, 10))
+        self.assertTrue(rows[b.id].renewal_dismissed)
+        self.assertEqual(rows[c.id].renewal_date, date(2030, 2, 1))
+
+    def test_bulk_invalidates_cached_summary(self):
+        url = "/api/renewals/health/summary/?month=2030-01"
+        self.assertEqual(self.api.get(url).json()["pending"], 3)
+        items = [{"client_id": self.health[0].id, "action": "dismiss"}]
+        self.api.post("/api/renewals/health/bulk/", {"items": items}, format="json")
+        self.assertEqual(self.api.get(url).json()["pending"], 2)
+
+    def test_vehicle_cannot_dismiss(self):
+        items = [{"client_id": self.vehicle.id, "action": "dismiss"}]
+        body = self.api.post("/api/renewals/vehicle/bulk/", {"items": items}, format="json").json()
+        self.assertEqual(body["failed"], 1)
+
+    def test_validation(self):
+        self.assertEqual(
+            self.api.post("/api/renewals/boats/bulk/", {"items": [{}]}, format="json").status_code, 404
+        )
+        self.assertEqual(
+            self.api.post("/api/renewals/health/bulk/", {"items": []}, format="json").status_code, 400
+        )
+
+
+# ----------------------------- SEARCH -----------------------------
+class ClientSearchTests(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.akhil = Client.objects.create(
+            name="Akhil Moses", mobile="+91 98765-43210", place="Kochi", insurance_type="health"
+        )
+        self.anu = Client.objects.create(
+            name="Anu Thomas", mobile="09876512345", place="Thrissur", insurance_type="vehicle"
+        )
+        Client.objects.create(name="Ravi", mobile="9123456789", place="Kollam", insurance_type="vehicle")
+
+    def search(self, **params):
+        res = self.api.get("/api/clients/search/", params)
+        self.assertEqual(res.status_code, 200)
+        return [c["id"] for c in res.json()]
+
+    def test_mobile_is_normalized(self):
+        self.assertEqual(self.akhil.mobile_normalized, "9876543210")
+        self.assertEqual(self.anu.mobile_normalized, "9876512345")
+
+    def test_mobile_prefix(self):
+        self.assertEqual(set(self.search(q="98765")), {self.akhil.id, self.anu.id})
+        self.assertEqual(self.search(q="+91 987654"), [self.akhil.id])
+        self.assertEqual(self.search(q="98765", insurance_type="vehicle"), [self.anu.id])
+
+    def test_name_and_place_with_typo(self):
+        self.assertEqual(self.search(q="akhil")[0], self.akhil.id)
+        self.assertEqual(self.search(q="Akhel Moses")[0], self.akhil.id)
+        self.assertEqual(self.search(q="thrisur")[0], self.anu.id)
+
+    def test_renamed_client_is_reindexed(self):
+        self.akhil.name = "Jayakrishnan"
+        self.akhil.save()
+        self.assertEqual(self.search(q="jayakrish"), [self.akhil.id])
+        self.assertNotIn(self.akhil.id, self.search(q="Akhil"))
+
+    def test_limit_and_empty_query(self):
+        self.assertEqual(self.search(q=""), [])
+        self.assertEqual(len(self.search(q="98", limit=1)), 0)
+        self.assertEqual(len(self.search(q="987", limit=1)), 1)
+
+    def test_backfill_migration(self):
+        Client.objects.update(mobile_normalized="")
+        migration = importlib.import_module("core.migrations.0021_client_mobile_normalized_search")
+        with mock.patch.object(migration, "BATCH_SIZE", 2):
+            migration.backfill_mobile_normalized(apps, connection.schema_editor())
+        self.assertEqual(
+            dict(Client.objects.values_list("name", "mobile_normalized")),
+            {"Akhil Moses": "9876543210", "Anu Thomas": "9876512345", "Ravi": "9123456789"},
+        )
+
+
+# ----------------------------- IMPORT -----------------------------
+IMPORT_CSV = """Name,Mobile,Place,Insurance Type,Ages,PED,Vehicle Type,Insurance Cover,Renewal Date,EMI Provider,EMI Amount
+Asha,9800000001,Kochi,health,"40, 38, 10",,,,2030-01-15,Bajaj,1500
+Binu,9800000002,Kollam,vehicle,,,car,full,2030-01-20,,
+,9800000003,Kochi,health,30,,,,,,
+Chitra,9800000004,Kochi,vehicle,,,bike,everything,,,
+Deepa,9800000005,Kochi,investment,,,,,2030-02-01,,abc
+Eby,9800000006,Kochi,health,55,,,,,,
+"""
+
+
+@override_settings(DEFAULT_FILE_STORAGE="django.core.files.storage.InMemoryStorage")
+class ClientImportTests(CRMTestCase):
+    def test_command_imports_valid_rows_and_reports_bad_ones(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "book.csv")
+            with open(path, "w") as f:
+                f.write(IMPORT_CSV)
+            call_command("import_clients", path, "--chunk-size", "2", stdout=io.StringIO())
+
+            with open(path + ".errors.csv") as f:
+                report = list(csv.DictReader(f))
+
+        self.assertEqual([r["line"] for r in report], ["4", "5", "6"])
+        self.assertIn("name", report[0]["errors"])
+        self.assertIn("insurance_cover", report[1]["errors"])
+        self.assertIn("emi", report[2]["errors"])
+
+        self.assertEqual(Client.objects.count(), 3)
+        asha = Client.objects.get(name="Asha")
+        self.assertEqual(asha.mobile_normalized, "9800000001")
+        self.assertEqual(asha.health_details.floater_type, "family")
+        self.assertEqual(asha.emi_details.get().emi_provider, "Bajaj")
+        self.assertEqual(Client.objects.get(name="Eby").health_details.floater_type, "individual")
+        self.assertEqual(
+            Client.objects.get(name="Binu").vehicle_details.renewal_date, date(2030, 1, 20)
+        )
+
+    def test_upload_endpoint(self):
+        summary_url = "/api/renewals/health/summary/?month=2030-01"
+        self.assertEqual(self.api.get(summary_url).json()["pending"], 0)
+
+        upload = SimpleUploadedFile("book.csv", IMPORT_CSV.encode(), content_type="text/csv")
+        res = self.api.post("/api/clients/import/", {"file": upload}, format="multipart")
+        self.assertEqual(res.status_code, 201)
+        body = res.json()
+        self.assertEqual((body["created"], body["failed"]), (3, 3))
+        self.assertTrue(body["error_report"])
+        self.assertEqual(body["errors"][0]["line"], 4)
+
+        # Imported renewals show up despite the cached summary.
+        self.assertEqual(self.api.get(summary_url).json()["pending"], 1)
+        self.assertEqual(self.api.get("/api/clients/search/?q=asha").json()[0]["name"], "Asha")
+
+    def test_rejects_unknown_format(self):
+        upload = SimpleUploadedFile("book.pdf", b"%PDF")
+        res = self.api.post("/api/clients/import/", {"file": upload}, format="multipart")
+        self.assertEqual(res.status_code, 400)
+
+
+# ----------------------------- EXPORT -----------------------------
+class ClientExportTests(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(7):
+            client = make_client(("vehicle", "health", "investment")[i % 3], name=f"C{i}")
+            Note.objects.create(client=client, text=f"note {i}", follow_up_date=date(2030, 1, 1))
+            EMIDetails.objects.create(client=client, emi_provider="Bajaj", emi_amount="100.50")
+        Document.objects.create(client=client, document_type="rc", file="documents/x.pdf")
+
+    def test_ndjson_stream_queries_per_chunk(self):
+        # 1 client query + 5 prefetches per chunk, plus the final empty page.
+        with self.assertNumQueries(6 + 1):
+            res = self.client.get("/api/export/clients/?format=ndjson")
+            body = b"".join(res.streaming_content).decode()
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[0]["name"], "C0")
+        self.assertEqual(rows[0]["emi_details"][0]["emi_amount"], "100.50")
+        self.assertEqual(rows[0]["notes"][0]["client_name"], "C0")
+        self.assertNotIn("documents", rows[0])
+
+    def test_csv_command(self):
+        out = io.StringIO()
+        with self.assertNumQueries(4 * 6 + 1):
+            call_command("export_clients", "--format", "csv", "--chunk-size", "2", stdout=out)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[1]["health_ages"], "30")
+        self.assertEqual(rows[0]["vehicle_vehicle_type"], "car")
+        self.assertEqual(json.loads(rows[0]["notes"])[0]["text"], "note 0")
+
+    def test_bad_format(self):
+        self.assertEqual(self.client.get("/api/export/clients/?format=xml").status_code, 400)
+
+
+# ----------------------------- REMINDERS -----------------------------
+class NoteDashboardTests(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        today = date.today()
+        clients = [make_client("vehicle", name=f"C{i}") for i in range(3)]
+        # Created through the ORM, so NoteViewSet's one-active-reminder
+        # rule does not switch the older reminders off.
+        for i in range(5):
+            Note.objects.create(client=clients[0], text=f"late {i}", follow_up_date=today - timedelta(days=10 - i))
+        Note.objects.create(client=clients[1], text="now", follow_up_date=today)
+        Note.objects.create(client=clients[1], text="done", follow_up_date=today, completed=True)
+        Note.objects.create(client=clients[2], text="soon", follow_up_date=today + timedelta(days=3))
+        Note.objects.create(client=clients[2], text="far", follow_up_date=today + timedelta(days=400))
+
+    def test_dashboard_is_one_query(self):
+        with self.assertNumQueries(1):
+            body = self.api.get("/api/notes/dashboard/?limit=2").json()
+        self.assertEqual(body["counts"], {"today": 1, "overdue": 5, "upcoming": 1})
+        self.assertEqual([n["text"] for n in body["overdue"]["results"]], ["late 0", "late 1"])
+        self.assertEqual(body["today"]["results"][0]["client_name"], "C1")
+        self.assertIsNone(body["today"]["next_cursor"])
+        self.assertTrue(body["overdue"]["next_cursor"])
+
+    def test_overdue_cursor(self):
+        seen = []
+        cursor = None
+        while True:
+            url = "/api/notes/dashboard/?limit=2"
+            if cursor:
+                url += f"&overdue_cursor={cursor}"
+            body = self.api.get(url).json()
+            seen += [n["text"] for n in body["overdue"]["results"]]
+            # Other buckets are unaffected by the overdue cursor.
+            self.assertEqual(body["counts"]["today"], 1)
+            cursor = body["overdue"]["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(seen, [f"late {i}" for i in range(5)])
+
+    def test_bad_cursor(self):
+        res = self.api.get("/api/notes/dashboard/?overdue_cursor=nope")
+        self.assertEqual(res.status_code, 400)
+
+    def test_bucket_lists_join_client(self):
+        with self.assertNumQueries(1):
+            self.api.get("/api/notes/overdue/")
+
+
+# ----------------------------- ETAG -----------------------------
+class ClientETagTests(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.obj = make_client("vehicle", renewal_date=date(2030, 1, 1))
+        self.url = f"/api/clients/{self.obj.id}/"
+
+    def etag(self):
+        res = self.api.get(self.url)
+        self.assertEqual(res.status_code, 200)
+        return res["ETag"]
+
+    def assert_not_modified(self, etag):
+        with self.assertNumQueries(1):
+            res = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+
+    def test_unchanged_client_returns_304(self):
+        self.assert_not_modified(self.etag())
+
+    def test_detail_fields_and_expand(self):
+        Note.objects.create(client=self.obj, text="call", follow_up_date=date(2030, 1, 1))
+        Quote.objects.create(client=self.obj, company_name="X", premium_amount=10)
+        full = self.api.get(self.url).json()
+
+        # Version lookup, client, notes: no details joined, no other children.
+        with self.assertNumQueries(3):
+            res = self.api.get(f"{self.url}?fields=id,name,notes.text")
+        self.assertEqual(res.json(), {"id": self.obj.id, "name": "Client", "notes": [{"text": "call"}]})
+
+        res = self.api.get(f"{self.url}?expand=quotes,vehicle_details")
+        dropped = {"health_details", "investment_details", "emi_details", "notes", "documents",
+                   "conversions", "investment_conversions"}
+        expected = {k: v for k, v in full.items() if k not in dropped}
+        self.assertEqual(res.json(), expected)
+
+    @override_settings(COMPRESS_MIN_BYTES=1)
+    def test_compressed_response_has_weak_etag(self):
+        res = self.api.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertEqual(res["ETag"], "W/" + self.etag())
+        self.assert_not_modified(res["ETag"])
+
+    def test_child_writes_change_etag(self):
+        etag = self.etag()
+        note = Note.objects.create(client=self.obj, text="call", follow_up_date=date(2030, 1, 1))
+        etag2 = self.etag()
+        self.assertNotEqual(etag, etag2)
+
+        note.delete()
+        etag3 = self.etag()
+        self.assertNotEqual(etag2, etag3)
+
+        self.api.post(
+            "/api/renewals/vehicle/bulk/",
+            {"items": [{"client_id": self.obj.id, "renewal_date": "2031-01-01"}]},
+            format="json",
+        )
+        self.assertNotEqual(self.etag(), etag3)
+
+    def test_etag_changes_with_the_url_signing_period(self):
+        etag = self.etag()
+        period = views.signing_period()
+        with mock.patch.object(views, "signing_period", return_value=period + 1):
+            res = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(res.status_code, 200)
+            self.assertNotEqual(res["ETag"], etag)
+            self.assert_not_modified(res["ETag"])
+
+    def test_client_write_changes_etag(self):
+        etag = self.etag()
+        self.api.patch(self.url, {"place": "Kochi"}, format="json")
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_missing_client(self):
+        self.assertEqual(self.api.get("/api/clients/999/").status_code, 404)
+
+    def test_client_delete_cascade_skips_touch(self):
+        Note.objects.create(client=self.obj, text="a", follow_up_date=date(2030, 1, 1))
+        Quote.objects.create(client=self.obj, company_name="X", premium_amount=1)
+        self.api.delete(f"/api/clients/{self.obj.id}/full-delete/")
+        self.assertFalse(Client.objects.exists())
+
+
+# ----------------------------- UPLOADS -----------------------------
+JPEG_BYTES = b"\xff\xd8\xff\xe0" + b"\x00" * 64
+
+
+class PresignedUploadTests(TempMediaMixin, CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.obj = make_client("vehicle")
+
+    def presign(self, **extra):
+        data = {"client": self.obj.id, "document_type": "rc", "filename": "RC Book.JPG",
+                "content_type": "image/jpeg", **extra}
+        return self.api.post("/api/documents/presign/", data, format="json")
+
+    def put(self, url, body):
+        return self.api.generic("PUT", url, body, content_type="image/jpeg")
+
+    def test_presign_upload_confirm(self):
+        res = self.presign()
+        self.assertEqual(res.status_code, 201)
+        body = res.json()
+        doc = Document.objects.get(id=body["id"])
+        self.assertEqual(doc.status, "pending")
+        self.assertTrue(doc.file.name.endswith(".jpg"))
+
+        # Pending documents are hidden until confirmed.
+        self.assertEqual(self.api.get(f"/api/documents/?client={self.obj.id}").json(), [])
+
+        self.assertEqual(self.put(body["upload_url"], JPEG_BYTES).status_code, 200)
+        res = self.api.post(f"/api/documents/{doc.id}/confirm/")
+        self.assertEqual(res.status_code, 200)
+        doc.refresh_from_db()
+        self.assertEqual((doc.status, doc.size, doc.content_type), ("active", len(JPEG_BYTES), "image/jpeg"))
+        self.assertEqual(len(self.api.get(f"/api/documents/?client={self.obj.id}").json()), 1)
+
+    def test_confirm_rejects_wrong_type_and_missing_file(self):
+        body = self.presign().json()
+        self.put(body["upload_url"], b"not really a picture")
+        res = self.api.post(f"/api/documents/{body['id']}/confirm/")
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(Document.objects.filter(id=body["id"]).exists())
+
+        body = self.presign().json()
+        res = self.api.post(f"/api/documents/{body['id']}/confirm/")
+        self.assertEqual(res.json()["error"], "file was not uploaded")
+
+    def test_bad_token_and_validation(self):
+        body = self.presign().json()
+        url = body["upload_url"].split("?")[0] + "?token=forged"
+        self.assertEqual(self.put(url, JPEG_BYTES).status_code, 403)
+        self.assertEqual(self.presign(content_type="text/html").status_code, 400)
+        self.assertEqual(self.presign(document_type=None).status_code, 400)
+
+    def test_upload_state_is_read_only(self):
+        res = self.api.post("/api/documents/", {
+            "client": self.obj.id, "document_type": "rc",
+            "file": SimpleUploadedFile("rc.jpg", JPEG_BYTES, content_type="image/jpeg"),
+            "status": "pending", "size": 1, "content_type": "text/html",
+        }, format="multipart")
+        self.assertEqual(res.status_code, 201)
+        doc = Document.objects.get(id=res.json()["id"])
+        self.assertEqual((doc.status, doc.size, doc.content_type), ("active", None, ""))
+
+        body = self.presign().json()
+        self.api.patch(f"/api/documents/{doc.id}/", {"size": 5, "content_type": "image/png"}, format="json")
+        self.api.patch(f"/api/documents/{body['id']}/", {"status": "active"}, format="json")
+        doc.refresh_from_db()
+        self.assertEqual((doc.size, doc.content_type), (None, ""))
+        self.assertEqual(Document.objects.get(id=body["id"]).status, "pending")
+
+    def test_worker_reaps_abandoned_uploads(self):
+        abandoned, fresh = self.presign().json(), self.presign().json()
+        self.put(abandoned["upload_url"], JPEG_BYTES)
+        name = Document.objects.get(id=abandoned["id"]).file.name
+        Document.objects.filter(id=abandoned["id"]).update(uploaded_at=now() - ABANDONED_UPLOAD_AFTER)
+        confirmed = self.presign().json()
+        self.put(confirmed["upload_url"], JPEG_BYTES)
+        self.api.post(f"/api/documents/{confirmed['id']}/confirm/")
+        Document.objects.filter(id=confirmed["id"]).update(uploaded_at=now() - ABANDONED_UPLOAD_AFTER)
+
+        out = io.StringIO()
+        call_command("purge_clients", stdout=out)
+        self.assertIn("Deleted 1 abandoned uploads", out.getvalue())
+        self.assertEqual(set(Document.objects.values_list("id", flat=True)), {fresh["id"], confirmed["id"]})
+        self.assertFalse(default_storage.exists(name))
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE="storages.backends.s3boto3.S3Boto3Storage",
+    AWS_ACCESS_KEY_ID="test", AWS_SECRET_ACCESS_KEY="test", AWS_STORAGE_BUCKET_NAME="crm-docs",
+    AWS_S3_REGION_NAME="us-east-1", AWS_S3_ENDPOINT_URL="https://s3.test", AWS_S3_ADDRESSING_STYLE="path",
+)
+class S3UploadTests(CRMTestCase):
+    """
+    The production path: a real presigned S3 PUT, then HEAD and a ranged
+    GET at confirm, against a stubbed S3 client.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.obj = make_client("vehicle")
+        self.s3 = Stubber(default_storage.bucket.meta.client)
+        self.s3.activate()
+        self.addCleanup(self.s3.deactivate)
+
+    def presign(self):
+        res = self.api.post("/api/documents/presign/", {
+            "client": self.obj.id, "document_type": "rc", "filename": "rc.jpg", "content_type": "image/jpeg",
+        }, format="json")
+        self.assertEqual(res.status_code, 201)
+        return res.json(), Document.objects.get(id=res.json()["id"]).file.name
+
+    def stub_upload(self, key, body, size=None):
+        size = len(body) if size is None else size
+        self.s3.add_response("head_object", {"ContentLength": size}, {"Bucket": "crm-docs", "Key": key})
+        head = body[:16]
+        self.s3.add_response(
+            "get_object", {"Body": StreamingBody(io.BytesIO(head), len(head))},
+            {"Bucket": "crm-docs", "Key": key, "Range": "bytes=0-15"},
+        )
+
+    def test_presign_returns_a_signed_put_for_the_pending_key(self):
+        body, key = self.presign()
+        url = urlsplit(body["upload_url"])
+        self.assertEqual((url.netloc, url.path), ("s3.test", f"/crm-docs/{key}"))
+        query = parse_qs(url.query)
+        self.assertTrue({"Signature", "X-Amz-Signature"} & set(query), body["upload_url"])
+        self.assertEqual(body["headers"], {"Content-Type": "image/jpeg"})
+        self.s3.assert_no_pending_responses()
+
+    def test_confirm_checks_size_and_type_from_s3(self):
+        body, key = self.presign()
+        self.stub_upload(key, JPEG_BYTES)
+        res = self.api.post(f"/api/documents/{body['id']}/confirm/")
+        self.assertEqual(res.status_code, 200, res.content)
+        self.assertEqual((res.json()["status"], res.json()["size"]), ("active", len(JPEG_BYTES)))
+        self.s3.assert_no_pending_responses()
+
+    def test_confirm_deletes_oversized_wrong_type_and_missing_uploads(self):
+        for upload, error in (
+            ((JPEG_BYTES, uploads.MAX_UPLOAD_BYTES + 1), "larger than"),
+            ((b"<html>not an image</html>", None), "only JPEG"),
+            (None, "was not uploaded"),
+        ):
+            body, key = self.presign()
+            if upload is None:
+                self.s3.add_client_error("head_object", "404", http_status_code=404,
+                                         expected_params={"Bucket": "crm-docs", "Key": key})
+            else:
+                self.stub_upload(key, *upload)
+            self.s3.add_response("delete_object", {}, {"Bucket": "crm-docs", "Key": key})
+
+            res = self.api.post(f"/api/documents/{body['id']}/confirm/")
+            self.assertEqual(res.status_code, 400)
+            self.assertIn(error, res.json()["error"])
+            self.assertFalse(Document.objects.filter(id=body["id"]).exists())
+            self.s3.assert_no_pending_responses()
+
+
+# ----------------------------- PURGE -----------------------------
+class ClientPurgeTests(TempMediaMixin, CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.obj = make_client("health", renewal_date=date.today())
+        for i in range(5):
+            Note.objects.create(client=self.obj, text=f"n{i}", follow_up_date=date.today())
+        Quote.objects.create(client=self.obj, company_name="X", premium_amount=10)
+        EMIDetails.objects.create(client=self.obj, emi_provider="Bajaj", emi_amount=1000,
+                                  emi_tenure="3 months", first_due_date=date.today())
+        self.files = []
+        for i in range(3):
+            name = default_storage.save(f"documents/{i}.pdf", ContentFile(b"%PDF-1.4"))
+            Document.objects.create(client=self.obj, document_type="rc", file=name)
+            self.files.append(name)
+        self.other = make_client("health", renewal_date=date.today())
+
+    def test_soft_delete_hides_client_immediately(self):
+        month = date.today().strftime("%Y-%m")
+        summary = f"/api/renewals/health/summary/?month={month}"
+        self.assertEqual(self.api.get(summary).json()["pending"], 2)
+        self.assertEqual(self.api.get("/api/notes/summary/").json()["today"], 5)
+
+        res = self.api.delete(f"/api/clients/{self.obj.id}/")
+        self.assertEqual(res.status_code, 202)
+        self.assertEqual(res.json()["status"], "queued")
+
+        self.assertEqual(self.api.get(f"/api/clients/{self.obj.id}/").status_code, 404)
+        self.assertEqual([c["id"] for c in self.api.get("/api/clients/").json()], [self.other.id])
+        self.assertEqual(self.api.get(summary).json()["pending"], 1)
+        self.assertEqual(self.api.get("/api/notes/summary/").json()["today"], 0)
+        # Nothing is removed until the worker runs.
+        self.assertEqual(Note.objects.count(), 5)
+
+    def test_worker_purges_in_batches(self):
+        res = self.api.delete(f"/api/clients/{self.obj.id}/full-delete/")
+        self.assertEqual(res.status_code, 202)
+        self.assertEqual(res.json()["message"], "Client purge queued")
+        purge_id = res.json()["purge_id"]
+        call_command("purge_clients", "--batch-size", "2", stdout=io.StringIO())
+
+        job = self.api.get(f"/api/purges/{purge_id}/").json()
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["progress"]["note"], 5)
+        self.assertEqual(job["progress"]["document"], 3)
+        self.assertEqual(job["files_deleted"], 3)
+
+        self.assertFalse(Client.all_objects.filter(id=self.obj.id).exists())
+        self.assertFalse(Note.objects.exists())
+        self.assertEqual(set(HealthMember.objects.values_list("policy__client_id", flat=True)), {self.other.id})
+        self.assertFalse(EMIInstallment.objects.exists())
+        self.assertFalse(any(default_storage.exists(name) for name in self.files))
+        self.assertTrue(Client.objects.filter(id=self.other.id).exists())
+
+    def test_loop_survives_a_failed_pass(self):
+        reap = mock.patch.object(purge_clients, "reap_abandoned_uploads", side_effect=[OSError("S3 is down"), 0])
+        sleep = mock.patch.object(purge_clients.time, "sleep", side_effect=[None, KeyboardInterrupt])
+        self.api.delete(f"/api/clients/{self.obj.id}/")
+        with reap as reaped, sleep, self.assertLogs("core.purge", "ERROR") as logs:
+            with self.assertRaises(KeyboardInterrupt):
+                call_command("purge_clients", "--loop", stdout=io.StringIO())
+        self.assertEqual(reaped.call_count, 2)
+        self.assertIn("S3 is down", "\n".join(logs.output))
+        self.assertFalse(Client.all_objects.filter(id=self.obj.id).exists())
+
+        with mock.patch.object(purge_clients, "reap_abandoned_uploads", side_effect=OSError("S3 is down")):
+            with self.assertRaises(OSError):
+                call_command("purge_clients", stdout=io.StringIO())
+
+    def test_no_files_means_no_storage_calls(self):
+        # Reading S3Storage.bucket opens a connection.
+        storage, bucket = mock.Mock(), mock.PropertyMock()
+        type(storage).bucket = bucket
+        self.assertEqual(uploads.delete_files(["", None], storage=storage), 0)
+        bucket.assert_not_called()
+        self.assertEqual(storage.mock_calls, [])
+
+    def assertHiddenOnceDeleted(self, url, row, change):
+        def listed():
+            return {item["id"] for item in self.api.get(url).json()}
+
+        self.assertIn(row.id, listed())
+        self.api.delete(f"/api/clients/{row.client_id}/")
+        self.assertNotIn(row.id, listed())
+        self.assertEqual(self.api.get(f"{url}{row.id}/").status_code, 404)
+        self.assertEqual(self.api.patch(f"{url}{row.id}/", change, format="json").status_code, 404)
+
+    def test_vehicle_policies_of_deleted_clients_are_hidden(self):
+        policy = make_client("vehicle").vehicle_details
+        self.assertHiddenOnceDeleted("/api/vehicle-insurance/", policy, {"vehicle_type": "bike"})
+
+    def test_health_policies_of_deleted_clients_are_hidden(self):
+        self.assertHiddenOnceDeleted("/api/health-insurance/", self.obj.health_details, {"ped": "none"})
+        ids = [p["id"] for p in self.api.get("/api/health-insurance/?max_age_gte=18").json()]
+        self.assertEqual(ids, [self.other.health_details.id])
+
+    def test_investments_of_deleted_clients_are_hidden(self):
+        investment = make_client("investment").investment_details
+        self.assertHiddenOnceDeleted("/api/investment-details/", investment, {"remarks": "x"})
+
+    def test_quotes_of_deleted_clients_are_hidden(self):
+        self.assertHiddenOnceDeleted("/api/quotes/", self.obj.quotes.get(), {"company_name": "Y"})
+
+    def test_documents_of_deleted_clients_are_hidden(self):
+        self.assertHiddenOnceDeleted("/api/documents/", self.obj.documents.first(), {"document_type": "pan"})
+
+    def test_emi_plans_of_deleted_clients_are_hidden(self):
+        plan = EMIDetails.objects.create(client=self.obj, emi_provider="Bajaj")
+        self.assertHiddenOnceDeleted("/api/emi-details/", plan, {"emi_provider": "HDFC"})
+
+
+# ----------------------------- RENDITIONS -----------------------------
+class DocumentRenditionTests(TempMediaMixin, CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.obj = make_client("vehicle")
+
+    def photo(self, size=(3000, 4000), fmt="JPEG"):
+        image = Image.linear_gradient("L").resize(size).convert("RGB")
+        out = io.BytesIO()
+        image.save(out, fmt, quality=98)
+        return out.getvalue()
+
+    def add_document(self, data, name, content_type=""):
+        doc = Document(client=self.obj, document_type="rc", content_type=content_type)
+        doc.file.save(name, ContentFile(data), save=False)
+        doc.save()
+        return doc
+
+    def test_image_gets_archive_and_preview(self):
+        original = self.photo()
+        doc = self.add_document(original, "rc.jpg", "image/jpeg")
+        self.assertEqual(doc.processing, "queued")
+
+        self.assertEqual(renditions.process_pending(workers=0), {"done": 1})
+        doc.refresh_from_db()
+        self.assertEqual(doc.processing, "done")
+        self.assertLess(doc.archive_file.size, len(original))
+        with Image.open(doc.archive_file) as archive:
+            self.assertEqual(max(archive.size), renditions.ARCHIVE_MAX_PX)
+        with Image.open(doc.preview_file) as preview:
+            self.assertEqual(preview.size, (360, 480))
+
+        listed = self.api.get(f"/api/documents/?client={self.obj.id}").json()[0]
+        self.assertTrue(listed["url"].endswith(doc.preview_file.url))
+        original_url = self.api.get(f"/api/documents/{doc.id}/?rendition=original").json()["url"]
+        self.assertTrue(original_url.endswith(doc.file.url))
+
+    def test_scanned_pdf_and_unknown_files(self):
+        scan = io.BytesIO()
+        Image.linear_gradient("L").resize((2500, 3500)).save(scan, "PDF")
+        pdf = self.add_document(scan.getvalue(), "policy.pdf")
+        junk = self.add_document(b"not a document", "notes.txt")
+
+        counts = renditions.process_pending(workers=0)
+        self.assertEqual(counts, {"done": 1, "skipped": 1})
+        pdf.refresh_from_db()
+        junk.refresh_from_db()
+        self.assertTrue(pdf.preview_file)
+        self.assertEqual(junk.processing, "skipped")
+        self.assertEqual(self.api.get(f"/api/documents/{junk.id}/").json()["url"].split("/")[-1], "notes.txt")
+
+    def test_command_uses_process_pool_and_pending_uploads_wait(self):
+        done = self.add_document(self.photo((1200, 1600), "PNG"), "aadhaar.png")
+        pending = self.add_document(self.photo((100, 100)), "later.jpg")
+        Document.objects.filter(id=pending.id).update(status="pending")
+
+        out = io.StringIO()
+        call_command("process_documents", "--workers", "1", stdout=out)
+        self.assertIn("done 1", out.getvalue())
+        self.assertEqual(
+            dict(Document.objects.values_list("id", "processing")),
+            {done.id: "done", pending.id: "queued"},
+        )
+
+    def test_storage_error_fails_only_that_document(self):
+        broken = self.add_document(self.photo((800, 600)), "broken.jpg", "image/jpeg")
+        fine = self.add_document(self.photo((800, 600)), "fine.jpg", "image/jpeg")
+        save = renditions.save_renditions
+
+        def flaky_save(document, *args):
+            if document.pk == broken.pk:
+                raise OSError("bucket unavailable")
+            return save(document, *args)
+
+        with mock.patch.object(renditions, "save_renditions", side_effect=flaky_save), \
+                self.assertLogs("core.renditions", "ERROR"):
+            self.assertEqual(renditions.process_pending(workers=0), {"done": 1, "failed": 1})
+        self.assertEqual(
+            dict(Document.objects.values_list("id", "processing")),
+            {broken.id: "failed", fine.id: "done"},
+        )
+        self.assertEqual(Document.objects.get(id=broken.id).processing_error, "OSError: bucket unavailable")
+
+    def test_documents_left_running_are_requeued(self):
+        stale = self.add_document(self.photo((800, 600)), "stale.jpg", "image/jpeg")
+        claimed = self.add_document(self.photo((800, 600)), "claimed.jpg", "image/jpeg")
+        Document.objects.filter(id=stale.id).update(
+            processing="running", processing_started_at=now() - renditions.STALE_AFTER - timedelta(minutes=1)
+        )
+        Document.objects.filter(id=claimed.id).update(processing="running", processing_started_at=now())
+
+        self.assertEqual(renditions.process_pending(workers=0), {"done": 1})
+        self.assertEqual(
+            dict(Document.objects.values_list("id", "processing")),
+            {stale.id: "done", claimed.id: "running"},
+        )
+
+    def test_loop_survives_a_failed_pass(self):
+        process = mock.patch.object(process_documents, "process_pending", side_effect=[OSError("DB is down"), {}])
+        sleep = mock.patch.object(process_documents.time, "sleep", side_effect=[None, KeyboardInterrupt])
+        with process as processed, sleep, self.assertLogs("core.renditions", "ERROR"):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command("process_documents", "--loop", stdout=io.StringIO())
+        self.assertEqual(processed.call_count, 2)
+
+
+# ----------------------------- QUERY BUDGETS -----------------------------
+@override_settings(DEFAULT_FILE_STORAGE="django.core.files.storage.FileSystemStorage")
+class QueryBudgetTests(CRMTestCase):
+    """
+    Every budgeted endpoint stays within settings.QUERY_BUDGETS, and its
+    query count does not grow with the number of rows (no N+1).
+    """
+
+    def add_book(self, per_type):
+        today = date.today()
+        for insurance_type in ("vehicle", "health", "investment"):
+            for i in range(per_type):
+                obj = make_client(insurance_type, name=f"Client {i}", renewal_date=today)
+                Note.objects.create(client=obj, text="call", follow_up_date=today, reminder=True)
+                Quote.objects.create(client=obj, company_name="X", premium_amount=10)
+                EMIDetails.objects.create(client=obj, emi_provider="Bajaj", emi_amount=1000, emi_tenure="2")
+                Document.objects.create(client=obj, document_type="rc", file="documents/rc.jpg")
+        self.obj = obj
+
+    def urls(self):
+        month = date.today().strftime("%Y-%m")
+        urls = [
+            "/api/clients/",
+            "/api/clients/?page_size=20",
+            f"/api/clients/{self.obj.id}/",
+            "/api/clients/search/?q=Client",
+            "/api/notes/",
+            "/api/notes/today/",
+            "/api/notes/overdue/",
+            "/api/notes/upcoming/",
+            "/api/vehicle-insurance/",
+            "/api/health-insurance/",
+            "/api/health-insurance/?max_age_gte=18&age_band=0-90",
+            "/api/investment-details/",
+            "/api/notes/summary/",
+            "/api/notes/dashboard/",
+            "/api/quotes/",
+            "/api/emi-details/",
+            "/api/emi-installments/?paid=false",
+            "/api/emi/due/",
+            "/api/emi/overdue/",
+            "/api/emi/collected/",
+            f"/api/documents/?client={self.obj.id}",
+            "/api/purges/",
+            f"/api/renewals/summary/?month={month}",
+            f"/api/renewals/calendar/?from={month}",
+            "/api/analytics/?group=company,posp_code",
+            "/api/digest/",
+            f"/api/async/renewals/summary/?month={month}",
+            "/api/async/notes/summary/",
+            "/api/async/notes/dashboard/",
+            "/api/async/clients/search/?q=Client",
+        ]
+        for prefix, model in (
+            ("vehicle-insurance", VehicleInsurance), ("health-insurance", HealthInsurance),
+            ("investment-details", InvestmentDetails), ("notes", Note), ("quotes", Quote),
+            ("emi-details", EMIDetails), ("emi-installments", EMIInstallment), ("documents", Document),
+        ):
+            urls.append(f"/api/{prefix}/{model.objects.latest('pk').pk}/")
+        for product in ("health", "vehicle", "investment"):
+            urls += [f"/api/renewals/{product}/summary/?month={month}", f"/api/renewals/{product}/?month={month}"]
+            urls += [f"/api/async/renewals/{product}/summary/?month={month}", f"/api/async/renewals/{product}/?month={month}"]
+        return urls
+
+    def measure(self):
+        counts = []
+        for url in self.urls():
+            cache.clear()
+            res = self.api.get(url)
+            self.assertEqual(res.status_code, 200, url)
+            self.assertWithinQueryBudget(res)
+            counts.append((res.query_metrics.endpoint, res.query_metrics.queries))
+        return counts
+
+    def test_endpoints_within_budget_and_constant(self):
+        self.add_book(2)
+        # Built by cron; the signals keep it current as the book grows.
+        digest.rebuild()
+        small = self.measure()
+        self.add_book(10)
+        self.assertEqual(self.measure(), small)
+
+    def test_server_timing_header(self):
+        self.add_book(1)
+        res = self.api.get("/api/notes/")
+        self.assertEqual(res.query_metrics.endpoint, "note-list")
+        self.assertRegex(res["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", ser;dur=[\d.]+, app;dur=[\d.]+, size;desc="\d+ bytes"$')
+        self.assertEqual(res.query_metrics.response_bytes, len(res.content))
+        self.assertGreater(res.query_metrics.serializer_ms, 0)
+
+        res = self.api.get(f"/api/renewals/health/summary/?month={date.today():%Y-%m}")
+        self.assertEqual(res.query_metrics.endpoint, "health_renewal_summary")
+
+    def test_budget_overrun_logs_warning(self):
+        self.add_book(1)
+        with override_settings(QUERY_BUDGETS={"client-list": 0}):
+            with self.assertLogs("core.metrics", "WARNING") as logs:
+                self.api.get("/api/clients/")
+        self.assertIn("client-list ran 1 queries, over its budget of 0", logs.output[-1])
+
+
+# ----------------------------- SEED / BENCHMARK -----------------------------
+@override_settings(DEFAULT_FILE_STORAGE="django.core.files.storage.FileSystemStorage")
+class SeedBenchmarkTests(CRMTestCase):
+    def test_seed_book(self):
+        today = date.today()
+        counts = seed_book(300, seed=1, today=today, chunk_size=120)
+        self.assertEqual(sum(counts.values()), 300)
+        self.assertEqual(Client.objects.count(), 300)
+        for insurance_type, related in (
+            ("vehicle", "vehicle_details"), ("health", "health_details"), ("investment", "investment_details"),
+        ):
+            qs = Client.objects.filter(insurance_type=insurance_type)
+            self.assertEqual(qs.filter(**{f"{related}__isnull": False}).count(), counts[insurance_type])
+
+        self.assertTrue(Note.objects.filter(follow_up_date__lt=today).exists())
+        self.assertTrue(Note.objects.filter(follow_up_date__gt=today).exists())
+        self.assertTrue(Quote.objects.exists() and EMIDetails.objects.exists())
+        converted = Client.objects.filter(is_converted=True).count()
+        self.assertEqual(
+            converted,
+            Client.objects.filter(is_converted=True).filter(
+                Q(conversions__isnull=False) | Q(investment_conversions__isnull=False)
+            ).count(),
+        )
+        created = Client.objects.aggregate(first=Min("created_at"), last=Max("created_at"))
+        self.assertGreater((created["last"] - created["first"]).days, 365)
+        renewal_dates = VehicleInsurance.objects.aggregate(first=Min("renewal_date"), last=Max("renewal_date"))
+        self.assertLess(renewal_dates["first"], today - timedelta(days=300))
+        self.assertGreater(renewal_dates["last"], today + timedelta(days=300))
+
+        # Same seed, same book.
+        names = list(Client.objects.order_by("id").values_list("name", "mobile")[:20])
+        Client.objects.all().delete()
+        seed_book(300, seed=1, today=today, chunk_size=120)
+        self.assertEqual(list(Client.objects.order_by("id").values_list("name", "mobile")[:20]), names)
+
+    def test_benchmark_run_and_compare(self):
+        cache.set("app-key", "kept")
+        results = benchmark.run(scales=[20, 40], repeat=2)
+        # The app's own cache is neither used nor cleared.
+        self.assertEqual(cache.get("app-key"), "kept")
+        self.assertEqual(Document.objects.values("client_id").distinct().count(), 2)
+        self.assertEqual(list(results["scales"]), ["20", "40"])
+        self.assertEqual(results["scales"]["40"]["clients"], 40)
+        routes = results["scales"]["40"]["routes"]
+        self.assertEqual(set(routes), {name for name, _ in benchmark.ROUTES})
+        for name, route in routes.items():
+            self.assertEqual(route["status"], 200, name)
+            self.assertLessEqual(route["p50_ms"], route["p99_ms"])
+        self.assertEqual(routes["note-summary"]["queries"], 3)
+
+        compared = list(benchmark.compare(results, results))
+        self.assertEqual(len(compared), 2 * len(benchmark.ROUTES))
+        self.assertTrue(all(ratio == 1 for *_, ratio in compared))
+
+
+# ----------------------------- ANALYTICS -----------------------------
+class AnalyticsTests(CRMTestCase):
+    def convert(self, insurance_type, company, posp, amount):
+        obj = make_client(insurance_type)
+        if insurance_type == "investment":
+            res = self.api.post(f"/api/convert-investment-client/{obj.id}/", {
+                "posp_code": posp, "company_name": company, "investment_amount": amount,
+                "policy_name": "ULIP", "investment_paying_term": "10 years",
+            }, format="json")
+        else:
+            res = self.api.post(f"/api/convert-client/{obj.id}/", {
+                "posp_code": posp, "customer_name": obj.name, "company_name": company,
+                "premium_amount": amount, "policy_number": "P1", "customer_mobile": obj.mobile,
+            }, format="json")
+        self.assertEqual(res.status_code, 200, res.content)
+        return obj
+
+    def setUp(self):
+        super().setUp()
+        self.first = self.convert("vehicle", "Tata AIG", "POSP1", "1000.50")
+        self.convert("vehicle", "Tata AIG", "POSP2", "500")
+        self.convert("health", "Star Health", "POSP1", "12000")
+        self.convert("investment", "LIC", "POSP2", "100000")
+        self.convert("investment", "LIC", "POSP2", "50000")
+
+    def rollup_rows(self):
+        return sorted(ConversionRollup.objects.values_list(
+            "day", "insurance_type", "company_name", "posp_code",
+            "conversions", "premium_total", "investment_total",
+        ))
+
+    def test_conversions_update_rollups(self):
+        self.assertEqual(ConversionRollup.objects.count(), 4)
+        lic = ConversionRollup.objects.get(company_name="LIC")
+        self.assertEqual((lic.conversions, str(lic.investment_total)), (2, "150000.00"))
+
+        res = self.api.get("/api/analytics/?group=company")
+        self.assertEqual(res.json()["results"], [
+            {"company": "LIC", "conversions": 2, "premium_total": "0.00", "investment_total": "150000.00"},
+            {"company": "Star Health", "conversions": 1, "premium_total": "12000.00", "investment_total": "0.00"},
+            {"company": "Tata AIG", "conversions": 2, "premium_total": "1500.50", "investment_total": "0.00"},
+        ])
+        self.assertEqual(res.json()["totals"]["conversions"], 5)
+
+        month = date.today().strftime("%Y-%m")
+        rows = self.api.get("/api/analytics/").json()["results"]
+        self.assertEqual(
+            [(r["month"], r["insurance_type"], r["conversions"]) for r in rows],
+            [(month, "health", 1), (month, "investment", 2), (month, "vehicle", 2)],
+        )
+
+        rows = self.api.get("/api/analytics/?group=posp_code&insurance_type=investment").json()["results"]
+        self.assertEqual(rows, [
+            {"posp_code": "POSP2", "conversions": 2, "premium_total": "0.00", "investment_total": "150000.00"},
+        ])
+
+    def test_reads_only_rollups(self):
+        tomorrow = date.today() + timedelta(days=1)
+        with CaptureQueriesContext(connection) as queries:
+            res = self.api.get(f"/api/analytics/?group=day,company&to={tomorrow}")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(all("core_conversionrollup" in q["sql"] for q in queries))
+        self.assertFalse(any("conversion\"" in q["sql"].replace("conversionrollup", "") for q in queries))
+
+        past = date.today() - timedelta(days=1)
+        self.assertEqual(self.api.get(f"/api/analytics/?to={past}").json()["totals"]["conversions"], 0)
+        self.assertEqual(self.api.get("/api/analytics/?group=region").status_code, 400)
+        self.assertEqual(self.api.get("/api/analytics/?from=May").status_code, 400)
+        self.assertEqual(self.api.get("/api/analytics/?from=2030-02-30").status_code, 400)
+
+    def test_rebuild_matches_incremental_and_purge_decrements(self):
+        incremental = self.rollup_rows()
+        ConversionRollup.objects.update(conversions=99)
+        call_command("rebuild_analytics", stdout=io.StringIO())
+        self.assertEqual(self.rollup_rows(), incremental)
+
+        ConversionRollup.objects.all().delete()
+        migration = importlib.import_module("core.migrations.0026_conversion_rollup")
+        migration.build_rollups(apps, connection.schema_editor())
+        self.assertEqual(self.rollup_rows(), incremental)
+
+        self.api.delete(f"/api/clients/{self.first.id}/")
+        purge.process_pending()
+        self.assertFalse(Client.all_objects.filter(id=self.first.id).exists())
+        tata = ConversionRollup.objects.get(company_name="Tata AIG", posp_code="POSP2")
+        self.assertEqual(tata.conversions, 1)
+        self.assertFalse(ConversionRollup.objects.filter(posp_code="POSP1", company_name="Tata AIG").exists())
+        rows = self.rollup_rows()
+        call_command("rebuild_analytics", stdout=io.StringIO())
+        self.assertEqual(self.rollup_rows(), rows)
+
+
+# ----------------------------- HEALTH MEMBERS -----------------------------
+class HealthMemberTests(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quarter = date(2027, 1, 1), date(2027, 3, 31)
+        self.family = make_client(
+            "health", name="Family", ages="64, 58 yrs,12", floater_type="family", renewal_date=date(2027, 2, 10),
+        )
+        self.couple = make_client("health", name="Couple", ages="35,33", renewal_date=date(2027, 2, 1))
+        self.single = make_client("health", name="Single", ages="71", renewal_date=date(2027, 3, 1))
+        self.late = make_client("health", name="Late", ages="66,60", renewal_date=date(2027, 5, 1))
+
+    def policy_ids(self, query):
+        res = self.api.get(f"/api/health-insurance/?{query}")
+        self.assertEqual(res.status_code, 200, res.content)
+        self.assertWithinQueryBudget(res)
+        return sorted(row["client"] for row in res.json())
+
+    def test_parse_ages(self):
+        self.assertEqual(parse_ages("45, 42 yrs,8"), [45, 42, 8])
+        self.assertEqual(parse_ages(" , NA, 500,7"), [7])
+        self.assertEqual(parse_ages(None), [])
+
+    def test_members_follow_ages(self):
+        health = HealthInsurance.objects.get(client=self.family)
+        self.assertEqual((health.member_count, health.max_age), (3, 64))
+        self.assertEqual(list(health.members.order_by("position").values_list("age", flat=True)), [64, 58, 12])
+
+        health.ages = "40"
+        health.save(update_fields=["ages"])
+        health.refresh_from_db()
+        self.assertEqual((health.member_count, health.max_age), (1, 40))
+        self.assertEqual(list(health.members.values_list("age", flat=True)), [40])
+
+        res = self.api.patch(f"/api/health-insurance/{health.id}/", {"ages": "41,39"}, format="json")
+        self.assertEqual((res.json()["member_count"], res.json()["max_age"]), (2, 41))
+        self.assertEqual(sorted(health.members.values_list("age", flat=True)), [39, 41])
+
+    def test_filters(self):
+        start, end = self.quarter
+        self.assertEqual(
+            self.policy_ids(f"floater_type=family&max_age_gte=61&renewal_from={start}&renewal_to={end}"),
+            [self.family.id],
+        )
+        self.assertEqual(self.policy_ids("members=2"), [self.couple.id, self.late.id])
+        self.assertEqual(self.policy_ids("members_gte=2&max_age_lte=64"), [self.family.id, self.couple.id])
+        self.assertEqual(self.policy_ids("age_band=0-17"), [self.family.id])
+        self.assertEqual(self.policy_ids("age_band=58-66"), [self.family.id, self.late.id])
+        self.assertEqual(len(self.policy_ids("")), 4)
+
+        for query in ("members=-1", "max_age_gte=old", "age_band=60", "age_band=80-60", "renewal_from=soon"):
+            res = self.api.get(f"/api/health-insurance/?{query}")
+            self.assertEqual(res.status_code, 400, query)
+            self.assertIn("error", res.json())
+
+    def test_backfill_migration_and_bulk_loaders(self):
+        seed_book(30, seed=3)
+        expected = sorted(HealthMember.objects.values_list("policy_id", "position", "age"))
+        summary = sorted(HealthInsurance.objects.values_list("id", "member_count", "max_age"))
+        self.assertEqual(len(expected), sum(count for _, count, _ in summary))
+
+        HealthMember.objects.all().delete()
+        HealthInsurance.objects.update(member_count=0, max_age=None)
+        migration = importlib.import_module("core.migrations.0029_backfill_health_members")
+        with mock.patch.object(migration, "CHUNK_SIZE", 3):
+            migration.backfill_members(apps, connection.schema_editor())
+        self.assertEqual(sorted(HealthMember.objects.values_list("policy_id", "position", "age")), expected)
+        self.assertEqual(sorted(HealthInsurance.objects.values_list("id", "member_count", "max_age")), summary)
+
+
+# ----------------------------- EMI INSTALLMENTS -----------------------------
+class EMIInstallmentTests(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = localdate()
+        self.obj = make_client("vehicle", name="Ravi")
+        self.emi = EMIDetails.objects.create(
+            client=self.obj, emi_provider="Bajaj", emi_amount=1000, emi_tenure="3 months",
+            first_due_date=self.today - timedelta(days=40),
+        )
+
+    def schedule(self, emi):
+        return list(emi.installments.order_by("number").values_list("number", "due_date", "amount", "paid"))
+
+    def totals(self, url):
+        res = self.api.get(url)
+        self.assertEqual(res.status_code, 200, res.content)
+        self.assertWithinQueryBudget(res)
+        return {p["provider"]: (p["installments"], p["amount"]) for p in res.json()["providers"]}
+
+    def test_schedule_rules(self):
+        self.assertEqual([tenure_months(t) for t in ("12", "6 months", "1 year", "2 yrs", "", "monthly", "200")],
+                         [12, 6, 12, 24, None, None, None])
+        self.assertEqual(add_months(date(2027, 1, 31), 1), date(2027, 2, 28))
+
+        first = self.emi.first_due_date
+        self.assertEqual(self.schedule(self.emi), [
+            (1, first, Decimal("333.33"), False),
+            (2, add_months(first, 1), Decimal("333.33"), False),
+            (3, add_months(first, 2), Decimal("333.34"), False),
+        ])
+        monthly = EMIDetails.objects.create(client=self.obj, monthly_emi_amount=250, emi_tenure="2")
+        self.assertEqual([row[2] for row in self.schedule(monthly)], [Decimal("250.00")] * 2)
+        self.assertEqual(monthly.installments.first().due_date, add_months(localdate(monthly.created_at), 1))
+        self.assertEqual(self.schedule(EMIDetails.objects.create(client=self.obj, emi_tenure="1 year")), [])
+
+    def test_paid_status_survives_plan_edits(self):
+        first = self.emi.installments.get(number=1)
+        res = self.api.patch(f"/api/emi-installments/{first.id}/", {"paid": True, "amount": "1"}, format="json")
+        self.assertEqual(res.status_code, 200, res.content)
+        self.assertTrue(res.json()["paid"])
+        self.assertIsNotNone(res.json()["paid_at"])
+        self.assertEqual(res.json()["amount"], "333.33")
+
+        res = self.api.patch(f"/api/emi-details/{self.emi.id}/", {"emi_tenure": "4 months"}, format="json")
+        self.assertEqual(res.status_code, 200, res.content)
+        rows = self.schedule(self.emi)
+        self.assertEqual([(n, paid) for n, _, _, paid in rows], [(1, True), (2, False), (3, False), (4, False)])
+        self.assertEqual(rows[1][2], Decimal("250.00"))
+
+        res = self.api.get(f"/api/emi-installments/?emi={self.emi.id}&paid=false")
+        self.assertWithinQueryBudget(res)
+        self.assertEqual([row["number"] for row in res.json()], [2, 3, 4])
+        self.assertEqual(res.json()[0]["emi_provider"], "Bajaj")
+
+    def test_due_overdue_and_collected_by_provider(self):
+        other = make_client("health", name="Asha")
+        EMIDetails.objects.create(
+            client=other, emi_provider="HDFC", monthly_emi_amount=500, emi_tenure="2",
+            first_due_date=self.today,
+        )
+        # Installment 1 of the Bajaj plan was due 40 days ago, 2 about 10 days ago.
+        self.assertEqual(self.totals("/api/emi/overdue/")["Bajaj"], (2, "666.66"))
+        self.assertNotIn("HDFC", self.totals("/api/emi/overdue/"))
+
+        due = self.totals(f"/api/emi/due/?from={self.today}&to={self.today + timedelta(days=60)}")
+        self.assertEqual(due, {"Bajaj": (1, "333.34"), "HDFC": (2, "1000.00")})
+        self.assertEqual(self.totals(f"/api/emi/due/?from={self.today}&to={self.today}")["HDFC"], (1, "500.00"))
+
+        first = self.emi.installments.get(number=1)
+        self.api.patch(f"/api/emi-installments/{first.id}/", {"paid": True}, format="json")
+        self.assertEqual(self.totals("/api/emi/collected/"), {"Bajaj": (1, "333.33")})
+        self.assertEqual(self.totals("/api/emi/overdue/")["Bajaj"], (1, "333.33"))
+
+        self.api.delete(f"/api/clients/{other.id}/")
+        self.assertNotIn("HDFC", self.totals(f"/api/emi/due/?from={self.today}&to={self.today}"))
+        self.assertEqual(self.api.get("/api/emi/due/?from=2027-02-30").status_code, 400)
+        self.assertEqual(self.api.get("/api/emi/collected/?from=2027-02-02&to=2027-02-01").status_code, 400)
+
+    def test_backfill_migration_and_bulk_loaders(self):
+        seed_book(20, seed=5)
+        expected = sorted(EMIInstallment.objects.values_list("emi_id", "number", "due_date", "amount"))
+        self.assertTrue(expected)
+
+        EMIInstallment.objects.all().delete()
+        migration = importlib.import_module("core.migrations.0031_backfill_emi_installments")
+        with mock.patch.object(migration, "CHUNK_SIZE", 4):
+            migration.backfill_installments(apps, connection.schema_editor())
+        self.assertEqual(sorted(EMIInstallment.objects.values_list("emi_id", "number", "due_date", "amount")), expected)
+
+
+
+@override_settings(DATABASE_ROUTERS=[])
+class LegacyEMIMigrationTests(TransactionTestCase):
+    """
+    0032 moves the legacy policy EMI columns into EMIDetails, chunk by
+    chunk and resumably, before 0033 drops them.
+    """
+    before = [("core", "0031_backfill_emi_installments")]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.latest = self.executor.loader.graph.leaf_nodes("core")
+        self.executor.migrate(self.before)
+        self.apps = self.executor.loader.project_state(self.before).apps
+
+    def tearDown(self):
+        self.executor.loader.build_graph()
+        self.executor.migrate(self.latest)
+
+    def test_moves_non_default_values_in_chunks(self):
+        Client = self.apps.get_model("core", "Client")
+        Vehicle = self.apps.get_model("core", "VehicleInsurance")
+        Health = self.apps.get_model("core", "HealthInsurance")
+        clients = [Client.objects.create(name=f"C{i}", mobile="9000000000", insurance_type="vehicle") for i in range(4)]
+        Vehicle.objects.create(client=clients[0], vehicle_type="car", insurance_cover="full",
+                               renewal_date=localdate() + timedelta(days=90),
+                               down_payment=Decimal("1500.50"), emi_tenure="2", monthly_emi_amount=400)
+        Vehicle.objects.create(client=clients[1], vehicle_type="car", insurance_cover="full", policy_tenure="1 year")
+        Vehicle.objects.create(client=clients[2], vehicle_type="car", insurance_cover="full", down_payment=None)
+        Health.objects.create(client=clients[3], floater_type="family", ages="40,38", monthly_emi_amount=None,
+                              emi_tenure="3 months", down_payment=0)
+
+        migration = importlib.import_module("core.migrations.0032_move_legacy_emi_columns")
+        with mock.patch.object(migration, "CHUNK_SIZE", 1):
+            migration.move_legacy_emis(self.apps, connection.schema_editor())
+            # Nothing is left to pick up, so a rerun moves nothing twice.
+            migration.move_legacy_emis(self.apps, connection.schema_editor())
+
+        EMI = self.apps.get_model("core", "EMIDetails")
+        rows = EMI.objects.order_by("client_id").values_list(
+            "client_id", "down_payment", "policy_tenure", "emi_tenure", "monthly_emi_amount",
+        )
+        self.assertEqual(list(rows), [
+            (clients[0].id, Decimal("1500.50"), "", "2", Decimal("400.00")),
+            (clients[1].id, Decimal("0.00"), "1 year", "", Decimal("0.00")),
+            (clients[3].id, Decimal("0.00"), "", "3 months", None),
+        ])
+        installments = self.apps.get_model("core", "EMIInstallment").objects
+        self.assertEqual(sorted(installments.values_list("emi__client_id", "amount")),
+                         [(clients[0].id, Decimal("400.00"))] * 2)
+        self.assertFalse(Vehicle.objects.filter(migration.HAS_LEGACY_VALUES).exists())
+        self.assertFalse(Health.objects.filter(migration.HAS_LEGACY_VALUES).exists())
+
+    def test_schedules_follow_the_policy_term(self):
+        today = localdate()
+        renewal = add_months(today, 3)
+        Client = self.apps.get_model("core", "Client")
+        Vehicle = self.apps.get_model("core", "VehicleInsurance")
+        running = Client.objects.create(name="Running", mobile="9000000000", insurance_type="vehicle")
+        undated = Client.objects.create(name="Undated", mobile="9000000001", insurance_type="vehicle")
+        Vehicle.objects.create(client=running, vehicle_type="car", insurance_cover="full", renewal_date=renewal,
+                               policy_tenure="1 year", emi_tenure="12", monthly_emi_amount=1000)
+        Vehicle.objects.create(client=undated, vehicle_type="car", insurance_cover="full",
+                               emi_tenure="12", monthly_emi_amount=1000)
+
+        self.executor.loader.build_graph()
+        self.executor.migrate(self.latest)
+
+        plan = EMIDetails.objects.get(client_id=running.id)
+        first = add_months(renewal, -11)
+        self.assertEqual(plan.first_due_date, first)
+        dues = [add_months(first, n) for n in range(12)]
+        self.assertEqual(dues[-1], renewal)
+        self.assertEqual(
+            list(plan.installments.order_by("number").values_list("due_date", "paid")),
+            [(day, day < today) for day in dues],
+        )
+        self.assertFalse(EMIDetails.objects.get(client_id=undated.id).installments.exists())
+
+        # Nothing the legacy columns held turns into overdue debt.
+        api = APIClient()
+        self.assertEqual(api.get("/api/emi/overdue/").json()["total"]["installments"], 0)
+        upcoming = sum(day >= today for day in dues)
+        due = api.get(f"/api/emi/due/?from={today}&to={renewal}").json()["total"]
+        self.assertEqual(due, {"installments": upcoming, "amount": f"{1000 * upcoming}.00"})
+
+# ----------------------------- DIGEST -----------------------------
+class DigestTests(CRMTestCase):
+    """
+    The patched snapshot always equals a fresh build of the same day.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.today = today = localdate()
+        self.health = make_client("health", name="Asha", renewal_date=today + timedelta(days=3))
+        self.vehicle = make_client("vehicle", name="Ravi", renewal_date=today + timedelta(days=20))
+        make_client("investment", renewal_date=today + timedelta(days=45))
+        make_client("health", renewal_date=today + timedelta(days=5), renewal_dismissed=True)
+        self.due = Note.objects.create(client=self.health, text="call", follow_up_date=today)
+        self.late = Note.objects.create(client=self.vehicle, text="late", follow_up_date=today - timedelta(days=2))
+        Note.objects.create(client=self.vehicle, text="done", follow_up_date=today, reminder=False)
+
+    def snapshot(self):
+        return DailyDigest.objects.get(day=self.today)
+
+    def assertMatchesRebuild(self):
+        self.assertEqual(self.snapshot().data, digest.build(self.today))
+
+    def ids(self, section):
+        return [item["id"] for item in section["items"]]
+
+    def test_endpoint_builds_once_then_reads_one_row(self):
+        res = self.api.get("/api/digest/")
+        self.assertWithinQueryBudget(res)
+        body = res.json()
+        self.assertEqual(body["day"], self.today.isoformat())
+        self.assertEqual(self.ids(body["notes"]["today"]), [self.due.id])
+        self.assertEqual(self.ids(body["notes"]["overdue"]), [self.late.id])
+        self.assertEqual(body["notes"]["today"]["items"], self.api.get("/api/notes/today/").json())
+        self.assertEqual(body["notes"]["overdue"]["items"], self.api.get("/api/notes/overdue/").json())
+
+        sections = body["renewals"]
+        self.assertEqual((sections["health"]["next_7_days"], sections["health"]["next_30_days"]), (1, 1))
+        self.assertEqual((sections["vehicle"]["next_7_days"], sections["vehicle"]["next_30_days"]), (0, 1))
+        self.assertEqual(sections["investment"]["next_30_days"], 0)
+        self.assertEqual(sections["vehicle"]["items"][0]["client"]["name"], "Ravi")
+
+        with self.assertNumQueries(1):
+            res = self.api.get("/api/digest/")
+        self.assertWithinQueryBudget(res)
+        self.assertEqual(self.api.get("/api/digest/", HTTP_IF_NONE_MATCH=res["ETag"]).status_code, 304)
+
+    def test_note_changes_patch_the_snapshot(self):
+        digest.rebuild(self.today)
+        version = self.snapshot().version
+
+        # Notes outside the digest leave it alone.
+        later = Note.objects.create(client=self.health, text="later", follow_up_date=self.today + timedelta(days=9))
+        later.text = "much later"
+        later.save()
+        self.assertEqual(self.snapshot().version, version)
+
+        self.due.text = "call back"
+        self.due.save()
+        self.assertEqual(self.snapshot().data["notes"]["today"]["items"][0]["text"], "call back")
+
+        self.due.completed = True
+        self.due.save()
+        self.assertEqual(self.snapshot().data["notes"]["today"]["count"], 0)
+        self.assertMatchesRebuild()
+
+        self.late.follow_up_date = self.today
+        self.late.save()
+        self.assertEqual(self.ids(self.snapshot().data["notes"]["today"]), [self.late.id])
+        self.assertMatchesRebuild()
+
+        # Creating a reminder switches the client's others off with .update().
+        res = self.api.post("/api/notes/", {
+            "client": self.vehicle.id, "text": "new", "follow_up_date": str(self.today),
+        }, format="json")
+        self.assertEqual(self.ids(self.snapshot().data["notes"]["today"]), [res.json()["id"]])
+        self.assertMatchesRebuild()
+
+        Note.objects.get(id=res.json()["id"]).delete()
+        self.assertEqual(self.snapshot().data["notes"]["today"]["count"], 0)
+        self.assertGreater(self.snapshot().version, version)
+        self.assertMatchesRebuild()
+
+    def test_renewal_and_client_changes_patch_the_snapshot(self):
+        digest.rebuild(self.today)
+
+        vehicle = VehicleInsurance.objects.get(client=self.vehicle)
+        vehicle.renewal_date = self.today + timedelta(days=6)
+        vehicle.save()
+        self.assertEqual(self.snapshot().data["renewals"]["vehicle"]["next_7_days"], 1)
+        self.assertMatchesRebuild()
+
+        health = HealthInsurance.objects.get(client=self.health)
+        health.ped = "asthma"
+        health.save()
+        self.assertEqual(self.snapshot().data["renewals"]["health"]["items"][0]["ped"], "asthma")
+
+        res = self.api.post("/api/renewals/health/bulk/", {"items": [
+            {"client_id": self.health.id, "action": "dismiss"},
+        ]}, format="json")
+        self.assertEqual(res.json()["updated"], 1)
+        self.assertEqual(self.snapshot().data["renewals"]["health"]["next_30_days"], 0)
+        self.assertMatchesRebuild()
+
+        self.vehicle.name = "Ravi K"
+        self.vehicle.save()
+        data = self.snapshot().data
+        self.assertEqual(data["renewals"]["vehicle"]["items"][0]["client"]["name"], "Ravi K")
+        self.assertEqual(data["notes"]["overdue"]["items"][0]["client_name"], "Ravi K")
+        self.assertMatchesRebuild()
+
+        self.api.delete(f"/api/clients/{self.vehicle.id}/")
+        data = self.snapshot().data
+        self.assertEqual((data["renewals"]["vehicle"]["next_30_days"], data["notes"]["overdue"]["count"]), (0, 0))
+        self.assertMatchesRebuild()
+
+    def test_sections_keep_counts_and_the_first_items(self):
+        for days in range(3, 6):
+            Note.objects.create(client=self.health, text=f"late {days}", follow_up_date=self.today - timedelta(days=days))
+        with mock.patch.object(digest, "LIMIT", 2):
+            digest.rebuild(self.today)
+            overdue = self.snapshot().data["notes"]["overdue"]
+            self.assertEqual(overdue["count"], 4)
+            self.assertEqual([item["text"] for item in overdue["items"]], ["late 5", "late 4"])
+
+            # Completing a kept item moves the next one up.
+            oldest = Note.objects.get(text="late 5")
+            oldest.completed = True
+            oldest.save()
+            overdue = self.snapshot().data["notes"]["overdue"]
+            self.assertEqual((overdue["count"], [item["text"] for item in overdue["items"]]), (3, ["late 4", "late 3"]))
+            self.assertMatchesRebuild()
+
+            make_client("vehicle", renewal_date=self.today + timedelta(days=1))
+            make_client("vehicle", renewal_date=self.today + timedelta(days=2))
+            vehicle = self.snapshot().data["renewals"]["vehicle"]
+            self.assertEqual((vehicle["next_7_days"], vehicle["next_30_days"], len(vehicle["items"])), (2, 3, 2))
+            self.assertMatchesRebuild()
+
+    def test_build_digest_command(self):
+        DailyDigest.objects.create(day=self.today - timedelta(days=40))
+        out = io.StringIO()
+        call_command("build_digest", stdout=out)
+        self.assertIn("1 due today, 1 overdue", out.getvalue())
+        self.assertIn("Pruned 1 old digests", out.getvalue())
+        self.assertMatchesRebuild()
+
+        call_command("build_digest", stdout=io.StringIO())
+        self.assertEqual(self.snapshot().version, 2)
+
+
+# ----------------------------- ASYNC VIEWS -----------------------------
+class AsyncViewTests(CRMTestCase):
+    """
+    The /api/async/ views answer exactly what their sync twins do.
+    """
+
+    def setUp(self):
+        super().setUp()
+        today = date.today()
+        for i, insurance_type in enumerate(("vehicle", "health", "investment", "vehicle")):
+            obj = make_client(insurance_type, name=f"Meera {i}", renewal_date=today - timedelta(days=i))
+            Note.objects.create(client=obj, text=f"call {i}", follow_up_date=today - timedelta(days=i), reminder=True)
+        Client.objects.create(name="Ravi", mobile="9123456789", place="Kollam", insurance_type="vehicle")
+        self.month = today.strftime("%Y-%m")
+
+    def get_async(self, url):
+        async def get():
+            return await self.async_client.get(url)
+
+        return async_to_sync(get)()
+
+    def test_matches_sync_views(self):
+        urls = [
+            f"/renewals/summary/?month={self.month}",
+            "/notes/summary/",
+            "/notes/dashboard/?limit=2",
+            "/clients/search/?q=Meera",
+            "/clients/search/?q=Meeera",
+            "/clients/search/?q=912&insurance_type=vehicle",
+        ]
+        for product in ("health", "vehicle", "investment"):
+            urls += [
+                f"/renewals/{product}/summary/?month={self.month}",
+                f"/renewals/{product}/?month={self.month}&status=missed",
+                f"/renewals/{product}/?month={self.month}",
+            ]
+        for url in urls:
+            cache.clear()
+            expected = self.api.get("/api" + url)
+            cache.clear()
+            res = self.get_async("/api/async" + url)
+            self.assertEqual(res.status_code, 200, url)
+            self.assertEqual(res.json(), expected.json(), url)
+        self.assertEqual(len(self.get_async("/api/async/clients/search/?q=Meera").json()), 4)
+
+    def test_errors_and_metrics(self):
+        self.assertEqual(self.get_async("/api/async/renewals/health/").status_code, 400)
+        self.assertEqual(self.get_async(f"/api/async/renewals/boat/?month={self.month}").status_code, 404)
+        self.assertEqual(self.get_async("/api/async/notes/dashboard/?overdue_cursor=x").status_code, 400)
+        self.assertEqual(self.api.post("/api/async/notes/summary/").status_code, 405)
+
+        res = self.get_async(f"/api/async/renewals/vehicle/?month={self.month}")
+        self.assertEqual(res.query_metrics.endpoint, "async_renewal_list")
+        self.assertEqual(res.query_metrics.queries, 1)
+        self.assertIn("Server-Timing", res)
+
+
+# ----------------------------- READ REPLICA -----------------------------
+class ReplicaRouterTests(CRMTestCase):
+    def route(self, method, path, cookies=None, **headers):
+        request = getattr(RequestFactory(), method)(path, headers=headers)
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = resolve(path)
+        token = replica._request.set(request)
+        try:
+            return replica.ReplicaRouter().db_for_read(Client)
+        finally:
+            replica._request.reset(token)
+
+    def test_routing_decisions(self):
+        self.assertEqual(self.route("get", "/api/clients/"), "replica")
+        self.assertEqual(self.route("get", "/api/async/notes/summary/"), "replica")
+        self.assertIsNone(self.route("post", "/api/clients/"))
+        self.assertIsNone(self.route("get", "/api/clients/", {replica.PIN_COOKIE: str(time.time() + 5)}))
+        self.assertEqual(self.route("get", "/api/clients/", {replica.PIN_COOKIE: str(time.time() - 1)}), "replica")
+        self.assertEqual(self.route("get", "/api/clients/", {replica.PIN_COOKIE: "junk"}), "replica")
+        self.assertIsNone(self.route("get", "/api/clients/", x_primary_pin=str(time.time() + 5)))
+        self.assertEqual(self.route("get", "/api/clients/", x_primary_pin=str(time.time() - 1)), "replica")
+        with replica.primary():
+            self.assertIsNone(self.route("get", "/api/clients/"))
+        self.assertIsNone(replica.ReplicaRouter().db_for_read(Client))
+
+
+@skipUnless("replica" in settings.DATABASES, "set DATABASE_REPLICA_URL to run against a replica")
+@override_settings(DATABASE_ROUTERS=["core.replica.ReplicaRouter"])
+class ReplicaTests(CRMTestCase):
+    """
+    The replica test database is separate and starts empty, so a row
+    written to the primary only shows up when a read was routed there.
+    """
+    # The runner sets up every alias named here, even for skipped classes.
+    databases = {"default", "replica"} & set(settings.DATABASES)
+
+    def setUp(self):
+        super().setUp()
+        make_client("vehicle", name="Primary only", renewal_date=date.today())
+        self.month = date.today().strftime("%Y-%m")
+
+    def test_safe_reads_use_replica_until_session_writes(self):
+        self.assertEqual(self.api.get("/api/clients/").json(), [])
+        self.assertEqual(self.api.get(f"/api/async/renewals/vehicle/?month={self.month}").json(), [])
+        self.assertNotIn(replica.PIN_COOKIE, self.api.cookies)
+
+        res = self.api.post("/api/clients/", {"name": "New", "mobile": "9000000001", "insurance_type": "health"})
+        self.assertEqual(res.status_code, 201)
+        self.assertIn(replica.PIN_COOKIE, res.cookies)
+        names = {c["name"] for c in self.api.get("/api/clients/").json()}
+        self.assertEqual(names, {"Primary only", "New"})
+
+        # Another session is not pinned.
+        self.assertEqual(APIClient().get("/api/clients/").json(), [])
+
+        # A cross-site frontend gets no cookies back; it echoes the header.
+        pin = res[replica.PIN_HEADER]
+        self.assertEqual(len(APIClient().get("/api/clients/", headers={replica.PIN_HEADER: pin}).json()), 2)
+
+    def test_cached_counts_come_from_primary(self):
+        body = self.api.get(f"/api/renewals/vehicle/summary/?month={self.month}").json()
+        self.assertEqual(body["pending"] + body["missed"], 1)
+
+
+# ----------------------------- RENDERING / COMPRESSION -----------------------------
+class RenderingCompressionTests(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(30):
+            obj = make_client("vehicle", name=f"Client ñ {i}", renewal_date=date.today())
+            Quote.objects.create(client=obj, company_name="X", premium_amount="1234.50")
+
+    def test_orjson_matches_drf_renderer(self):
+        for url in ("/api/clients/", "/api/quotes/", f"/api/renewals/vehicle/?month={date.today():%Y-%m}"):
+            res = self.api.get(url)
+            self.assertEqual(res.content, JSONRenderer().render(res.data), url)
+
+        data = {
+            "when": timezone.now(), "day": date(2030, 1, 2), "amount": Decimal("10.50"),
+            "lazy": gettext_lazy("Hello"), "error": ErrorDetail("bad", code="invalid"), "nested": [{"x": None}],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(json.loads(ORJSONRenderer().render(data, "application/json; indent=4")), json.loads(
+            JSONRenderer().render(data)
+        ))
+
+    def test_datetimes_and_non_finite_floats(self):
+        data = {
+            "utc": datetime(2030, 1, 2, 3, 4, 5, 123456, tzinfo=dt_timezone.utc),
+            "ist": datetime(2030, 1, 2, 3, 4, 5, 120000, tzinfo=dt_timezone(timedelta(hours=5, minutes=30))),
+            "naive": datetime(2030, 1, 2, 3, 4, 5, 7), "whole": datetime(2030, 1, 2, tzinfo=dt_timezone.utc),
+            "time": datetime(2030, 1, 2, 1, 2, 3, 456789).time(),
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertIn(b'"utc":"2030-01-02T03:04:05.123456Z"', ORJSONRenderer().render(data))
+
+        res = self.api.get("/api/digest/")
+        self.assertIsInstance(res.data["built_at"], datetime)
+        self.assertEqual(res.content, JSONRenderer().render(res.data))
+
+        self.assertEqual(ORJSONRenderer().render({"x": float("nan")}), b'{"x":null}')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render({"x": float("nan")})
+
+    def test_large_responses_are_compressed(self):
+        plain = self.api.get("/api/clients/", HTTP_ACCEPT_ENCODING="identity")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", plain["Vary"])
+
+        res = self.api.get("/api/clients/", HTTP_ACCEPT_ENCODING="gzip, deflate, br")
+        self.assertEqual(res["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(res.content), plain.content)
+        self.assertEqual(int(res["Content-Length"]), len(res.content))
+
+        res = self.api.get("/api/clients/", HTTP_ACCEPT_ENCODING="gzip, br;q=0")
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+
+        small = self.api.get("/api/notes/summary/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(small.has_header("Content-Encoding"))
+
+
+# ----------------------------- FAST PATH -----------------------------
+class FastPathParityTests(CRMTestCase):
+    """
+    The values() fast path renders byte for byte what the serializers do.
+    """
+
+    def setUp(self):
+        super().setUp()
+        today = date.today()
+        for i in range(12):
+            insurance_type = ("vehicle", "health", "investment")[i % 3]
+            obj = make_client(insurance_type, name=f"Cliënt “{i}”", renewal_date=today + timedelta(days=i))
+            Note.objects.create(
+                client=obj, text=f"call {i}", follow_up_date=today + timedelta(days=i - 3),
+                priority=("HOT", "WARM", "COOL")[i % 3], completed=i % 4 == 0,
+            )
+        VehicleInsurance.objects.filter(renewal_date=today).update(insurance_cover="third_party")
+        HealthInsurance.objects.update(ped="Asthma", renewal_dismissed=True)
+        Client.objects.create(name="No details", mobile="9000000002", insurance_type="vehicle", place="Kochi")
+        self.deleted = make_client("vehicle", name="Deleted")
+        self.api.delete(f"/api/clients/{self.deleted.id}/")
+
+    def render(self, data):
+        return ORJSONRenderer().render(data)
+
+    def assertParity(self, url, serializer_data):
+        res = self.api.get(url)
+        self.assertEqual(res.status_code, 200, url)
+        self.assertEqual(res.content, self.render(serializer_data), url)
+
+    def test_client_list(self):
+        self.assertIsNotNone(fastpath.plan_for(ClientSerializer()))
+        clients = Client.objects.order_by("-created_at", "-id")
+        self.assertParity("/api/clients/", ClientSerializer(clients, many=True).data)
+        self.assertParity(
+            "/api/clients/?insurance_type=vehicle",
+            ClientSerializer(clients.filter(insurance_type="vehicle"), many=True).data,
+        )
+        self.assertNotIn(self.deleted.id, [c["id"] for c in self.api.get("/api/clients/").json()])
+
+    def test_client_list_pages_and_fields(self):
+        clients = list(Client.objects.order_by("-created_at", "-id"))
+        body = self.api.get("/api/clients/?page_size=5").json()
+        seen = body["results"]
+        while body["next"]:
+            body = self.api.get(body["next"]).json()
+            seen += body["results"]
+        self.assertEqual(self.render(seen), self.render(ClientSerializer(clients, many=True).data))
+
+        selection = fieldsets.parse(ClientSerializer(), "name,created_at,health_details.ped", None)
+        self.assertParity(
+            "/api/clients/?fields=name,created_at,health_details.ped",
+            ClientSerializer(clients, many=True, selection=selection).data,
+        )
+
+    def test_note_lists(self):
+        notes = Note.objects.filter(client__deleted_at__isnull=True).order_by("follow_up_date")
+        self.assertParity("/api/notes/", NoteSerializer(notes, many=True).data)
+        today = date.today()
+        upcoming = notes.filter(
+            follow_up_date__gt=today, follow_up_date__lte=today + timedelta(days=180), reminder=True, completed=False,
+        )
+        self.assertParity("/api/notes/upcoming/", NoteSerializer(upcoming, many=True).data)
+
+    def test_renewal_lists(self):
+        month = date.today().strftime("%Y-%m")
+        for product_key, product in renewals.PRODUCTS.items():
+            for status_key in ("pending", "missed", "dismissed"):
+                expected = []
+                for row in renewals.renewal_queryset(product_key, month, status_key):
+                    item = {"id": row.id, "renewal_date": row.renewal_date}
+                    item.update({f: getattr(row, f) for f in product.list_fields})
+                    item["client"] = {f: getattr(row.client, f) for f in renewals.CLIENT_FIELDS}
+                    expected.append(item)
+                self.assertParity(f"/api/renewals/{product_key}/?month={month}&status={status_key}", expected)
@@ -0,0 +1,184 @@
+"""
+Document storage helpers.
+
+Two-phase document uploads that bypass the Django workers:
+
+1. presign: create a 'pending' Document with a fresh storage key and hand
+   the browser a presigned PUT URL for that key.
+2. confirm: once the browser has uploaded, check the stored object's size
+   and type, then mark the Document 'active' (or delete both if invalid).
+
+On S3-compatible storage (the production Supabase bucket) the URL is a
+real presigned S3 PUT. Storages that cannot presign, such as
+FileSystemStorage in development and tests, get a signed URL to the
+document_local_upload view instead, which streams the body to storage.
+
+delete_files() removes objects in bulk for the client purge worker.
+"""
+import os
+import uuid
+
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+
+MAX_UPLOAD_BYTES = 15 * 1024 * 1024
+URL_EXPIRY_SECONDS = 15 * 60
+
+# Detected from the first bytes of the object, not from the client's claim.
+MAGIC_TYPES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"%PDF-", "application/pdf"),
+)
+ALLOWED_CONTENT_TYPES = {ct for _, ct in MAGIC_TYPES} | {"image/webp"}
+SNIFF_BYTES = 16
+
+LOCAL_UPLOAD_SALT = "core.uploads.local"
+
+
+class UploadRejected(Exception):
+    pass
+
+
+def can_presign(storage=default_storage):
+    return hasattr(storage, "bucket") and hasattr(storage, "_normalize_name")
+
+
+def new_key(filename):
+    base, ext = os.path.splitext(os.path.basename(filename or ""))
+    ext = ext.lower()[:10]
+    return f"documents/{uuid.uuid4().hex}{ext}"
+
+
+def _s3_client_and_key(storage, name):
+    from storages.utils import clean_name
+
+    return storage.bucket.meta.client, storage._normalize_name(clean_name(name))
+
+
+def presigned_put_url(document, content_type, storage=default_storage):
+    client, key = _s3_client_and_key(storage, document.file.name)
+    return client.generate_presigned_url(
+        "put_object",
+        Params={"Bucket": storage.bucket_name, "Key": key, "ContentType": content_type},
+        ExpiresIn=URL_EXPIRY_SECONDS,
+    )
+
+
+def local_upload_token(document):
+    return signing.TimestampSigner(salt=LOCAL_UPLOAD_SALT).sign(str(document.pk))
+
+
+def check_local_upload_token(document, token):
+    try:
+        value = signing.TimestampSigner(salt=LOCAL_UPLOAD_SALT).unsign(
+            token or "", max_age=URL_EXPIRY_SECONDS
+        )
+    except signing.BadSignature:
+        return False
+    return value == str(document.pk)
+
+
+def sniff_content_type(head):
+    for magic, content_type in MAGIC_TYPES:
+        if head.startswith(magic):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return ""
+
+
+def inspect_object(name, storage=default_storage):
+    """
+    (size, content_type) of a stored object, reading at most a few bytes.
+    Raises UploadRejected if the object does not exist.
+    """
+    if can_presign(storage):
+        client, key = _s3_client_and_key(storage, name)
+        try:
+            size = client.head_object(Bucket=storage.bucket_name, Key=key)["ContentLength"]
+        except client.exceptions.ClientError:
+            raise UploadRejected("file was not uploaded")
+        head = b""
+        if size:
+            head = client.get_object(
+                Bucket=storage.bucket_name, Key=key, Range=f"bytes=0-{SNIFF_BYTES - 1}"
+            )["Body"].read()
+        return size, sniff_content_type(head)
+
+    if not storage.exists(name):
+        raise UploadRejected("file was not uploaded")
+    with storage.open(name, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+    return storage.size(name), sniff_content_type(head)
+
+
+def validate_object(name, storage=default_storage):
+    size, content_type = inspect_object(name, storage)
+    if not size:
+        raise UploadRejected("file is empty")
+    if size > MAX_UPLOAD_BYTES:
+        raise UploadRejected(f"file is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+    if content_type not in ALLOWED_CONTENT_TYPES:
+        raise UploadRejected("only JPEG, PNG, WebP and PDF files are allowed")
+    return size, content_type
+
+
+def save_local_upload(document, stream, storage=default_storage):
+    """
+    Development stand-in for the S3 PUT: stream the request body to the
+    document's pre-assigned key, stopping at MAX_UPLOAD_BYTES.
+    """
+    name = document.file.name
+    if storage.exists(name):
+        storage.delete(name)
+    saved = storage.save(name, File(_LimitedReader(stream, MAX_UPLOAD_BYTES + 1), name=name))
+    if saved != name:
+        document.file.name = saved
+        document.save(update_fields=["file"])
+
+
+class _LimitedReader:
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.remaining = limit
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.stream.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+DELETE_BATCH = 1000  # S3 DeleteObjects accepts at most 1000 keys per call
+
+
+def delete_files(names, storage=default_storage):
+    """
+    Remove stored objects, using S3 multi-object deletes where possible.
+    Missing objects are ignored. Returns the number of names processed.
+    """
+    names = [n for n in names if n]
+    if not names:
+        return 0
+    if not can_presign(storage):
+        for name in names:
+            storage.delete(name)
+        return len(names)
+
+    for start in range(0, len(names), DELETE_BATCH):
+        batch = names[start:start + DELETE_BATCH]
+        client, _ = _s3_client_and_key(storage, batch[0])
+        objects = [{"Key": _s3_client_and_key(storage, n)[1]} for n in batch]
+        response = client.delete_objects(
+            Bucket=storage.bucket_name, Delete={"Objects": objects, "Quiet": True}
+        )
+        if response.get("Errors"):
+            first = response["Errors"][0]
+            raise OSError(f"could not delete {first.get('Key')}: {first.get('Message')}")
+    return len(names)
@@ -1,15 +1,20 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     ClientViewSet,
     VehicleInsuranceViewSet,
     HealthInsuranceViewSet,
     InvestmentDetailsViewSet,           
+    ClientPurgeViewSet,
     QuoteViewSet,
     EMIDetailsViewSet,
+    EMIInstallmentViewSet,
     NoteViewSet,
     DocumentViewSet,
     delete_document,
+    document_local_upload,
+    export_clients,
     convert_client,
     convert_investment_client,          
     health_renewal_summary,
@@ -23,6 +28,14 @@ from .views import (
     investment_renewal_list,            
     investment_renew,                   
     investment_set_renewal_date,      
+    renewal_summary_all,
+    renewal_calendar,
+    renewal_bulk,
+    analytics_summary,
+    daily_digest,
+    emi_due,
+    emi_overdue,
+    emi_collected,
     debug_db
 )
 
@@ -33,15 +46,29 @@ router.register('health-insurance', HealthInsuranceViewSet)
 router.register('investment-details', InvestmentDetailsViewSet)  
 router.register('quotes', QuoteViewSet)
 router.register('emi-details', EMIDetailsViewSet)
+router.register('emi-installments', EMIInstallmentViewSet)
 router.register('notes', NoteViewSet)
 router.register('documents', DocumentViewSet)
+router.register('purges', ClientPurgeViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
     path('documents/<int:pk>/delete/', delete_document),
+    path('documents/<int:pk>/upload/', document_local_upload),
+    path("export/clients/", export_clients),
     path("convert-client/<int:client_id>/", convert_client),
     path("convert-investment-client/<int:client_id>/", convert_investment_client),  
 
+    path("analytics/", analytics_summary),
+    path("digest/", daily_digest),
+    path("emi/due/", emi_due),
+    path("emi/overdue/", emi_overdue),
+    path("emi/collected/", emi_collected),
+
+    path("renewals/summary/", renewal_summary_all),
+    path("renewals/calendar/", renewal_calendar),
+    path("renewals/<str:product>/bulk/", renewal_bulk),
+
     path("renewals/health/summary/", health_renewal_summary),
     path("renewals/health/", health_renewal_list),
     path("renewals/health/<int:client_id>/renew/", health_renew),
@@ -57,6 +84,14 @@ urlpatterns = [
     path("renewals/investment/<int:client_id>/renew/", investment_renew),
     path("renewals/investment/<int:client_id>/set/", investment_set_renewal_date),
 
+    # Async twins of the read-heavy endpoints, for ASGI (core/async_views.py).
+    path("async/renewals/summary/", async_views.async_renewal_summary_all),
+    path("async/renewals/<str:product>/summary/", async_views.async_renewal_summary),
+    path("async/renewals/<str:product>/", async_views.async_renewal_list),
+    path("async/notes/summary/", async_views.async_note_summary),
+    path("async/notes/dashboard/", async_views.async_note_dashboard),
+    path("async/clients/search/", async_views.async_client_search),
+
     path("clients/<int:client_id>/full-delete/", delete_client_full),
     path("debug-db/", debug_db),
 ]
\ No newline at end of file
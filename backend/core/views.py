@@ -1,14 +1,21 @@
 from rest_framework import viewsets
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
-from django.utils.timezone import now
-from datetime import timedelta, date
-from django.http import JsonResponse
+from django.utils.timezone import localdate, now
+from datetime import timedelta
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
 from django.utils.dateparse import parse_date
-from django.db.models import Prefetch
+from django.utils.http import parse_etags
+from django.db import transaction
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 import os
+import tempfile
+import time
 
 from .models import (
     Client,
@@ -16,31 +23,63 @@ from .models import (
     HealthInsurance,
     Quote,
     EMIDetails,
+    EMIInstallment,
     Note,
     Document,
     LeadConversion,
     InvestmentDetails, 
     InvestmentConversion,
+    ClientPurge,
 )
+from . import analytics, cache, digest, exporter, fastpath, fieldsets, importer, installments, members, purge, reminders, renewals, search, uploads
+from .pagination import ClientCursorPagination
+from .renewals import month_range
 from .serializers import (
     ClientSerializer,
     VehicleInsuranceSerializer,
     HealthInsuranceSerializer,
     QuoteSerializer,
     EMIDetailsSerializer,
+    EMIInstallmentSerializer,
     NoteSerializer,
     DocumentSerializer,
     ClientDetailSerializer,
     LeadConversionSerializer,
     InvestmentConversionSerializer,
     InvestmentDetailsSerializer,
+    ClientPurgeSerializer,
 )
 
 
 # ----------------------------- CLIENT -----------------------------
-class ClientViewSet(viewsets.ModelViewSet):
-    queryset = Client.objects.all().order_by('-created_at')
+def signing_period():
+    """
+    Index of the current AWS_QUERYSTRING_EXPIRE-long period. A URL signed
+    during a period stays valid until at least the end of it.
+    """
+    return int(time.time() // settings.AWS_QUERYSTRING_EXPIRE)
+
+
+class ClientViewSet(fastpath.FastListMixin, viewsets.ModelViewSet):
+    queryset = Client.objects.all().order_by('-created_at', '-id')
     serializer_class = ClientSerializer
+    pagination_class = ClientCursorPagination
+
+    # One-to-one details are joined into the client query; child rows are
+    # prefetched, one query each. Either way the cost does not grow with
+    # the row count. ?fields= / ?expand= drop the ones not asked for.
+    DETAIL_RELATIONS = ('vehicle_details', 'health_details', 'investment_details')
+
+    @staticmethod
+    def child_prefetches():
+        return {
+            'quotes': Quote.objects.all(),
+            'emi_details': EMIDetails.objects.all(),
+            'notes': Note.objects.select_related('client').order_by('-follow_up_date'),
+            'documents': Document.objects.filter(status='active'),
+            'conversions': LeadConversion.objects.all(),
+            'investment_conversions': InvestmentConversion.objects.all(),
+        }
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -48,16 +87,11 @@ class ClientViewSet(viewsets.ModelViewSet):
         if insurance_type:
             qs = qs.filter(insurance_type=insurance_type)
 
-        if self.action == 'retrieve':
-            qs = qs.select_related(
-                'vehicle_details', 'health_details', 'investment_details'
-            ).prefetch_related(
-                'quotes',
-                'emi_details',
-                Prefetch('notes', queryset=Note.objects.select_related('client').order_by('-follow_up_date')),
-                'documents',
-                'conversions',
-                'investment_conversions',
+        if self.action in ('list', 'retrieve'):
+            prefetch = self.child_prefetches() if self.action == 'retrieve' else None
+            qs = fieldsets.apply(
+                qs, self.get_serializer(), self.get_selection(),
+                join=self.DETAIL_RELATIONS, prefetch=prefetch,
             )
         return qs
 
@@ -66,6 +100,119 @@ class ClientViewSet(viewsets.ModelViewSet):
             return ClientDetailSerializer
         return ClientSerializer
 
+    def get_selection(self):
+        """
+        The ?fields= / ?expand= selection for list and retrieve, or None.
+        """
+        if self.action not in ('list', 'retrieve'):
+            return None
+        if not hasattr(self, '_selection'):
+            params = self.request.query_params
+            self._selection = fieldsets.parse(
+                self.get_serializer_class()(), params.get('fields'), params.get('expand')
+            )
+        return self._selection
+
+    def get_serializer(self, *args, **kwargs):
+        selection = self.get_selection()
+        if selection is not None:
+            kwargs['selection'] = selection
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.fast_list(queryset) or super().list(request, *args, **kwargs)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, fieldsets.FieldSelectionError):
+            return Response({"error": str(exc)}, status=400)
+        return super().handle_exception(exc)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Supports If-None-Match: the ETag is the client's version stamp plus
+        the current URL signing period, so an unchanged client answers 304
+        after a single indexed lookup, without loading child rows or signing
+        document URLs. A body from an earlier period, whose document links
+        may have expired, gets a fresh 200 instead.
+        """
+        pk = kwargs.get(self.lookup_field)
+        version = None
+        if str(pk).isdigit():
+            version = Client.objects.filter(pk=pk).values_list('version', flat=True).first()
+        if version is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = f'"{pk}-{version}-{signing_period()}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        # Compressed responses carry the weak form (W/"...") of the ETag.
+        if etag in {e.removeprefix('W/') for e in parse_etags(request.headers.get('If-None-Match', ''))}:
+            return Response(status=304, headers=headers)
+
+        response = super().retrieve(request, *args, **kwargs)
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        GET /api/clients/search/?q=<name|place|mobile>&insurance_type=&limit=
+        Returns the best matches first, at most `limit` (default 20, max 50).
+        """
+        try:
+            limit = int(request.query_params.get("limit", search.DEFAULT_LIMIT))
+        except ValueError:
+            limit = search.DEFAULT_LIMIT
+        limit = max(1, min(limit, search.MAX_LIMIT))
+
+        clients = search.search_clients(
+            request.query_params.get("q"),
+            insurance_type=request.query_params.get("insurance_type"),
+            limit=limit,
+        )
+        return Response(ClientSerializer(clients, many=True).data)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_file(self, request):
+        """
+        POST /api/clients/import/  (multipart: file=<.csv|.xlsx>, insurance_type=optional)
+        Imports every valid row; failed rows are saved to an error report.
+        """
+        upload = request.FILES.get("file")
+        if not upload:
+            return Response({"error": "file is required"}, status=400)
+
+        with tempfile.TemporaryFile("w+", newline="") as report:
+            try:
+                result = importer.import_rows(
+                    importer.iter_rows(upload, upload.name),
+                    report,
+                    default_insurance_type=request.data.get("insurance_type") or None,
+                )
+            except importer.ImportFormatError as exc:
+                return Response({"error": str(exc)}, status=400)
+
+            data = result.as_dict()
+            data["error_report"] = None
+            if result.failed:
+                report.seek(0)
+                stamp = now().strftime("%Y%m%d-%H%M%S")
+                name = default_storage.save(
+                    f"imports/errors-{stamp}.csv", ContentFile(report.read().encode())
+                )
+                data["error_report"] = default_storage.url(name)
+
+        return Response(data, status=201 if result.created else 200)
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Soft delete: the client disappears at once and a background job
+        (manage.py purge_clients) removes its rows and files.
+        """
+        job = purge.soft_delete_client(self.get_object())
+        return Response(ClientPurgeSerializer(job).data, status=202)
+
     @action(detail=True, methods=['get'])
     def history(self, request, pk=None):
         client = self.get_object()
@@ -76,14 +223,32 @@ class ClientViewSet(viewsets.ModelViewSet):
 
 # ----------------------------- VEHICLE & HEALTH -----------------------------
 class VehicleInsuranceViewSet(viewsets.ModelViewSet):
-    queryset = VehicleInsurance.objects.all()
+    queryset = VehicleInsurance.objects.filter(client__deleted_at__isnull=True)
     serializer_class = VehicleInsuranceSerializer
 
 
-class HealthInsuranceViewSet(viewsets.ModelViewSet):
-    queryset = HealthInsurance.objects.all()
+class HealthInsuranceViewSet(fastpath.FastListMixin, viewsets.ModelViewSet):
+    queryset = HealthInsurance.objects.filter(client__deleted_at__isnull=True)
     serializer_class = HealthInsuranceSerializer
 
+    def filter_queryset(self, queryset):
+        """
+        The list takes age filters (core.members), e.g.
+        ?max_age_gte=60&floater_type=family&renewal_from=...&renewal_to=...
+        """
+        queryset = super().filter_queryset(queryset)
+        if self.action == "list":
+            queryset = members.filter_policies(queryset, self.request.query_params)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        return self.fast_list(self.filter_queryset(self.get_queryset())) or super().list(request, *args, **kwargs)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, members.AgeFilterError):
+            return Response({"error": str(exc)}, status=400)
+        return super().handle_exception(exc)
+
     def _set_floater_from_ages(self, serializer):
         ages = serializer.validated_data.get("ages")
 
@@ -91,10 +256,7 @@ class HealthInsuranceViewSet(viewsets.ModelViewSet):
         if ages is None and serializer.instance:
             ages = serializer.instance.ages or ""
 
-        ages_list = [a.strip() for a in str(ages or "").split(",") if a.strip()]
-        count = len(ages_list) if len(ages_list) > 0 else 1
-
-        serializer.validated_data["floater_type"] = "individual" if count == 1 else "family"
+        serializer.validated_data["floater_type"] = HealthInsurance.floater_type_for(ages)
 
     def perform_create(self, serializer):
         self._set_floater_from_ages(serializer)
@@ -107,32 +269,43 @@ class HealthInsuranceViewSet(viewsets.ModelViewSet):
 
 # ----------------------------- QUOTES -----------------------------
 class QuoteViewSet(viewsets.ModelViewSet):
-    queryset = Quote.objects.all()
+    queryset = Quote.objects.filter(client__deleted_at__isnull=True)
     serializer_class = QuoteSerializer
 
 
 # ----------------------------- NOTES -----------------------------
-class NoteViewSet(viewsets.ModelViewSet):
-    queryset = Note.objects.all().order_by('follow_up_date')
+class NoteViewSet(fastpath.FastListMixin, viewsets.ModelViewSet):
+    queryset = Note.objects.filter(client__deleted_at__isnull=True).select_related('client').order_by('follow_up_date')
     serializer_class = NoteSerializer
 
+    def list(self, request, *args, **kwargs):
+        return self.fast_list(self.filter_queryset(self.get_queryset())) or super().list(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         note = serializer.save()
         # If this new note has its reminder on, switch off reminder
         # on every other note for the same client.
         if note.reminder:
-            Note.objects.filter(
+            switched_off = Note.objects.filter(
                 client=note.client, reminder=True
             ).exclude(id=note.id).update(reminder=False)
+            cache.invalidate_note_summary(now().date())
+            if switched_off:
+                digest.refresh_notes()
+            Client.touch([note.client_id])
 
     def perform_update(self, serializer):
         note = serializer.save()
         # Same rule applies if an existing note is edited to turn its
         # reminder on — it should still be the only active one.
         if note.reminder:
-            Note.objects.filter(
+            switched_off = Note.objects.filter(
                 client=note.client, reminder=True
             ).exclude(id=note.id).update(reminder=False)
+            cache.invalidate_note_summary(now().date())
+            if switched_off:
+                digest.refresh_notes()
+            Client.touch([note.client_id])
 
     @action(detail=False, methods=['get'])
     def today(self, request):
@@ -156,7 +329,38 @@ class NoteViewSet(viewsets.ModelViewSet):
             reminder=True,
             completed=False
         )
-        return Response(self.get_serializer(notes, many=True).data)
+        return self.fast_list(notes) or Response(self.get_serializer(notes, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def dashboard(self, request):
+        """
+        GET /api/notes/dashboard/?limit=50&today_cursor=&overdue_cursor=&upcoming_cursor=
+        Today, overdue and upcoming follow-ups with counts, in one query.
+        Pass a bucket's next_cursor back as <bucket>_cursor to page it.
+        """
+        try:
+            limit = int(request.query_params.get("limit", reminders.DEFAULT_LIMIT))
+        except ValueError:
+            limit = reminders.DEFAULT_LIMIT
+        limit = max(1, min(limit, reminders.MAX_LIMIT))
+
+        cursors = {
+            key: request.query_params[f"{key}_cursor"]
+            for key in reminders.BUCKETS
+            if request.query_params.get(f"{key}_cursor")
+        }
+        try:
+            buckets = reminders.dashboard(now().date(), limit=limit, cursors=cursors)
+        except reminders.InvalidCursor as exc:
+            return Response({"error": str(exc)}, status=400)
+
+        data = {"counts": {key: b["count"] for key, b in buckets.items()}}
+        for key, bucket in buckets.items():
+            data[key] = {
+                "results": self.get_serializer(bucket["results"], many=True).data,
+                "next_cursor": bucket["next_cursor"],
+            }
+        return Response(data)
 
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
@@ -167,39 +371,132 @@ class NoteViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def summary(self, request):
-        today = now().date()
-        return Response({
-            "today": self.queryset.filter(follow_up_date=today, reminder=True).count(),
-            "overdue": self.queryset.filter(follow_up_date__lt=today, reminder=True).count(),
-            "upcoming": self.queryset.filter(
-                follow_up_date__gt=today,
-                follow_up_date__lte=today + timedelta(days=7),
-                reminder=True
-            ).count()
-        })
+        return Response(reminders.note_summary(now().date()))
 
 
 # ----------------------------- DOCUMENTS -----------------------------
 
 class DocumentViewSet(viewsets.ModelViewSet):
-    queryset = Document.objects.all().order_by("-uploaded_at")  # ✅ add this back
+    queryset = Document.objects.filter(client__deleted_at__isnull=True).order_by("-uploaded_at")
     serializer_class = DocumentSerializer
 
     def get_queryset(self):
         qs = super().get_queryset()
+        if self.action != 'confirm':
+            qs = qs.filter(status='active')
         client_id = self.request.query_params.get("client")
         if client_id:
             qs = qs.filter(client_id=client_id)
         return qs
 
+    @action(detail=False, methods=['post'])
+    def presign(self, request):
+        """
+        POST /api/documents/presign/
+        Body: { "client": 1, "document_type": "rc", "filename": "rc.jpg", "content_type": "image/jpeg" }
+        Creates a pending document and returns a URL to PUT the file to.
+        """
+        content_type = request.data.get("content_type") or ""
+        if content_type not in uploads.ALLOWED_CONTENT_TYPES:
+            return Response({"error": "content_type must be JPEG, PNG, WebP or PDF"}, status=400)
+
+        serializer = self.get_serializer(data={
+            "client": request.data.get("client"),
+            "document_type": request.data.get("document_type"),
+        }, partial=True)
+        serializer.is_valid(raise_exception=True)
+        missing = [f for f in ("client", "document_type") if f not in serializer.validated_data]
+        if missing:
+            return Response({f: ["This field is required."] for f in missing}, status=400)
+        document = Document.objects.create(
+            **serializer.validated_data,
+            file=uploads.new_key(request.data.get("filename")),
+            status='pending',
+            content_type=content_type,
+        )
 
+        if uploads.can_presign():
+            upload_url = uploads.presigned_put_url(document, content_type)
+        else:
+            token = uploads.local_upload_token(document)
+            upload_url = request.build_absolute_uri(f"/api/documents/{document.pk}/upload/?token={token}")
+
+        return Response({
+            "id": document.pk,
+            "upload_url": upload_url,
+            "method": "PUT",
+            "headers": {"Content-Type": content_type},
+            "expires_in": uploads.URL_EXPIRY_SECONDS,
+            "max_bytes": uploads.MAX_UPLOAD_BYTES,
+        }, status=201)
+
+    @action(detail=True, methods=['post'])
+    def confirm(self, request, pk=None):
+        """
+        POST /api/documents/<id>/confirm/
+        Checks the uploaded object and activates the document. An invalid
+        upload is deleted together with its pending row.
+        """
+        document = self.get_object()
+        if document.status == 'active':
+            return Response(self.get_serializer(document).data)
+
+        try:
+            size, content_type = uploads.validate_object(document.file.name)
+        except uploads.UploadRejected as exc:
+            document.file.delete(save=False)
+            document.delete()
+            return Response({"error": str(exc)}, status=400)
+
+        document.size = size
+        document.content_type = content_type
+        document.status = 'active'
+        document.save(update_fields=['size', 'content_type', 'status'])
+        return Response(self.get_serializer(document).data)
+
+
+
+@require_GET
+def export_clients(request):
+    """
+    GET /api/export/clients/?format=ndjson|csv&insurance_type=
+    Streams the whole client book; memory use does not grow with its size.
+    """
+    file_format = request.GET.get("format", "ndjson")
+    if file_format not in exporter.FORMATS:
+        return JsonResponse({"error": "format must be ndjson or csv"}, status=400)
+
+    response = StreamingHttpResponse(
+        exporter.iter_export(file_format, insurance_type=request.GET.get("insurance_type")),
+        content_type=exporter.CONTENT_TYPES[file_format],
+    )
+    stamp = now().strftime("%Y%m%d")
+    response["Content-Disposition"] = f'attachment; filename="clients-{stamp}.{file_format}"'
+    return response
+
+
+@csrf_exempt
+def document_local_upload(request, pk):
+    """
+    PUT /api/documents/<id>/upload/?token=...
+    Local stand-in for the presigned S3 PUT when storage cannot presign.
+    """
+    if request.method != 'PUT' or uploads.can_presign():
+        return JsonResponse({'error': 'Not found'}, status=404)
+
+    document = get_object_or_404(Document, pk=pk, status='pending')
+    if not uploads.check_local_upload_token(document, request.GET.get('token')):
+        return JsonResponse({'error': 'Invalid or expired upload token'}, status=403)
+
+    uploads.save_local_upload(document, request)
+    return JsonResponse({'success': True})
 
 
 @csrf_exempt
 def delete_document(request, pk):
     if request.method == 'DELETE':
         doc = get_object_or_404(Document, pk=pk)
-        doc.file.delete(save=False)
+        uploads.delete_files(doc.stored_names())
         doc.delete()
         return JsonResponse({'success': True})
 
@@ -218,110 +515,183 @@ def convert_client(request, client_id):
     serializer = LeadConversionSerializer(data=data)
 
     if serializer.is_valid():
-        serializer.save()
-        client.is_converted = True
-        client.save()
+        with transaction.atomic():
+            conversion = serializer.save()
+            analytics.record_conversion(conversion)
+            client.is_converted = True
+            client.save()
         return Response(serializer.data)
 
     return Response(serializer.errors, status=400)
 
 
-# ----------------------------- HEALTH RENEWAL HELPERS -----------------------------
-def month_range(yyyy_mm: str):
+# ----------------------------- ANALYTICS -----------------------------
+def _date_param(value):
     """
-    Convert 'YYYY-MM' into a tuple (start_date, end_date)
-    where start_date is the first day of the month,
-    and end_date is the first day of the next month.
+    The date in a YYYY-MM-DD parameter, or None if missing or invalid.
     """
-    y, m = yyyy_mm.split("-")
-    y = int(y)
-    m = int(m)
-
-    start = date(y, m, 1)
-    if m == 12:
-        end = date(y + 1, 1, 1)
-    else:
-        end = date(y, m + 1, 1)
-    return start, end
+    try:
+        return parse_date(value or "")
+    except ValueError:
+        return None
 
 
-# ----------------------------- HEALTH RENEWAL APIS -----------------------------
 @api_view(["GET"])
-def health_renewal_summary(request):
+def analytics_summary(request):
     """
-    GET /api/renewals/health/summary/?month=YYYY-MM
-    Returns counts for pending/missed/dismissed renewals in that month.
+    GET /api/analytics/?group=month,insurance_type&from=YYYY-MM-DD&to=YYYY-MM-DD&insurance_type=
+    Conversion counts and premium/investment totals, read from the daily rollups.
+    group is any of day, month, insurance_type, company, posp_code.
     """
-    month = request.query_params.get("month")
-    if not month:
-        return Response({"error": "month is required (YYYY-MM)"}, status=400)
+    raw_group = request.query_params.get("group")
+    group = [g for g in raw_group.split(",") if g] if raw_group else list(analytics.DEFAULT_GROUP)
+    unknown = [g for g in group if g not in analytics.GROUPS]
+    if unknown or len(set(group)) != len(group):
+        return Response({"error": f"group must be a list of {', '.join(analytics.GROUPS)}"}, status=400)
 
-    start, end = month_range(month)
-    today = date.today()
+    dates = {}
+    for param in ("from", "to"):
+        value = request.query_params.get(param)
+        dates[param] = _date_param(value)
+        if value and dates[param] is None:
+            return Response({"error": f"{param} must be YYYY-MM-DD"}, status=400)
 
-    qs = HealthInsurance.objects.select_related("client").filter(
-        renewal_date__gte=start,
-        renewal_date__lt=end
-    )
+    return Response(analytics.summary(
+        group, dates["from"], dates["to"], request.query_params.get("insurance_type") or None,
+    ))
 
-    dismissed = qs.filter(renewal_dismissed=True).count()
-    pending = qs.filter(renewal_dismissed=False, renewal_date__gte=today).count()
-    missed = qs.filter(renewal_dismissed=False, renewal_date__lt=today).count()
 
+# ----------------------------- DIGEST -----------------------------
+@api_view(["GET"])
+def daily_digest(request):
+    """
+    GET /api/digest/
+    Today's follow-ups (due today, overdue) and each product's pending
+    renewals in the next 7 and 30 days, read from the precomputed
+    DailyDigest row: counts, and the first digest.LIMIT items of each
+    section. Supports If-None-Match on the digest version.
+    """
+    snapshot = digest.current()
+    etag = f'"digest-{snapshot.day}-{snapshot.version}"'
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag in {e.removeprefix('W/') for e in parse_etags(request.headers.get('If-None-Match', ''))}:
+        return Response(status=304, headers=headers)
     return Response({
-        "month": month,
-        "pending": pending,
-        "missed": missed,
-        "dismissed": dismissed,
-    })
+        "day": snapshot.day,
+        "built_at": snapshot.built_at,
+        "updated_at": snapshot.updated_at,
+        **snapshot.data,
+    }, headers=headers)
 
 
-@api_view(["GET"])
-def health_renewal_list(request):
+# ----------------------------- RENEWAL HELPERS -----------------------------
+MONTH_REQUIRED = {"error": "month is required (YYYY-MM)"}
+CALENDAR_MAX_MONTHS = 36
+
+
+def _month_param(request):
     """
-    GET /api/renewals/health/?month=YYYY-MM&status=pending|missed|dismissed
-    Returns detailed list of health insurance renewals for the given month and status.
+    Return the ?month=YYYY-MM query param, or None if missing or malformed.
     """
     month = request.query_params.get("month")
+    if not month:
+        return None
+    try:
+        month_range(month)
+    except ValueError:
+        return None
+    return month
+
+
+def _renewal_summary_response(request, product_key):
+    month = _month_param(request)
+    if not month:
+        return Response(MONTH_REQUIRED, status=400)
+    return Response(renewals.renewal_summary(product_key, month))
+
+
+def _renewal_list_response(request, product_key):
+    month = _month_param(request)
+    if not month:
+        return Response(MONTH_REQUIRED, status=400)
     status_key = request.query_params.get("status", "pending")
+    return Response(renewals.renewal_list(product_key, month, status_key))
+
 
+@api_view(["GET"])
+def renewal_summary_all(request):
+    """
+    GET /api/renewals/summary/?month=YYYY-MM
+    Returns pending/missed(/dismissed) counts for every product in one response.
+    """
+    month = _month_param(request)
     if not month:
-        return Response({"error": "month is required (YYYY-MM)"}, status=400)
+        return Response(MONTH_REQUIRED, status=400)
+    return Response(renewals.combined_summary(month))
 
-    start, end = month_range(month)
-    today = date.today()
 
-    qs = HealthInsurance.objects.select_related("client").filter(
-        renewal_date__gte=start,
-        renewal_date__lt=end
-    )
+@api_view(["GET"])
+def renewal_calendar(request):
+    """
+    GET /api/renewals/calendar/?from=YYYY-MM&months=12&group=month|week
+    Returns pending/missed(/dismissed) counts per month (or week) for every product.
+    """
+    from_month = request.query_params.get("from")
+    group = request.query_params.get("group", "month")
+    try:
+        month_range(from_month or "")
+        months = int(request.query_params.get("months", 12))
+    except ValueError:
+        return Response({"error": "from is required (YYYY-MM) and months must be a number"}, status=400)
 
-    if status_key == "dismissed":
-        qs = qs.filter(renewal_dismissed=True)
-    elif status_key == "missed":
-        qs = qs.filter(renewal_dismissed=False, renewal_date__lt=today)
-    else:  # default: pending
-        qs = qs.filter(renewal_dismissed=False, renewal_date__gte=today)
-
-    data = []
-    for h in qs.order_by("renewal_date"):
-        data.append({
-            "id": h.id,
-            "renewal_date": h.renewal_date,
-            "renewal_dismissed": h.renewal_dismissed,
-            "floater_type": h.floater_type,
-            "ages": h.ages,
-            "ped": h.ped,
-            "client": {
-                "id": h.client.id,
-                "name": h.client.name,
-                "mobile": h.client.mobile,
-                "place": h.client.place,
-                "insurance_type": h.client.insurance_type,
-            }
-        })
+    if not 1 <= months <= CALENDAR_MAX_MONTHS:
+        return Response({"error": f"months must be between 1 and {CALENDAR_MAX_MONTHS}"}, status=400)
+    if group not in renewals.CALENDAR_GROUPS:
+        return Response({"error": "group must be month or week"}, status=400)
 
-    return Response(data)
+    return Response(renewals.renewal_calendar(from_month, months, group))
+
+
+@api_view(["POST"])
+def renewal_bulk(request, product):
+    """
+    POST /api/renewals/<health|vehicle|investment>/bulk/
+    Body: { "items": [
+        { "client_id": 1, "next_renewal_date": "YYYY-MM-DD" },
+        { "client_id": 2, "renewal_date": "YYYY-MM-DD" },
+        { "client_id": 3, "action": "dismiss" }
+    ] }
+    Applies every valid item in one transaction and reports per-item results.
+    """
+    if product not in renewals.PRODUCTS:
+        return Response({"error": "Unknown product"}, status=404)
+
+    items = request.data.get("items") if isinstance(request.data, dict) else None
+    if not isinstance(items, list) or not items:
+        return Response({"error": "items must be a non-empty list"}, status=400)
+    if len(items) > renewals.BULK_MAX_ITEMS:
+        return Response({"error": f"at most {renewals.BULK_MAX_ITEMS} items per request"}, status=400)
+
+    return Response(renewals.apply_bulk(product, items))
+
+
+# ----------------------------- HEALTH RENEWAL APIS -----------------------------
+@api_view(["GET"])
+def health_renewal_summary(request):
+    """
+    GET /api/renewals/health/summary/?month=YYYY-MM
+    Returns counts for pending/missed/dismissed renewals in that month.
+    """
+    return _renewal_summary_response(request, "health")
+
+
+@api_view(["GET"])
+def health_renewal_list(request):
+    """
+    GET /api/renewals/health/?month=YYYY-MM&status=pending|missed|dismissed
+    Returns detailed list of health insurance renewals for the given month and status.
+    """
+    return _renewal_list_response(request, "health")
 
 
 @api_view(["POST"])
@@ -357,27 +727,7 @@ def vehicle_renewal_summary(request):
     GET /api/renewals/vehicle/summary/?month=YYYY-MM
     Returns counts for pending/missed renewals in that month.
     """
-    month = request.query_params.get("month")
-    if not month:
-        return Response({"error": "month is required (YYYY-MM)"}, status=400)
-
-    start, end = month_range(month)
-    today = date.today()
-
-    qs = VehicleInsurance.objects.select_related("client").filter(
-        renewal_date__isnull=False,
-        renewal_date__gte=start,
-        renewal_date__lt=end
-    )
-
-    pending = qs.filter(renewal_date__gte=today).count()
-    missed = qs.filter(renewal_date__lt=today).count()
-
-    return Response({
-        "month": month,
-        "pending": pending,
-        "missed": missed,
-    })
+    return _renewal_summary_response(request, "vehicle")
 
 
 @api_view(["GET"])
@@ -385,43 +735,7 @@ def vehicle_renewal_list(request):
     """
     GET /api/renewals/vehicle/?month=YYYY-MM&status=pending|missed
     """
-    month = request.query_params.get("month")
-    status_key = request.query_params.get("status", "pending")
-
-    if not month:
-        return Response({"error": "month is required (YYYY-MM)"}, status=400)
-
-    start, end = month_range(month)
-    today = date.today()
-
-    qs = VehicleInsurance.objects.select_related("client").filter(
-        renewal_date__isnull=False,
-        renewal_date__gte=start,
-        renewal_date__lt=end
-    )
-
-    if status_key == "missed":
-        qs = qs.filter(renewal_date__lt=today)
-    else:
-        qs = qs.filter(renewal_date__gte=today)
-
-    data = []
-    for v in qs.order_by("renewal_date"):
-        data.append({
-            "id": v.id,
-            "renewal_date": v.renewal_date,
-            "vehicle_type": v.vehicle_type,
-            "insurance_cover": v.insurance_cover,
-            "client": {
-                "id": v.client.id,
-                "name": v.client.name,
-                "mobile": v.client.mobile,
-                "place": v.client.place,
-                "insurance_type": v.client.insurance_type,
-            }
-        })
-
-    return Response(data)
+    return _renewal_list_response(request, "vehicle")
 
 
 @api_view(["POST"])
@@ -472,8 +786,23 @@ def vehicle_set_renewal_date(request, client_id):
 @api_view(["DELETE"])
 def delete_client_full(request, client_id):
     client = get_object_or_404(Client, id=client_id)
-    client.delete()  # ✅ CASCADE deletes everything linked
-    return Response({"success": True, "message": "Client deleted fully"})
+    job = purge.soft_delete_client(client)  # ✅ purge worker removes everything linked
+    return Response({"success": True, "message": "Client purge queued", "purge_id": job.id}, status=202)
+
+
+class ClientPurgeViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    GET /api/purges/ and /api/purges/<id>/ — progress of client purges.
+    """
+    queryset = ClientPurge.objects.all()
+    serializer_class = ClientPurgeSerializer
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        client_id = self.request.query_params.get("client")
+        if client_id:
+            qs = qs.filter(client_id=client_id)
+        return qs
 
 
 @api_view(['GET'])
@@ -485,7 +814,7 @@ def debug_db(request):
 
 # ----------------------------- INVESTMENT -----------------------------
 class InvestmentDetailsViewSet(viewsets.ModelViewSet):
-    queryset = InvestmentDetails.objects.all()
+    queryset = InvestmentDetails.objects.filter(client__deleted_at__isnull=True)
     serializer_class = InvestmentDetailsSerializer
 
 
@@ -504,9 +833,11 @@ def convert_investment_client(request, client_id):
     serializer = InvestmentConversionSerializer(data=data)
 
     if serializer.is_valid():
-        serializer.save()
-        client.is_converted = True
-        client.save()
+        with transaction.atomic():
+            conversion = serializer.save()
+            analytics.record_conversion(conversion)
+            client.is_converted = True
+            client.save()
 
         renewal_date = data.get("renewal_date")
         if renewal_date:
@@ -522,64 +853,12 @@ def convert_investment_client(request, client_id):
 # ----------------------------- INVESTMENT RENEWAL APIS -----------------------------
 @api_view(["GET"])
 def investment_renewal_summary(request):
-    month = request.query_params.get("month")
-    if not month:
-        return Response({"error": "month is required (YYYY-MM)"}, status=400)
-
-    start, end = month_range(month)
-    today = date.today()
-
-    qs = InvestmentDetails.objects.select_related("client").filter(
-        renewal_date__isnull=False,
-        renewal_date__gte=start,
-        renewal_date__lt=end
-    )
-
-    pending = qs.filter(renewal_date__gte=today).count()
-    missed = qs.filter(renewal_date__lt=today).count()
-
-    return Response({"month": month, "pending": pending, "missed": missed})
+    return _renewal_summary_response(request, "investment")
 
 
 @api_view(["GET"])
 def investment_renewal_list(request):
-    month = request.query_params.get("month")
-    status_key = request.query_params.get("status", "pending")
-
-    if not month:
-        return Response({"error": "month is required (YYYY-MM)"}, status=400)
-
-    start, end = month_range(month)
-    today = date.today()
-
-    qs = InvestmentDetails.objects.select_related("client").filter(
-        renewal_date__isnull=False,
-        renewal_date__gte=start,
-        renewal_date__lt=end
-    )
-
-    if status_key == "missed":
-        qs = qs.filter(renewal_date__lt=today)
-    else:
-        qs = qs.filter(renewal_date__gte=today)
-
-    data = []
-    for inv in qs.order_by("renewal_date"):
-        data.append({
-            "id": inv.id,
-            "renewal_date": inv.renewal_date,
-            "investment_type": inv.investment_type,
-            "remarks": inv.remarks,
-            "client": {
-                "id": inv.client.id,
-                "name": inv.client.name,
-                "mobile": inv.client.mobile,
-                "place": inv.client.place,
-                "insurance_type": inv.client.insurance_type,
-            }
-        })
-
-    return Response(data)
+    return _renewal_list_response(request, "investment")
 
 
 @api_view(["POST"])
@@ -617,7 +896,7 @@ def investment_set_renewal_date(request, client_id):
 
 
 class EMIDetailsViewSet(viewsets.ModelViewSet):
-    queryset = EMIDetails.objects.all()
+    queryset = EMIDetails.objects.filter(client__deleted_at__isnull=True)
     serializer_class = EMIDetailsSerializer
 
     def get_queryset(self):
@@ -625,4 +904,99 @@ class EMIDetailsViewSet(viewsets.ModelViewSet):
         client_id = self.request.query_params.get("client")
         if client_id:
             qs = qs.filter(client_id=client_id)
-        return qs
\ No newline at end of file
+        return qs
+
+
+# ----------------------------- EMI INSTALLMENTS -----------------------------
+class EMIInstallmentViewSet(fastpath.FastListMixin, viewsets.ModelViewSet):
+    """
+    Generated installments; only `paid` can be changed (PATCH).
+    The list takes ?emi=, ?client=, ?paid=true|false and
+    ?due_from=/?due_to= (YYYY-MM-DD).
+    """
+    queryset = (
+        EMIInstallment.objects.filter(emi__client__deleted_at__isnull=True)
+        .select_related('emi')
+        .order_by('due_date', 'id')
+    )
+    serializer_class = EMIInstallmentSerializer
+    http_method_names = ['get', 'patch', 'head', 'options']
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        params = self.request.query_params
+        if params.get("emi"):
+            qs = qs.filter(emi_id=params["emi"])
+        if params.get("client"):
+            qs = qs.filter(emi__client_id=params["client"])
+        if params.get("paid") in ("true", "false"):
+            qs = qs.filter(paid=params["paid"] == "true")
+        for param, lookup in (("due_from", "due_date__gte"), ("due_to", "due_date__lte")):
+            value = _date_param(params.get(param))
+            if value:
+                qs = qs.filter(**{lookup: value})
+        return qs
+
+    def list(self, request, *args, **kwargs):
+        return self.fast_list(self.filter_queryset(self.get_queryset())) or super().list(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        paid = serializer.validated_data.get("paid", serializer.instance.paid)
+        if paid and not serializer.instance.paid:
+            serializer.save(paid_at=now())
+        elif not paid:
+            serializer.save(paid_at=None)
+        else:
+            serializer.save()
+
+
+def _date_range(request, default):
+    """
+    (from, to, error) from ?from=&to=, each defaulting to `default`'s.
+    """
+    bounds = list(default)
+    for index, param in enumerate(("from", "to")):
+        value = request.query_params.get(param)
+        if value:
+            bounds[index] = _date_param(value)
+            if bounds[index] is None:
+                return None, None, Response({"error": f"{param} must be YYYY-MM-DD"}, status=400)
+    if bounds[0] > bounds[1]:
+        return None, None, Response({"error": "from must not be after to"}, status=400)
+    return bounds[0], bounds[1], None
+
+
+@api_view(["GET"])
+def emi_due(request):
+    """
+    GET /api/emi/due/?from=YYYY-MM-DD&to=YYYY-MM-DD
+    Unpaid installments due in the range (default: this week), totalled
+    per EMI provider.
+    """
+    start, end, error = _date_range(request, installments.this_week(localdate()))
+    if error:
+        return error
+    return Response(installments.due(start, end))
+
+
+@api_view(["GET"])
+def emi_overdue(request):
+    """
+    GET /api/emi/overdue/
+    Unpaid installments due before today, totalled per EMI provider.
+    """
+    return Response(installments.overdue(localdate()))
+
+
+@api_view(["GET"])
+def emi_collected(request):
+    """
+    GET /api/emi/collected/?from=YYYY-MM-DD&to=YYYY-MM-DD
+    Installments marked paid in the range (default: this month so far),
+    totalled per EMI provider.
+    """
+    today = localdate()
+    start, end, error = _date_range(request, (today.replace(day=1), today))
+    if error:
+        return error
+    return Response(installments.collected(start, end))
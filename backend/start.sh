@@ -1,4 +1,11 @@
 #!/bin/sh
 export PYTHONPATH=/app/backend/packages
-python3 manage.py migrate --noinput &
-python3 -m gunicorn config.wsgi:application --bind 0.0.0.0:8080 --workers 1 --threads 2 --timeout 120
\ No newline at end of file
+(python3 manage.py migrate --noinput && {
+    python3 manage.py process_documents --loop --workers 2 &
+    python3 manage.py purge_clients --loop --sleep 30
+}) &
+if [ "$SERVER" = "uvicorn" ]; then
+    python3 -m uvicorn config.asgi:application --host 0.0.0.0 --port 8080 --workers 1
+else
+    python3 -m gunicorn config.wsgi:application --bind 0.0.0.0:8080 --workers 1 --threads 2 --timeout 120
+fi
@@ -3,6 +3,7 @@
 import { useEffect, useLayoutEffect, useMemo, useRef, useState } from 'react';
 import { useRouter, useSearchParams, usePathname } from 'next/navigation';
 import { motion, AnimatePresence, LayoutGroup } from 'framer-motion';
+import { apiFetch } from '@/lib/api';
 
 const API = process.env.NEXT_PUBLIC_API_URL || 'http://127.0.0.1:8000/api';
 const SCROLL_KEY = 'reminders-scroll-pos';
@@ -116,7 +117,7 @@ const insuranceMeta = (type: string) =>
   insuranceTabs.find((t) => t.value === type) || insuranceTabs[0];
 
 async function fetchJSON(url: string, options?: RequestInit) {
-  const res = await fetch(url, options);
+  const res = await apiFetch(url, options);
   if (!res.ok) {
     throw new Error(`Request to ${url} failed with status ${res.status}`);
   }
@@ -2,6 +2,7 @@
 
 import { useState } from "react";
 import { motion, AnimatePresence } from "framer-motion";
+import { apiFetch } from "@/lib/api";
 
 const API_BASE =
   process.env.NEXT_PUBLIC_API_URL || "http://127.0.0.1:8000/api";
@@ -79,7 +80,7 @@ export default function ConvertModal({ clientId, onClose, onSuccess }: any) {
     try {
       setSaving(true);
 
-      const res = await fetch(`${API_BASE}/convert-client/${clientId}/`, {
+      const res = await apiFetch(`${API_BASE}/convert-client/${clientId}/`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
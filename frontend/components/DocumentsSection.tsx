@@ -7,6 +7,9 @@ type Document = {
   id: number;
   document_type: string;
   file: string;
+  archive_file: string | null;
+  preview_file: string | null;
+  url: string | null;
   uploaded_at: string;
 };
 
@@ -134,9 +137,11 @@ export default function DocumentsSection({ clientId }: { clientId: number }) {
       ) : (
         <div className="space-y-2.5">
           {documents.map((doc) => {
-            const fileUrl = doc.file.startsWith('http')
-              ? doc.file
-              : `${BACKEND_ORIGIN}${doc.file}`;
+            const absolute = (path: string) =>
+              path.startsWith('http') ? path : `${BACKEND_ORIGIN}${path}`;
+            // Open the compressed archive copy; the list shows the small preview.
+            const fileUrl = absolute(doc.archive_file || doc.file);
+            const previewUrl = doc.preview_file && doc.url ? absolute(doc.url) : null;
 
             return (
               <div
@@ -144,9 +149,18 @@ export default function DocumentsSection({ clientId }: { clientId: number }) {
                 className="flex justify-between items-center bg-[#0A0E16] border border-white/[0.08] p-4 rounded-xl"
               >
                 <div className="flex items-center gap-3 min-w-0">
-                  <span className="flex h-8 w-8 shrink-0 items-center justify-center rounded-lg bg-white/[0.04] text-[#7C879E]">
-                    <FileIcon />
-                  </span>
+                  {previewUrl ? (
+                    <img
+                      src={previewUrl}
+                      alt=""
+                      loading="lazy"
+                      className="h-8 w-8 shrink-0 rounded-lg object-cover"
+                    />
+                  ) : (
+                    <span className="flex h-8 w-8 shrink-0 items-center justify-center rounded-lg bg-white/[0.04] text-[#7C879E]">
+                      <FileIcon />
+                    </span>
+                  )}
                   <div className="min-w-0">
                     <p className="font-medium text-[14px] text-[#F4F6FA] capitalize truncate">
                       {doc.document_type.replace('_', ' ')}
@@ -1,9 +1,32 @@
 const API_BASE =
   process.env.NEXT_PUBLIC_API_URL || 'http://127.0.0.1:8000/api';
 
+// Read-your-writes: after a write the API answers with X-Primary-Pin (a
+// Unix time in seconds). Sending it back until then keeps our reads on
+// the primary database rather than a lagging replica. The API is on
+// another site, so this is a header rather than a cookie.
+const PIN_HEADER = 'X-Primary-Pin';
+const PIN_KEY = 'primary-pin';
+
+function readPin(): string | null {
+  if (typeof window === 'undefined') return null;
+  const pin = sessionStorage.getItem(PIN_KEY);
+  return pin && Number(pin) * 1000 > Date.now() ? pin : null;
+}
+
+export async function apiFetch(input: string, init: RequestInit = {}) {
+  const pin = readPin();
+  const headers = new Headers(init.headers);
+  if (pin) headers.set(PIN_HEADER, pin);
+  const res = await fetch(input, { ...init, headers });
+  const next = res.headers.get(PIN_HEADER);
+  if (next && typeof window !== 'undefined') sessionStorage.setItem(PIN_KEY, next);
+  return res;
+}
+
 // ---------------- CLIENT ----------------
 export async function createClient(data: any) {
-  const res = await fetch(`${API_BASE}/clients/`, {
+  const res = await apiFetch(`${API_BASE}/clients/`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
@@ -13,13 +36,13 @@ export async function createClient(data: any) {
 }
 
 export async function getClientDetail(id: number) {
-  const res = await fetch(`${API_BASE}/clients/${id}/`);
+  const res = await apiFetch(`${API_BASE}/clients/${id}/`);
   if (!res.ok) throw new Error('Failed to load client');
   return res.json();
 }
 
 export async function updateClient(id: number, data: any) {
-  const res = await fetch(`${API_BASE}/clients/${id}/`, {
+  const res = await apiFetch(`${API_BASE}/clients/${id}/`, {
     method: 'PATCH',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
@@ -29,20 +52,35 @@ export async function updateClient(id: number, data: any) {
 }
 
 export async function deleteClient(id: number) {
-  await fetch(`${API_BASE}/clients/${id}/`, { method: 'DELETE' });
+  await apiFetch(`${API_BASE}/clients/${id}/`, { method: 'DELETE' });
 }
 
 export async function deleteClientFull(clientId: number) {
-  const res = await fetch(`${API_BASE}/clients/${clientId}/full-delete/`, {
+  const res = await apiFetch(`${API_BASE}/clients/${clientId}/full-delete/`, {
     method: 'DELETE',
   });
   if (!res.ok) throw new Error('Full delete failed');
   return res.json();
 }
 
+// Cursor-paginated client list. Pass the `next` URL from the previous
+// page to continue; omit it to start from the newest client.
+export async function getClientsPage(
+  insuranceType: string,
+  next?: string | null,
+  pageSize = 50
+) {
+  const url =
+    next ||
+    `${API_BASE}/clients/?insurance_type=${insuranceType}&page_size=${pageSize}`;
+  const res = await apiFetch(url);
+  if (!res.ok) throw new Error('Failed to load clients');
+  return res.json();
+}
+
 // ---------------- VEHICLE ----------------
 export async function createVehicleInsurance(data: any) {
-  const res = await fetch(`${API_BASE}/vehicle-insurance/`, {
+  const res = await apiFetch(`${API_BASE}/vehicle-insurance/`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
@@ -52,14 +90,14 @@ export async function createVehicleInsurance(data: any) {
 }
 
 export async function getVehicleClients() {
-  const res = await fetch(`${API_BASE}/clients/?insurance_type=vehicle`);
+  const res = await apiFetch(`${API_BASE}/clients/?insurance_type=vehicle`);
   if (!res.ok) throw new Error('Failed to load vehicle clients');
   return res.json();
 }
 
 // ✅ ADDED FOR VEHICLE EMI / VEHICLE DETAIL PATCH
 export async function updateVehicleInsurance(id: number, data: any) {
-  const res = await fetch(`${API_BASE}/vehicle-insurance/${id}/`, {
+  const res = await apiFetch(`${API_BASE}/vehicle-insurance/${id}/`, {
     method: 'PATCH',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
@@ -70,7 +108,7 @@ export async function updateVehicleInsurance(id: number, data: any) {
 
 // ---------------- HEALTH ----------------
 export async function createHealthInsurance(data: any) {
-  const res = await fetch(`${API_BASE}/health-insurance/`, {
+  const res = await apiFetch(`${API_BASE}/health-insurance/`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
@@ -80,13 +118,13 @@ export async function createHealthInsurance(data: any) {
 }
 
 export async function getHealthClients() {
-  const res = await fetch(`${API_BASE}/clients/?insurance_type=health`);
+  const res = await apiFetch(`${API_BASE}/clients/?insurance_type=health`);
   if (!res.ok) throw new Error('Failed to load health clients');
   return res.json();
 }
 
 export async function updateHealthInsurance(id: number, data: any) {
-  const res = await fetch(`${API_BASE}/health-insurance/${id}/`, {
+  const res = await apiFetch(`${API_BASE}/health-insurance/${id}/`, {
     method: 'PATCH',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
@@ -97,7 +135,7 @@ export async function updateHealthInsurance(id: number, data: any) {
 
 // ---------------- NOTES ----------------
 export async function createNote(data: any) {
-  const res = await fetch(`${API_BASE}/notes/`, {
+  const res = await apiFetch(`${API_BASE}/notes/`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
@@ -107,7 +145,7 @@ export async function createNote(data: any) {
 }
 
 export async function updateNote(id: number, data: any) {
-  const res = await fetch(`${API_BASE}/notes/${id}/`, {
+  const res = await apiFetch(`${API_BASE}/notes/${id}/`, {
     method: 'PATCH',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
@@ -117,18 +155,18 @@ export async function updateNote(id: number, data: any) {
 }
 
 export async function deleteNote(id: number) {
-  await fetch(`${API_BASE}/notes/${id}/`, { method: 'DELETE' });
+  await apiFetch(`${API_BASE}/notes/${id}/`, { method: 'DELETE' });
 }
 
 export async function getClientHistory(id: number) {
-  const res = await fetch(`${API_BASE}/clients/${id}/history/`);
+  const res = await apiFetch(`${API_BASE}/clients/${id}/history/`);
   if (!res.ok) throw new Error('Failed to load history');
   return res.json();
 }
 
 // ---------------- QUOTES ----------------
 export async function createQuote(data: any) {
-  const res = await fetch(`${API_BASE}/quotes/`, {
+  const res = await apiFetch(`${API_BASE}/quotes/`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
@@ -138,7 +176,7 @@ export async function createQuote(data: any) {
 }
 
 export async function updateQuote(id: number, data: any) {
-  const res = await fetch(`${API_BASE}/quotes/${id}/`, {
+  const res = await apiFetch(`${API_BASE}/quotes/${id}/`, {
     method: 'PATCH',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
@@ -148,7 +186,7 @@ export async function updateQuote(id: number, data: any) {
 }
 
 export async function deleteQuote(id: number) {
-  const res = await fetch(`${API_BASE}/quotes/${id}/`, {
+  const res = await apiFetch(`${API_BASE}/quotes/${id}/`, {
     method: 'DELETE',
   });
   if (!res.ok) throw new Error('Failed to delete quote');
@@ -157,13 +195,13 @@ export async function deleteQuote(id: number) {
 
 // ---------------- DOCUMENTS (VEHICLE ONLY) ----------------
 export async function getClientDocuments(clientId: number) {
-  const res = await fetch(`${API_BASE}/documents/?client=${clientId}`);
+  const res = await apiFetch(`${API_BASE}/documents/?client=${clientId}`);
   if (!res.ok) throw new Error('Failed to load documents');
   return res.json();
 }
 
 export async function uploadDocument(formData: FormData) {
-  const res = await fetch(`${API_BASE}/documents/`, {
+  const res = await apiFetch(`${API_BASE}/documents/`, {
     method: 'POST',
     body: formData,
   });
@@ -171,27 +209,56 @@ export async function uploadDocument(formData: FormData) {
   return res.json();
 }
 
+// Direct-to-storage upload: presign, PUT the file, then confirm.
+export async function uploadDocumentDirect(
+  clientId: number,
+  documentType: string,
+  file: File
+) {
+  const presignRes = await apiFetch(`${API_BASE}/documents/presign/`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({
+      client: clientId,
+      document_type: documentType,
+      filename: file.name,
+      content_type: file.type,
+    }),
+  });
+  if (!presignRes.ok) throw new Error('Upload failed');
+  const { id, upload_url, headers } = await presignRes.json();
+
+  const putRes = await apiFetch(upload_url, { method: 'PUT', headers, body: file });
+  if (!putRes.ok) throw new Error('Upload failed');
+
+  const res = await apiFetch(`${API_BASE}/documents/${id}/confirm/`, {
+    method: 'POST',
+  });
+  if (!res.ok) throw new Error('Upload failed');
+  return res.json();
+}
+
 export async function deleteDocument(id: number) {
-  await fetch(`${API_BASE}/documents/${id}/delete/`, {
+  await apiFetch(`${API_BASE}/documents/${id}/delete/`, {
     method: 'DELETE',
   });
 }
 
 // ---------------- HEALTH RENEWALS ----------------
 export async function getHealthRenewalSummary(month: string) {
-  const res = await fetch(`${API_BASE}/renewals/health/summary/?month=${month}`);
+  const res = await apiFetch(`${API_BASE}/renewals/health/summary/?month=${month}`);
   if (!res.ok) throw new Error('Failed to load renewal summary');
   return res.json();
 }
 
 export async function getHealthRenewals(month: string, status: 'pending' | 'missed') {
-  const res = await fetch(`${API_BASE}/renewals/health/?month=${month}&status=${status}`);
+  const res = await apiFetch(`${API_BASE}/renewals/health/?month=${month}&status=${status}`);
   if (!res.ok) throw new Error('Failed to load renewals list');
   return res.json();
 }
 
 export async function renewHealthClient(clientId: number, nextRenewalDate: string) {
-  const res = await fetch(`${API_BASE}/renewals/health/${clientId}/renew/`, {
+  const res = await apiFetch(`${API_BASE}/renewals/health/${clientId}/renew/`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ next_renewal_date: nextRenewalDate }),
@@ -202,19 +269,19 @@ export async function renewHealthClient(clientId: number, nextRenewalDate: strin
 
 // ---------------- VEHICLE RENEWALS ----------------
 export async function getVehicleRenewalSummary(month: string) {
-  const res = await fetch(`${API_BASE}/renewals/vehicle/summary/?month=${month}`);
+  const res = await apiFetch(`${API_BASE}/renewals/vehicle/summary/?month=${month}`);
   if (!res.ok) throw new Error('Failed to load vehicle renewal summary');
   return res.json();
 }
 
 export async function getVehicleRenewals(month: string, status: 'pending' | 'missed') {
-  const res = await fetch(`${API_BASE}/renewals/vehicle/?month=${month}&status=${status}`);
+  const res = await apiFetch(`${API_BASE}/renewals/vehicle/?month=${month}&status=${status}`);
   if (!res.ok) throw new Error('Failed to load vehicle renewals list');
   return res.json();
 }
 
 export async function renewVehicleClient(clientId: number, nextRenewalDate: string) {
-  const res = await fetch(`${API_BASE}/renewals/vehicle/${clientId}/renew/`, {
+  const res = await apiFetch(`${API_BASE}/renewals/vehicle/${clientId}/renew/`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ next_renewal_date: nextRenewalDate }),
@@ -224,7 +291,7 @@ export async function renewVehicleClient(clientId: number, nextRenewalDate: stri
 }
 
 export async function setVehicleRenewalDate(clientId: number, renewalDate: string) {
-  const res = await fetch(`${API_BASE}/renewals/vehicle/${clientId}/set/`, {
+  const res = await apiFetch(`${API_BASE}/renewals/vehicle/${clientId}/set/`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ renewal_date: renewalDate }),
@@ -238,7 +305,7 @@ export async function setVehicleRenewalDate(clientId: number, renewalDate: strin
 
 // ---------------- INVESTMENT ----------------
 export async function createInvestmentDetails(data: any) {
-  const res = await fetch(`${API_BASE}/investment-details/`, {
+  const res = await apiFetch(`${API_BASE}/investment-details/`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
@@ -248,7 +315,7 @@ export async function createInvestmentDetails(data: any) {
 }
 
 export async function updateInvestmentDetails(id: number, data: any) {
-  const res = await fetch(`${API_BASE}/investment-details/${id}/`, {
+  const res = await apiFetch(`${API_BASE}/investment-details/${id}/`, {
     method: 'PATCH',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
@@ -258,13 +325,13 @@ export async function updateInvestmentDetails(id: number, data: any) {
 }
 
 export async function getInvestmentClients() {
-  const res = await fetch(`${API_BASE}/clients/?insurance_type=investment`);
+  const res = await apiFetch(`${API_BASE}/clients/?insurance_type=investment`);
   if (!res.ok) throw new Error('Failed to load investment clients');
   return res.json();
 }
 
 export async function convertInvestmentClient(clientId: number, data: any) {
-  const res = await fetch(`${API_BASE}/convert-investment-client/${clientId}/`, {
+  const res = await apiFetch(`${API_BASE}/convert-investment-client/${clientId}/`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
@@ -278,19 +345,19 @@ export async function convertInvestmentClient(clientId: number, data: any) {
 
 // ---------------- INVESTMENT RENEWALS ----------------
 export async function getInvestmentRenewalSummary(month: string) {
-  const res = await fetch(`${API_BASE}/renewals/investment/summary/?month=${month}`);
+  const res = await apiFetch(`${API_BASE}/renewals/investment/summary/?month=${month}`);
   if (!res.ok) throw new Error('Failed to load investment renewal summary');
   return res.json();
 }
 
 export async function getInvestmentRenewals(month: string, status: 'pending' | 'missed') {
-  const res = await fetch(`${API_BASE}/renewals/investment/?month=${month}&status=${status}`);
+  const res = await apiFetch(`${API_BASE}/renewals/investment/?month=${month}&status=${status}`);
   if (!res.ok) throw new Error('Failed to load investment renewals list');
   return res.json();
 }
 
 export async function renewInvestmentClient(clientId: number, nextRenewalDate: string) {
-  const res = await fetch(`${API_BASE}/renewals/investment/${clientId}/renew/`, {
+  const res = await apiFetch(`${API_BASE}/renewals/investment/${clientId}/renew/`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ next_renewal_date: nextRenewalDate }),
@@ -300,7 +367,7 @@ export async function renewInvestmentClient(clientId: number, nextRenewalDate: s
 }
 
 export async function setInvestmentRenewalDate(clientId: number, renewalDate: string) {
-  const res = await fetch(`${API_BASE}/renewals/investment/${clientId}/set/`, {
+  const res = await apiFetch(`${API_BASE}/renewals/investment/${clientId}/set/`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ renewal_date: renewalDate }),
@@ -312,7 +379,7 @@ export async function setInvestmentRenewalDate(clientId: number, renewalDate: st
 
 // ---------------- EMI DETAILS (multiple per client) ----------------
 export async function createEmiDetails(data: any) {
-  const res = await fetch(`${API_BASE}/emi-details/`, {
+  const res = await apiFetch(`${API_BASE}/emi-details/`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
@@ -322,7 +389,7 @@ export async function createEmiDetails(data: any) {
 }
 
 export async function updateEmiDetails(id: number, data: any) {
-  const res = await fetch(`${API_BASE}/emi-details/${id}/`, {
+  const res = await apiFetch(`${API_BASE}/emi-details/${id}/`, {
     method: 'PATCH',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(data),
@@ -332,7 +399,7 @@ export async function updateEmiDetails(id: number, data: any) {
 }
 
 export async function deleteEmiDetails(id: number) {
-  const res = await fetch(`${API_BASE}/emi-details/${id}/`, {
+  const res = await apiFetch(`${API_BASE}/emi-details/${id}/`, {
     method: 'DELETE',
   });
   if (!res.ok) throw new Error('Failed to delete EMI details');